@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class SpindoappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'spindoapp'
+
+    def ready(self):
+        from django.core import checks
+
+        from . import signals  # noqa: F401
+        from .utils_otp import check_otp_store
+
+        checks.register(check_otp_store)
@@ -1,10 +1,119 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework.exceptions import AuthenticationFailed
-from .models import AllLog
+from .models import PrincipalDenylist
+from .utils_cache import get_alllog
+
+
+class TokenPrincipal:
+    """
+    Lightweight stand-in for AllLog built from the access token claims.
+    Attributes the token does not carry (phone, email, ...) are loaded
+    from AllLog on first use.
+    """
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+
+    def __init__(self, validated_token, request=None):
+        self.id = self.pk = validated_token['user_id']
+        for claim in ('unique_id', 'role'):
+            if claim in validated_token:
+                setattr(self, claim, validated_token[claim])
+        self._account = None
+        self._request = request
+
+    @property
+    def account(self):
+        if self._account is None:
+            self._account = get_alllog(self._request, id=self.id)
+            if self._account is None:
+                raise AuthenticationFailed('User not found')
+        return self._account
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.account, name)
+
+    def __str__(self):
+        return f"{self.unique_id} ({self.role})"
+
+
+# Per-process copy of PrincipalDenylist: user_id -> (is_active, revoked_at epoch)
+_denylist = {}
+_denylist_loaded_at = None
+_denylist_lock = threading.Lock()
+
+
+def _epoch_seconds(moment):
+    # Token iat/auth_time claims are whole seconds; a login in the same
+    # second as the revocation must not be refused
+    return int(moment.timestamp())
+
+
+def _load_denylist():
+    # Refresh tokens are checked too, so an entry must outlive the longest token
+    lifetime = max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+    cutoff = timezone.now() - lifetime
+    rows = PrincipalDenylist.objects.filter(
+        Q(is_active=False) | Q(revoked_at__gte=cutoff)
+    ).values_list('user_id', 'is_active', 'revoked_at')
+    return {user_id: (is_active, _epoch_seconds(revoked_at)) for user_id, is_active, revoked_at in rows}
+
+
+def get_denylist():
+    global _denylist, _denylist_loaded_at
+
+    refresh_seconds = getattr(settings, 'JWT_DENYLIST_REFRESH_SECONDS', 30)
+    now = time.monotonic()
+    if _denylist_loaded_at is None or now - _denylist_loaded_at >= refresh_seconds:
+        with _denylist_lock:
+            if _denylist_loaded_at is None or now - _denylist_loaded_at >= refresh_seconds:
+                _denylist = _load_denylist()
+                _denylist_loaded_at = now
+    return _denylist
+
+
+def revoke_principal(user_id, is_active):
+    """
+    Refuse every token issued to ``user_id`` so far. ``is_active=False``
+    also refuses tokens issued later, until the account is reactivated.
+    """
+    revoked_at = timezone.now()
+    PrincipalDenylist.objects.update_or_create(
+        user_id=user_id,
+        defaults={'is_active': is_active, 'revoked_at': revoked_at}
+    )
+    # This worker sees the change at once, the others on their next refresh
+    _denylist[user_id] = (is_active, _epoch_seconds(revoked_at))
+
+
+def is_token_revoked(token):
+    entry = get_denylist().get(token.get('user_id'))
+    if entry is None:
+        return False
+    is_active, revoked_at = entry
+    if not is_active:
+        return True
+    # auth_time survives token refreshes, iat does not
+    issued_at = token.get('auth_time', token.get('iat'))
+    return issued_at is None or issued_at < revoked_at
 
 
 class CustomJWTAuthentication(JWTAuthentication):
 
+    def authenticate(self, request):
+        # Kept so get_user() can memoize the account on the request
+        self.request = request
+        return super().authenticate(request)
+
     def get_user(self, validated_token):
 
         user_id = validated_token.get('user_id')
@@ -12,9 +121,13 @@ class CustomJWTAuthentication(JWTAuthentication):
         if not user_id:
             raise AuthenticationFailed('Token contained no user_id')
 
-        try:
-            user = AllLog.objects.get(id=user_id)
-        except AllLog.DoesNotExist:
+        if getattr(settings, 'JWT_CLAIMS_PRINCIPAL', False):
+            if is_token_revoked(validated_token):
+                raise AuthenticationFailed('Token has been revoked')
+            return TokenPrincipal(validated_token, getattr(self, 'request', None))
+
+        user = get_alllog(getattr(self, 'request', None), id=user_id)
+        if user is None:
             raise AuthenticationFailed('User not found')
 
         return user
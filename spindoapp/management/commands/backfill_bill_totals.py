@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from spindoapp.models import Billing
+
+TOTAL_FIELDS = ["taxable_total", "cgst_total", "sgst_total", "grand_total"]
+
+
+class Command(BaseCommand):
+    help = "Computes the stored totals of existing bills from bill_item, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--missing", action="store_true", help="Only bills without a grand_total")
+
+    def handle(self, *args, **options):
+        bills = Billing.objects.only("id", "bill_id", "bill_item", *TOTAL_FIELDS).order_by("id")
+        if options["missing"]:
+            bills = bills.filter(grand_total__isnull=True)
+
+        updated = 0
+        invalid = []
+        last_pk = 0
+        while True:
+            batch = list(bills.filter(id__gt=last_pk)[:options["batch_size"]])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            for bill in batch:
+                bill.set_totals()
+                if bill.grand_total is None:
+                    invalid.append(bill.bill_id)
+            Billing.objects.bulk_update(batch, TOTAL_FIELDS)
+            updated += len(batch)
+            self.stdout.write(f"{updated} bills updated")
+
+        for bill_id in invalid:
+            self.stderr.write(f"{bill_id}: bill_item is malformed, totals left empty")
+        self.stdout.write(self.style.SUCCESS(f"Done: {updated} bills, {len(invalid)} malformed"))
@@ -0,0 +1,62 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from spindoapp.models import AllLog
+from spindoapp.views import ServiceRequestAPIView
+
+
+class Command(BaseCommand):
+    help = (
+        "Times authenticated GET requests to the service request list with the "
+        "AllLog lookup and with the claims-only principal, and reports the "
+        "queries issued per request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--unique-id", help="Account to authenticate as (default: first active admin)")
+        parser.add_argument("--iterations", type=int, default=500)
+
+    def handle(self, *args, **options):
+        accounts = AllLog.objects.filter(is_active=True)
+        if options["unique_id"]:
+            account = accounts.filter(unique_id=options["unique_id"]).first()
+        else:
+            account = accounts.filter(role="admin").first()
+        if account is None:
+            raise CommandError("No active account to authenticate as")
+
+        refresh = RefreshToken()
+        refresh["unique_id"] = account.unique_id
+        refresh["user_id"] = account.id
+        refresh["role"] = account.role
+        refresh["auth_time"] = refresh["iat"]
+        header = f"Bearer {refresh.access_token}"
+
+        factory = APIRequestFactory()
+        view = ServiceRequestAPIView.as_view()
+
+        for label, claims_mode in (("AllLog lookup", False), ("claims principal", True)):
+            with override_settings(JWT_CLAIMS_PRINCIPAL=claims_mode):
+                # Warm up caches (denylist, connection) before timing
+                view(factory.get("/api/customer/requestservices/", HTTP_AUTHORIZATION=header))
+
+                timings = []
+                for _ in range(options["iterations"]):
+                    request = factory.get("/api/customer/requestservices/", HTTP_AUTHORIZATION=header)
+                    started = time.perf_counter()
+                    view(request)
+                    timings.append((time.perf_counter() - started) * 1000)
+
+                with CaptureQueriesContext(connection) as queries:
+                    view(factory.get("/api/customer/requestservices/", HTTP_AUTHORIZATION=header))
+
+            self.stdout.write(
+                f"{label:>17}: {statistics.mean(timings):.3f} ms/request, "
+                f"{len(queries.captured_queries)} queries/request"
+            )
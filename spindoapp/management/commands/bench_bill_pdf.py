@@ -0,0 +1,86 @@
+import io
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from spindoapp.utils_billing import invoice_template, render_bill_pdf
+
+
+def sample_bill(items):
+    return {
+        "bill_id": "BILL/2026/0001",
+        "address_1": ["Spindo Solar Pvt. Ltd.", "Rajpur Road", "Dehradun, Uttarakhand", "GSTIN: 05ABCDE1234F1Z5"],
+        "address_2": ["Consignee Name", "Haridwar Road", "Dehradun"],
+        "address_3": ["Buyer Name", "Haridwar Road", "Dehradun"],
+        "invoice_no": ["INV-0001"],
+        "dated_date": "2026-04-01",
+        "delv_note": "DN-1",
+        "mode_of_pay": "NEFT",
+        "ref_no_date": "2026-03-28",
+        "other_ref": "",
+        "buyer_ord_no": "PO-77",
+        "dated_1": "2026-03-27",
+        "dispatch_doc_no": "DD-5",
+        "del_note_date": "2026-04-02",
+        "bill_item": [
+            [f"Solar panel 540W mono PERC, lot {i}", "8541", 2, 11500, 23000, 6, 1380, 6, 1380, "Nos"]
+            for i in range(1, items + 1)
+        ],
+        "bank_detail": [
+            "A/c Holder's Name: Spindo Solar Pvt. Ltd.",
+            "Bank Name: State Bank of India",
+            "A/c No.: 000011112222",
+            "Branch & IFSC: Rajpur Road, SBIN0000001",
+        ],
+        "amount_in_words": "Twenty Six Thousand Seven Hundred Sixty Only",
+        "authorized_name": "Spindo Solar Pvt. Ltd.",
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Renders invoices with 1, 50 and 500 items in memory and reports the "
+        "time per page and the peak Python memory of a render."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[1, 50, 500], help="bill_item counts")
+        parser.add_argument("--repeat", type=int, default=10, help="Timed renders per size")
+        parser.add_argument("--max-ms-per-page", type=float, help="Fail if any size is slower than this")
+
+    def handle(self, *args, **options):
+        # Template construction happens once per process and is not part of a render
+        invoice_template()
+        render_bill_pdf(sample_bill(1), io.BytesIO())
+
+        slow = []
+        self.stdout.write(f"{'items':>6} {'pages':>6} {'ms/render':>10} {'ms/page':>9} {'peak KiB':>9}")
+
+        for size in options["sizes"]:
+            data = sample_bill(size)
+
+            timings = []
+            for _ in range(options["repeat"]):
+                started = time.perf_counter()
+                pages = render_bill_pdf(data, io.BytesIO())
+                timings.append((time.perf_counter() - started) * 1000)
+
+            tracemalloc.start()
+            render_bill_pdf(data, io.BytesIO())
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            per_render = statistics.median(timings)
+            per_page = per_render / pages
+            self.stdout.write(
+                f"{size:>6} {pages:>6} {per_render:>10.2f} {per_page:>9.2f} {peak / 1024:>9.0f}"
+            )
+            if options["max_ms_per_page"] and per_page > options["max_ms_per_page"]:
+                slow.append(size)
+
+        if slow:
+            raise CommandError(
+                f"Rendering slower than {options['max_ms_per_page']} ms/page for {slow} items"
+            )
@@ -0,0 +1,78 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from spindoapp.models import Vendor, VendorRequest
+
+# Filler rows live far above real query numbers so they never collide
+FILLER_START = 1_000_000_000
+
+
+class Command(BaseCommand):
+    help = (
+        "Grows the VendorRequest table to each requested size and measures the "
+        "latency of creating a new request, next to the legacy Max(query_id) "
+        "aggregate. Everything is rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1000,10000,100000,1000000")
+        parser.add_argument("--samples", type=int, default=50)
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options["sizes"].split(","))
+        samples = options["samples"]
+        batch_size = options["batch_size"]
+
+        self.stdout.write(f"{'rows':>10} {'insert mean ms':>15} {'insert p95 ms':>14} {'Max(query_id) ms':>17}")
+
+        with transaction.atomic():
+            vendor = Vendor.objects.create(
+                username="bench",
+                mobile_number=f"b{random.randint(0, 10**9):09d}",
+                state="Uttarakhand",
+                district="Dehradun",
+                block="Raipur",
+                password="!",
+            )
+            filled = VendorRequest.objects.count()
+            filler_number = FILLER_START
+
+            for size in sizes:
+                while filled < size:
+                    count = min(batch_size, size - filled)
+                    VendorRequest.objects.bulk_create([
+                        VendorRequest(
+                            vendor=vendor,
+                            username="bench",
+                            title="bench",
+                            query_number=filler_number + i,
+                            query_id=f"B-{filler_number + i}",
+                        )
+                        for i in range(count)
+                    ])
+                    filler_number += count
+                    filled += count
+
+                timings = []
+                for _ in range(samples):
+                    started = time.perf_counter()
+                    VendorRequest.objects.create(vendor=vendor, username="bench", title="bench")
+                    timings.append((time.perf_counter() - started) * 1000)
+                filled += samples
+
+                started = time.perf_counter()
+                VendorRequest.objects.aggregate(max_query=Max("query_id"))
+                legacy_ms = (time.perf_counter() - started) * 1000
+
+                p95 = sorted(timings)[int(len(timings) * 0.95) - 1]
+                self.stdout.write(
+                    f"{filled:>10} {statistics.mean(timings):>15.2f} {p95:>14.2f} {legacy_ms:>17.2f}"
+                )
+
+            transaction.set_rollback(True)
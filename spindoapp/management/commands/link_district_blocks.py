@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from spindoapp.models import RegisteredCustomer, ServiceRequestByUser, Vendor
+from spindoapp.utils_geography import link_district_blocks
+
+
+class Command(BaseCommand):
+    help = (
+        "Links customers, vendors and service requests to DistrictBlock from "
+        "their free-text district/block and reports the values that match no "
+        "row. Run after seed_district_blocks or after fixing bad values."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Re-check linked rows too")
+        parser.add_argument("--top", type=int, default=20, help="Unmapped values to list per model")
+
+    def handle(self, *args, **options):
+        for model in (RegisteredCustomer, Vendor, ServiceRequestByUser):
+            linked, unmapped = link_district_blocks(model, only_unlinked=not options["all"])
+            self.stdout.write(f"{model.__name__}: linked {linked}, unmapped {sum(unmapped.values())}")
+            for (district, block), count in unmapped.most_common(options["top"]):
+                self.stdout.write(f"    {district!r} / {block!r}: {count}")
@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from spindoapp.models import PhoneOTP
+from spindoapp.utils_otp import CacheOtpStore, get_otp_store, lock_seconds, ttl_seconds, verified_ttl_seconds
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes phone_otp rows that can no longer be verified or used for a "
+        "password reset, in batches. With the cache OTP store in use every row "
+        "is left over from the table store and is deleted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--all", action="store_true", help="Delete every row, expired or not")
+        parser.add_argument("--dry-run", action="store_true", help="Only count the rows")
+
+    def handle(self, *args, **options):
+        rows = PhoneOTP.objects.all()
+        if not options["all"] and not isinstance(get_otp_store(), CacheOtpStore):
+            # A row stays usable until its code, its verification and its lock expired
+            cutoff = timezone.now() - timedelta(seconds=max(ttl_seconds(), verified_ttl_seconds(), lock_seconds()))
+            rows = rows.filter(updated_at__lt=cutoff)
+
+        if options["dry_run"]:
+            self.stdout.write(f"{rows.count()} OTP rows would be deleted")
+            return
+
+        deleted = 0
+        while True:
+            batch = list(rows.values_list("pk", flat=True)[:options["batch_size"]])
+            if not batch:
+                break
+            deleted += PhoneOTP.objects.filter(pk__in=batch).delete()[0]
+            self.stdout.write(f"{deleted} OTP rows deleted")
+
+        self.stdout.write(self.style.SUCCESS(f"Done: {deleted} OTP rows deleted"))
@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from spindoapp.models import Billing, GstContribution, GstMonthlySummary
+from spindoapp.utils_gst import ZERO, contributions_for
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes every bill's GST contributions and the monthly summary from "
+        "bill_item, and reports where the stored summary differed. Run it while "
+        "bills are not being edited. --check only reports."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--check", action="store_true", help="Report differences without writing")
+
+    def handle(self, *args, **options):
+        expected = {}  # key -> [taxable, cgst, sgst, bill_count]
+        bills = Billing.objects.only("id", "bill_item", "dated_date", "created_at").order_by("id")
+        last_pk = 0
+        processed = 0
+
+        while True:
+            batch = list(bills.filter(id__gt=last_pk)[:options["batch_size"]])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            rows = []
+            for bill in batch:
+                for key, values in contributions_for(bill).items():
+                    totals = expected.setdefault(key, [*ZERO, 0])
+                    for i, value in enumerate(values):
+                        totals[i] += value
+                    totals[3] += 1
+                    month, hsn, cgst_rate, sgst_rate = key
+                    rows.append(GstContribution(
+                        bill_id=bill.pk, month=month, hsn=hsn, cgst_rate=cgst_rate, sgst_rate=sgst_rate,
+                        taxable=values[0], cgst=values[1], sgst=values[2],
+                    ))
+
+            if not options["check"]:
+                with transaction.atomic():
+                    GstContribution.objects.filter(bill_id__in=[bill.pk for bill in batch]).delete()
+                    GstContribution.objects.bulk_create(rows)
+            processed += len(batch)
+
+        stored = {
+            (row.month, row.hsn, row.cgst_rate, row.sgst_rate): [row.taxable, row.cgst, row.sgst, row.bill_count]
+            for row in GstMonthlySummary.objects.all()
+        }
+        differences = 0
+        for key in sorted(expected.keys() | stored.keys()):
+            if expected.get(key) != stored.get(key):
+                differences += 1
+                month, hsn, cgst_rate, sgst_rate = key
+                self.stdout.write(
+                    f"{month:%Y-%m} {hsn or '-'} {cgst_rate}+{sgst_rate}%: "
+                    f"stored {stored.get(key)}, expected {expected.get(key)}"
+                )
+
+        if not options["check"]:
+            with transaction.atomic():
+                GstMonthlySummary.objects.all().delete()
+                GstMonthlySummary.objects.bulk_create([
+                    GstMonthlySummary(
+                        month=month, hsn=hsn, cgst_rate=cgst_rate, sgst_rate=sgst_rate,
+                        taxable=taxable, cgst=cgst, sgst=sgst, bill_count=bill_count,
+                    )
+                    for (month, hsn, cgst_rate, sgst_rate), (taxable, cgst, sgst, bill_count) in expected.items()
+                ])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{processed} bills, {len(expected)} summary rows, {differences} differences"
+            + ("" if options["check"] else " (rebuilt)")
+        ))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from spindoapp.models import Billing
+from spindoapp.utils_billing import bill_fingerprint, bill_snapshot
+from spindoapp.utils_render import WINDOW_PER_WORKER, new_pool, pdf_path, render_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Checks every bill PDF against the bill's fingerprint and re-renders "
+        "stale or missing PDFs in worker processes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Re-render every bill")
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be rendered")
+        parser.add_argument("--workers", type=int, default=4)
+
+    def handle(self, *args, **options):
+        counts = {"checked": 0, "stale": 0, "missing": 0}
+
+        def outdated():
+            for bill in Billing.objects.order_by("id").iterator(chunk_size=500):
+                counts["checked"] += 1
+                if pdf_path(bill) is None:
+                    counts["missing"] += 1
+                elif options["force"] or bill.render_fingerprint != bill_fingerprint(bill_snapshot(bill)):
+                    counts["stale"] += 1
+                else:
+                    continue
+                yield bill
+
+        if options["dry_run"]:
+            for bill in outdated():
+                self.stdout.write(f"{bill.bill_id}: {'missing' if pdf_path(bill) is None else 'stale'}")
+        else:
+            failed = []
+            with new_pool(options["workers"]) as pool:
+                for bill in render_batch(outdated(), pool, WINDOW_PER_WORKER * options["workers"]):
+                    if bill.render_status == "failed":
+                        failed.append(bill)
+                        self.stderr.write(f"{bill.bill_id}: {bill.render_error}")
+            counts["failed"] = len(failed)
+
+        self.stdout.write(self.style.SUCCESS(
+            ", ".join(f"{key} {value}" for key, value in counts.items())
+        ))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from spindoapp.utils_geography import DATASET_PATH, load_dataset, seed_district_blocks
+
+
+class Command(BaseCommand):
+    help = (
+        "Brings DistrictBlock in line with the geography dataset in one "
+        "transaction: missing rows are bulk-created and rows no longer in the "
+        "dataset deleted. Safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--file", default=DATASET_PATH, help="district_blocks.json to load")
+        parser.add_argument("--keep-extra", action="store_true", help="Do not delete rows missing from the dataset")
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would change")
+
+    def handle(self, *args, **options):
+        counts = seed_district_blocks(
+            load_dataset(options["file"]),
+            prune=not options["keep_extra"],
+            dry_run=options["dry_run"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            ", ".join(f"{key} {value}" for key, value in counts.items())
+            + (" (dry run)" if options["dry_run"] else "")
+        ))
@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from spindoapp.utils_sms import get_gateway, process_queue, purge_finished_messages
+
+PURGE_INTERVAL_SECONDS = 3600
+
+
+class Command(BaseCommand):
+    help = (
+        "Delivers queued outbound SMS (OutboundMessage rows). Runs until "
+        "stopped, or until the queue is drained with --once. Sent and failed "
+        "messages older than SMS_RETENTION_DAYS are deleted at start and then hourly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Exit when no message is due")
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--workers", type=int, help="Gateway calls in flight (default: SMS_WORKERS)")
+        parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds to sleep when idle")
+        parser.add_argument("--gateway", choices=["bulksms", "fake"], help="Override SMS_GATEWAY")
+        parser.add_argument("--retention-days", type=int, help="Override SMS_RETENTION_DAYS")
+
+    def handle(self, *args, **options):
+        gateway = get_gateway(options["gateway"])
+        totals = {"sent": 0, "retry": 0, "failed": 0}
+        purged_at = None
+
+        try:
+            while True:
+                if purged_at is None or time.monotonic() - purged_at >= PURGE_INTERVAL_SECONDS:
+                    purged = purge_finished_messages(options["retention_days"])
+                    purged_at = time.monotonic()
+                    if purged:
+                        self.stdout.write(f"purged {purged} finished messages")
+
+                counts = process_queue(gateway, options["batch_size"], options["workers"])
+                for key, value in counts.items():
+                    totals[key] += value
+
+                if any(counts.values()):
+                    self.stdout.write(
+                        f"sent {counts['sent']}, retry {counts['retry']}, failed {counts['failed']}"
+                    )
+                    continue
+
+                if options["once"]:
+                    break
+                if not gateway.available():
+                    self.stdout.write("SMS gateway circuit is open, waiting")
+                time.sleep(options["poll_interval"])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Total: sent {totals['sent']}, retry {totals['retry']}, failed {totals['failed']}"
+        ))
+        stats = gateway.stats.snapshot()
+        self.stdout.write(
+            "Gateway: " + ", ".join(f"{key} {value}" for key, value in stats.items())
+            + f", circuit {gateway.breaker.state}"
+        )
@@ -0,0 +1,86 @@
+import multiprocessing
+import random
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from spindoapp.models import AllLog, RegisteredCustomer
+from spindoapp.serializers import CustomerRegistrationSerializer
+from spindoapp.utils_sequence import DEFAULT_BLOCK_SIZE
+
+
+def _register_customers(args):
+    worker, count, tag = args
+    created = []
+    errors = []
+
+    for i in range(count):
+        serializer = CustomerRegistrationSerializer(data={
+            "username": f"stress-{tag}-{worker}-{i}",
+            "mobile_number": f"9{tag}{worker:02d}{i:04d}",
+            "password": "stress-test",
+            "state": "Uttarakhand",
+            "district": "Dehradun",
+            "block": "Raipur",
+        })
+        try:
+            if serializer.is_valid():
+                created.append(serializer.save().unique_id)
+            else:
+                errors.append(str(serializer.errors))
+        except Exception as exc:
+            errors.append(str(exc))
+
+    connections.close_all()
+    return created, errors
+
+
+class Command(BaseCommand):
+    help = (
+        "Registers customers from several parallel worker processes and checks "
+        "that the allocated USER- IDs contain no duplicates and no gaps beyond "
+        "the blocks reserved by the workers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--per-worker", type=int, default=25)
+        parser.add_argument("--keep", action="store_true", help="Keep the generated customers")
+
+    def handle(self, *args, **options):
+        workers = options["workers"]
+        per_worker = options["per_worker"]
+        block_size = getattr(settings, "ID_SEQUENCE_BLOCK_SIZE", DEFAULT_BLOCK_SIZE)
+        tag = f"{random.randint(0, 9999):04d}"
+
+        # Children must open their own connections
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        with context.Pool(workers) as pool:
+            results = pool.map(_register_customers, [(w, per_worker, tag) for w in range(workers)])
+
+        unique_ids = [uid for created, _ in results for uid in created]
+        errors = [error for _, worker_errors in results for error in worker_errors]
+        numbers = sorted(int(uid.split("-")[1]) for uid in unique_ids)
+
+        try:
+            self.stdout.write(f"Registered {len(unique_ids)} customers, {len(errors)} errors")
+            for error in errors[:10]:
+                self.stdout.write(f"  {error}")
+
+            duplicates = len(numbers) - len(set(numbers))
+            span = numbers[-1] - numbers[0] + 1 if numbers else 0
+            unused = span - len(set(numbers))
+            allowed = workers * block_size
+
+            self.stdout.write(f"Duplicates: {duplicates}")
+            self.stdout.write(f"Unused numbers in range: {unused} (allowed < {allowed})")
+
+            if errors or duplicates or unused >= allowed:
+                raise CommandError("ID allocation stress test failed")
+            self.stdout.write(self.style.SUCCESS("ID allocation stress test passed"))
+        finally:
+            if not options["keep"]:
+                AllLog.objects.filter(unique_id__in=unique_ids).delete()
+                RegisteredCustomer.objects.filter(unique_id__in=unique_ids).delete()
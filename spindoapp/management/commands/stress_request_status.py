@@ -0,0 +1,120 @@
+import random
+import threading
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from spindoapp.models import ServiceAssignment, ServiceRequestByUser
+from spindoapp.utils_state import (
+    CANCELLED, COMPLETED, COUNTERS, OPEN, TransitionConflict, TransitionError, add_open_assignments, cancel_request,
+    count_uncovered, derive_status, set_assignment_status,
+)
+
+
+def _hammer(request_pk, vendor_ids, rounds, seed, totals, lock):
+    rng = random.Random(seed)
+    service_request = ServiceRequestByUser(pk=request_pk)
+    outcome = Counter()
+
+    try:
+        for _ in range(rounds):
+            vendor_id = rng.choice(vendor_ids)
+            target = rng.choices((COMPLETED, OPEN, CANCELLED), weights=(6, 3, 1))[0]
+            try:
+                if target == CANCELLED:
+                    changed = cancel_request(service_request, [vendor_id])
+                else:
+                    changed = set_assignment_status(service_request, vendor_id, target)
+                outcome["written" if changed else "unchanged"] += 1
+            except TransitionError:
+                outcome["rejected"] += 1
+            except TransitionConflict:
+                outcome["gave up"] += 1
+            except Exception as exc:
+                outcome[f"error: {exc}"] += 1
+    finally:
+        connections.close_all()
+        with lock:
+            totals.update(outcome)
+
+
+class Command(BaseCommand):
+    help = (
+        "Changes the assignments of one service request from many threads at "
+        "once and checks that its version, counters (uncovered services "
+        "included) and status agree with its assignment rows afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--vendors", type=int, default=8, help="Assignments on the request")
+        parser.add_argument("--rounds", type=int, default=50, help="Transitions per thread")
+        parser.add_argument("--keep", action="store_true", help="Keep the generated request")
+
+    def handle(self, *args, **options):
+        tag = f"{random.randint(0, 9999):04d}"
+        vendor_ids = [f"STRESS-{tag}-{i:03d}" for i in range(options["vendors"])]
+        # Pairs of vendors share a service, so coverage depends on both
+        services = [f"service-{i // 2}" for i in range(len(vendor_ids))]
+        service_request = ServiceRequestByUser.objects.create(
+            username=f"stress-{tag}", description="stress_request_status", request_for_services=sorted(set(services)),
+            uncovered_count=len(set(services)),
+        )
+        ServiceAssignment.objects.bulk_create([
+            ServiceAssignment(service_request=service_request, vendor_unique_id=vendor_id, services=[service])
+            for vendor_id, service in zip(vendor_ids, services)
+        ])
+        add_open_assignments({service_request.pk: len(vendor_ids)})
+
+        totals = Counter()
+        lock = threading.Lock()
+        threads = [
+            threading.Thread(
+                target=_hammer, args=(service_request.pk, vendor_ids, options["rounds"], f"{tag}-{worker}", totals, lock)
+            )
+            for worker in range(options["threads"])
+        ]
+
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            for name, count in sorted(totals.items()):
+                self.stdout.write(f"{name}: {count}")
+
+            service_request.refresh_from_db()
+            rows = list(service_request.service_assignments.values_list("status", "services"))
+            actual = Counter(status for status, _ in rows)
+            stored = {status: getattr(service_request, field) for status, field in COUNTERS.items()}
+            uncovered = count_uncovered(
+                service_request.request_for_services,
+                [services for status, services in rows if status in (COMPLETED, CANCELLED)]
+            )
+            expected_status = derive_status(
+                actual[OPEN], actual[COMPLETED], actual[CANCELLED], uncovered, service_request.status
+            )
+            # One version for creating the assignments, one per written transition
+            expected_version = 1 + totals["written"]
+
+            self.stdout.write(f"Assignments: {dict(actual)}  counters: {stored}")
+            self.stdout.write(f"Uncovered services: {service_request.uncovered_count} (expected {uncovered})")
+            self.stdout.write(f"Status: {service_request.status} (expected {expected_status})")
+            self.stdout.write(f"Version: {service_request.version} (expected {expected_version})")
+
+            failed = (
+                any(actual[status] != count for status, count in stored.items())
+                or service_request.uncovered_count != uncovered
+                or service_request.status != expected_status
+                or service_request.version != expected_version
+                or sum(totals.values()) != options["threads"] * options["rounds"]
+                or any(name.startswith("error") for name in totals)
+            )
+            if failed:
+                raise CommandError("Service request status stress test failed")
+            self.stdout.write(self.style.SUCCESS("Service request status stress test passed"))
+        finally:
+            if not options["keep"]:
+                service_request.delete()
@@ -0,0 +1,49 @@
+# Generated by Django 4.2 on 2026-10-18 12:44
+
+import re
+
+from django.db import migrations, models
+
+
+SERIES = (
+    ("customer", "RegisteredCustomer", "unique_id"),
+    ("staffadmin", "StaffAdmin", "unique_id"),
+    ("vendor", "Vendor", "unique_id"),
+    ("customer_issue", "CustomerIssue", "query_id"),
+    ("service_request", "ServiceRequestByUser", "request_id"),
+    ("staff_issue", "StaffIssue", "query_id"),
+    ("solar_query", "SolarInstallationQuery", "query_id"),
+)
+
+
+def seed_sequences(apps, schema_editor):
+    IdSequence = apps.get_model("spindoapp", "IdSequence")
+
+    for name, model_name, field in SERIES:
+        model = apps.get_model("spindoapp", model_name)
+        highest = 0
+        values = model.objects.exclude(**{f"{field}__isnull": True}).values_list(field, flat=True)
+        for value in values.iterator():
+            match = re.search(r"(\d+)$", value)
+            if match:
+                highest = max(highest, int(match.group(1)))
+        IdSequence.objects.update_or_create(name=name, defaults={"last_value": highest})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spindoapp', '0022_billing_bill_pdf'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_value', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2 on 2026-10-18 12:45
+
+import re
+
+from django.db import migrations, models
+
+
+BATCH_SIZE = 1000
+
+
+def backfill_query_numbers(apps, schema_editor):
+    VendorRequest = apps.get_model("spindoapp", "VendorRequest")
+    IdSequence = apps.get_model("spindoapp", "IdSequence")
+
+    used = set()
+    pending = []
+    missing = []
+
+    for req in VendorRequest.objects.order_by("id").only("id", "query_id").iterator():
+        match = re.search(r"\d+", req.query_id or "")
+        number = int(match.group()) if match else None
+        if number is None or number in used:
+            missing.append(req)
+            continue
+        used.add(number)
+        req.query_number = number
+        pending.append(req)
+
+    # Rows without a parsable (or with a clashing) query_id get fresh numbers
+    next_number = max(used, default=0)
+    for req in missing:
+        next_number += 1
+        req.query_number = next_number
+        req.query_id = f"QUERY-{next_number:03d}"
+        pending.append(req)
+
+    VendorRequest.objects.bulk_update(pending, ["query_number", "query_id"], batch_size=BATCH_SIZE)
+    IdSequence.objects.update_or_create(name="vendor_request", defaults={"last_value": next_number})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spindoapp', '0023_idsequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vendorrequest',
+            name='query_number',
+            field=models.PositiveIntegerField(blank=True, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_query_numbers, migrations.RunPython.noop),
+    ]
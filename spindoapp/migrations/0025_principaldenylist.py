@@ -0,0 +1,22 @@
+# Generated by Django 4.2 on 2026-10-18 12:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spindoapp', '0024_vendorrequest_query_number'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrincipalDenylist',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.IntegerField(unique=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('revoked_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2 on 2026-10-18 12:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spindoapp', '0025_principaldenylist'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='billing',
+            index=models.Index(fields=['created_at', 'id'], name='billing_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contactus',
+            index=models.Index(fields=['created_at', 'id'], name='contactus_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customerissue',
+            index=models.Index(fields=['created_at', 'id'], name='customerissue_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registeredcustomer',
+            index=models.Index(fields=['created_at', 'id'], name='customer_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicebill',
+            index=models.Index(fields=['created_at', 'id'], name='servicebill_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequestbyuser',
+            index=models.Index(fields=['created_at', 'id'], name='servicerequest_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='solarinstallationquery',
+            index=models.Index(fields=['created_at', 'id'], name='solarquery_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='staffadmin',
+            index=models.Index(fields=['created_at', 'id'], name='staffadmin_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='staffissue',
+            index=models.Index(fields=['created_at', 'id'], name='staffissue_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vendor',
+            index=models.Index(fields=['created_at', 'id'], name='vendor_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vendorrequest',
+            index=models.Index(fields=['created_at', 'id'], name='vendorrequest_created_idx'),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 4.2 on 2026-10-18 12:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+BATCH_SIZE = 1000
+
+
+def assignments_to_rows(apps, schema_editor):
+    ServiceRequestByUser = apps.get_model("spindoapp", "ServiceRequestByUser")
+    ServiceAssignment = apps.get_model("spindoapp", "ServiceAssignment")
+
+    rows = []
+    requests = ServiceRequestByUser.objects.only("id", "assignments")
+    for service_request in requests.iterator():
+        seen = set()
+        for entry in service_request.assignments or []:
+            # [services_list, vendor_unique_id, vendor_name, status, vendor_phone]
+            if not isinstance(entry, list) or len(entry) < 2 or entry[1] in seen:
+                continue
+            seen.add(entry[1])
+            rows.append(ServiceAssignment(
+                service_request_id=service_request.id,
+                vendor_unique_id=entry[1],
+                services=entry[0] if isinstance(entry[0], list) else [],
+                vendor_name=entry[2] if len(entry) > 2 else None,
+                status=(entry[3] if len(entry) > 3 and entry[3] else "assigned")[:20],
+                vendor_phone=entry[4] if len(entry) > 4 else None,
+            ))
+        if len(rows) >= BATCH_SIZE:
+            ServiceAssignment.objects.bulk_create(rows)
+            rows = []
+    ServiceAssignment.objects.bulk_create(rows)
+
+
+def rows_to_assignments(apps, schema_editor):
+    ServiceRequestByUser = apps.get_model("spindoapp", "ServiceRequestByUser")
+    ServiceAssignment = apps.get_model("spindoapp", "ServiceAssignment")
+
+    entries = {}
+    for row in ServiceAssignment.objects.order_by("id").iterator():
+        entries.setdefault(row.service_request_id, []).append(
+            [row.services, row.vendor_unique_id, row.vendor_name, row.status, row.vendor_phone]
+        )
+    for request_id, assignments in entries.items():
+        ServiceRequestByUser.objects.filter(id=request_id).update(assignments=assignments)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spindoapp', '0026_list_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceAssignment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vendor_unique_id', models.CharField(max_length=50)),
+                ('services', models.JSONField(blank=True, default=list)),
+                ('status', models.CharField(choices=[('assigned', 'Assigned'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], default='assigned', max_length=20)),
+                ('vendor_name', models.CharField(blank=True, max_length=150, null=True)),
+                ('vendor_phone', models.CharField(blank=True, max_length=15, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('service_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='service_assignments', to='spindoapp.servicerequestbyuser')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='serviceassignment',
+            index=models.Index(fields=['vendor_unique_id', 'status'], name='assignment_vendor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serviceassignment',
+            index=models.Index(fields=['status'], name='assignment_status_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='serviceassignment',
+            unique_together={('service_request', 'vendor_unique_id')},
+        ),
+        migrations.RunPython(assignments_to_rows, rows_to_assignments),
+        migrations.RemoveField(
+            model_name='servicerequestbyuser',
+            name='assignments',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 12:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spindoapp', '0027_serviceassignment'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='servicerequestbyuser',
+            name='request_id',
+            field=models.CharField(blank=True, db_index=True, max_length=20),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2 on 2026-10-18 12:56
+
+from django.db import migrations, models
+
+
+def mark_rendered_bills_ready(apps, schema_editor):
+    # Bills rendered by the old synchronous code already have their PDF
+    Billing = apps.get_model("spindoapp", "Billing")
+    Billing.objects.exclude(bill_pdf__isnull=True).exclude(bill_pdf="").update(render_status="ready")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spindoapp', '0029_outboundmessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='billing',
+            name='render_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='billing',
+            name='render_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='billing',
+            name='render_token',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='billing',
+            name='rendered_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_rendered_bills_ready, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 12:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spindoapp', '0030_billing_render_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='billing',
+            name='render_fingerprint',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
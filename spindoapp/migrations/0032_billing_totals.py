@@ -0,0 +1,37 @@
+# Generated by Django 4.2 on 2026-10-18 13:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spindoapp', '0031_billing_render_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='billing',
+            name='cgst_total',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True),
+        ),
+        migrations.AddField(
+            model_name='billing',
+            name='grand_total',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True),
+        ),
+        migrations.AddField(
+            model_name='billing',
+            name='sgst_total',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True),
+        ),
+        migrations.AddField(
+            model_name='billing',
+            name='taxable_total',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='billing',
+            index=models.Index(fields=['grand_total', 'id'], name='billing_grand_total_idx'),
+        ),
+    ]
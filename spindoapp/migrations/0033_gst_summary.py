@@ -0,0 +1,48 @@
+# Generated by Django 4.2 on 2026-10-18 13:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spindoapp', '0032_billing_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GstMonthlySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('hsn', models.CharField(blank=True, default='', max_length=20)),
+                ('cgst_rate', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('sgst_rate', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('taxable', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('cgst', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('sgst', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('bill_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('month', 'hsn', 'cgst_rate', 'sgst_rate')},
+            },
+        ),
+        migrations.CreateModel(
+            name='GstContribution',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('hsn', models.CharField(blank=True, default='', max_length=20)),
+                ('cgst_rate', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('sgst_rate', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('taxable', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('cgst', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('sgst', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('bill', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gst_contributions', to='spindoapp.billing')),
+            ],
+            options={
+                'unique_together': {('bill', 'month', 'hsn', 'cgst_rate', 'sgst_rate')},
+            },
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 4.2 on 2026-10-18 13:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+from collections import Counter
+
+
+BATCH_SIZE = 1000
+
+LINKED_MODELS = ("RegisteredCustomer", "Vendor", "ServiceRequestByUser")
+
+
+def _fold(name):
+    return " ".join(str(name or "").split()).casefold()
+
+
+def link_district_blocks(apps, schema_editor):
+    DistrictBlock = apps.get_model("spindoapp", "DistrictBlock")
+    ids = {}
+    for pk, district, block in DistrictBlock.objects.order_by("id").values_list("id", "district", "block"):
+        ids.setdefault((_fold(district), _fold(block)), pk)
+
+    for model_name in LINKED_MODELS:
+        model = apps.get_model("spindoapp", model_name)
+        pending, unmapped = [], Counter()
+        for row in model.objects.order_by("id").only("id", "district", "block").iterator(chunk_size=BATCH_SIZE):
+            pk = ids.get((_fold(row.district), _fold(row.block)))
+            if pk is None:
+                unmapped[(row.district, row.block)] += 1
+            else:
+                row.district_block_id = pk
+                pending.append(row)
+        model.objects.bulk_update(pending, ["district_block"], batch_size=BATCH_SIZE)
+
+        # Left unlinked; fix the text (or seed DistrictBlock) and run link_district_blocks
+        if unmapped:
+            print(f"\n  {model_name}: linked {len(pending)}, unmapped {sum(unmapped.values())}")
+            for (district, block), count in unmapped.most_common(20):
+                print(f"    {district!r} / {block!r}: {count}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spindoapp', '0033_gst_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registeredcustomer',
+            name='district_block',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='customers', to='spindoapp.districtblock'),
+        ),
+        migrations.AddField(
+            model_name='servicerequestbyuser',
+            name='district_block',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='service_requests', to='spindoapp.districtblock'),
+        ),
+        migrations.AddField(
+            model_name='vendor',
+            name='district_block',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='vendors', to='spindoapp.districtblock'),
+        ),
+        migrations.AddIndex(
+            model_name='registeredcustomer',
+            index=models.Index(fields=['district_block', 'created_at', 'id'], name='customer_region_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequestbyuser',
+            index=models.Index(fields=['district_block', 'created_at', 'id'], name='servicerequest_region_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vendor',
+            index=models.Index(fields=['district_block', 'created_at', 'id'], name='vendor_region_idx'),
+        ),
+        migrations.RunPython(link_district_blocks, migrations.RunPython.noop),
+    ]
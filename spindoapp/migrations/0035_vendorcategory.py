@@ -0,0 +1,110 @@
+# Generated by Django 4.2 on 2026-10-18 13:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+
+BATCH_SIZE = 1000
+
+# Parsing of Vendor.category copied from utils_vendors as it was when this
+# migration was written; it must not follow later edits of the app.
+_CATEGORY_KEYS = ("category", "prod_cate", "name")
+_SUB_KEYS = ("subcategories", "sub_categories", "subcategory", "sub_category", "sub_cate")
+
+
+def _clean(name):
+    return " ".join(str(name).split()) if name is not None else ""
+
+
+def _fold(name):
+    return _clean(name).casefold()
+
+
+def _as_list(value):
+    if value is None or value is True or value is False:
+        return []
+    if isinstance(value, (list, tuple, set)):
+        return list(value)
+    if isinstance(value, dict):
+        return [key for key, enabled in value.items() if enabled]
+    return [value]
+
+
+def category_pairs(value):
+    entries = []
+    if isinstance(value, dict):
+        entries = list(value.items())
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            if isinstance(item, dict):
+                category = next((item[key] for key in _CATEGORY_KEYS if key in item), None)
+                subs = next((item[key] for key in _SUB_KEYS if key in item), None)
+                entries.append((category, subs))
+            else:
+                entries.append((item, None))
+    elif value:
+        entries = [(value, None)]
+
+    pairs = set()
+    for category, subs in entries:
+        category = _clean(category)
+        if not category:
+            continue
+        names = [_clean(sub) for sub in _as_list(subs) if _clean(sub)]
+        for sub in names or [""]:
+            pairs.add((category, sub))
+    return pairs
+
+
+def convert_vendor_categories(apps, schema_editor):
+    Vendor = apps.get_model("spindoapp", "Vendor")
+    VendorCategory = apps.get_model("spindoapp", "VendorCategory")
+    ServiceCategory = apps.get_model("spindoapp", "ServiceCategory")
+
+    # Spelling of the published catalogue, as utils_vendors.canonical_pair
+    names, subs = {}, {}
+    published = ServiceCategory.objects.filter(status="published").values_list("prod_cate", "sub_cate").distinct()
+    for category, sub_category in published:
+        names.setdefault(_fold(category), category)
+        subs.setdefault((_fold(category), _fold(sub_category)), sub_category)
+
+    rows = []
+    for vendor in Vendor.objects.order_by("id").only("id", "category").iterator(chunk_size=BATCH_SIZE):
+        pairs = set()
+        for category, sub_category in category_pairs(vendor.category):
+            key = _fold(category)
+            pairs.add((names.get(key, category), subs.get((key, _fold(sub_category)), sub_category)))
+        rows.extend(
+            VendorCategory(vendor_id=vendor.pk, category=category, sub_category=sub_category)
+            for category, sub_category in pairs
+        )
+    VendorCategory.objects.bulk_create(rows, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spindoapp', '0034_district_block_links'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendorCategory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(max_length=255)),
+                ('sub_category', models.CharField(blank=True, default='', max_length=255)),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='service_categories', to='spindoapp.vendor')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='vendorcategory',
+            index=models.Index(fields=['category', 'sub_category', 'vendor'], name='vendorcategory_lookup_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='vendorcategory',
+            unique_together={('vendor', 'category', 'sub_category')},
+        ),
+        migrations.RunPython(convert_vendor_categories, migrations.RunPython.noop),
+    ]
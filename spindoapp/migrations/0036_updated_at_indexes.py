@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-18 13:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spindoapp', '0035_vendorcategory'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='serviceassignment',
+            index=models.Index(fields=['updated_at'], name='assignment_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequestbyuser',
+            index=models.Index(fields=['updated_at'], name='servicerequest_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vendor',
+            index=models.Index(fields=['updated_at'], name='vendor_updated_idx'),
+        ),
+    ]
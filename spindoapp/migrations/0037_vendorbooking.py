@@ -0,0 +1,68 @@
+# Generated by Django 4.2 on 2026-10-18 13:15
+
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+BATCH_SIZE = 1000
+DEFAULT_SLOT_MINUTES = 120
+
+
+def slot_for(schedule_date, schedule_time):
+    # Copied from utils_calendar as it was when this migration was written
+    if schedule_time is None:
+        return time.min, time.max
+    minutes = getattr(settings, "VENDOR_SLOT_MINUTES", DEFAULT_SLOT_MINUTES)
+    end = datetime.combine(schedule_date, schedule_time) + timedelta(minutes=minutes)
+    return schedule_time, end.time() if end.date() == schedule_date else time.max
+
+
+def book_open_assignments(apps, schema_editor):
+    ServiceAssignment = apps.get_model("spindoapp", "ServiceAssignment")
+    VendorBooking = apps.get_model("spindoapp", "VendorBooking")
+
+    open_assignments = ServiceAssignment.objects.filter(
+        status="assigned", service_request__schedule_date__isnull=False
+    ).exclude(service_request__status__in=("completed", "cancelled")).values_list(
+        "service_request_id", "vendor_unique_id", "service_request__schedule_date", "service_request__schedule_time"
+    )
+    bookings = []
+    for request_pk, vendor_id, schedule_date, schedule_time in open_assignments.iterator(chunk_size=BATCH_SIZE):
+        start, end = slot_for(schedule_date, schedule_time)
+        bookings.append(VendorBooking(
+            service_request_id=request_pk, vendor_unique_id=vendor_id, date=schedule_date, start_time=start, end_time=end
+        ))
+    VendorBooking.objects.bulk_create(bookings, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spindoapp', '0036_updated_at_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendorBooking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vendor_unique_id', models.CharField(max_length=50)),
+                ('date', models.DateField()),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('service_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to='spindoapp.servicerequestbyuser')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='vendorbooking',
+            index=models.Index(fields=['vendor_unique_id', 'date', 'start_time'], name='booking_vendor_date_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='vendorbooking',
+            unique_together={('service_request', 'vendor_unique_id')},
+        ),
+        migrations.RunPython(book_open_assignments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2 on 2026-10-18 13:18
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+BATCH_SIZE = 1000
+COUNTERS = {"assigned": "open_count", "completed": "completed_count", "cancelled": "cancelled_count"}
+
+
+def count_assignments(apps, schema_editor):
+    ServiceAssignment = apps.get_model("spindoapp", "ServiceAssignment")
+    ServiceRequestByUser = apps.get_model("spindoapp", "ServiceRequestByUser")
+
+    counters = {}
+    grouped = ServiceAssignment.objects.values("service_request_id", "status").annotate(n=Count("id")).order_by()
+    for row in grouped:
+        if row["status"] in COUNTERS:
+            counters.setdefault(row["service_request_id"], {})[COUNTERS[row["status"]]] = row["n"]
+
+    ServiceRequestByUser.objects.bulk_update(
+        [ServiceRequestByUser(pk=pk, **{field: counts.get(field, 0) for field in COUNTERS.values()})
+         for pk, counts in counters.items()],
+        list(COUNTERS.values()),
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spindoapp', '0037_vendorbooking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicerequestbyuser',
+            name='cancelled_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='servicerequestbyuser',
+            name='completed_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='servicerequestbyuser',
+            name='open_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='servicerequestbyuser',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_assignments, migrations.RunPython.noop),
+    ]
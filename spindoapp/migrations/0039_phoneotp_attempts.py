@@ -0,0 +1,22 @@
+# Generated by Django 4.2 on 2026-10-18 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spindoapp', '0038_servicerequest_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='phoneotp',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='phoneotp',
+            index=models.Index(fields=['updated_at'], name='phone_otp_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 13:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spindoapp', '0039_phoneotp_attempts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='outboundmessage',
+            index=models.Index(fields=['status', 'updated_at'], name='outbound_finished_idx'),
+        ),
+    ]
@@ -0,0 +1,122 @@
+"""
+Fills GstContribution for bills created before 0033 and rebuilds
+GstMonthlySummary from the contributions, so the GST report covers every
+bill straight after migrating. Bills that already have contributions are
+left alone, so running after rebuild_gst_summary changes nothing.
+
+The line-item arithmetic is copied from utils_totals as it was when this
+migration was written; it must not follow later edits of the app.
+"""
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from django.db import migrations
+from django.db.models import Count, Sum
+
+
+BATCH_SIZE = 500
+PAISE = Decimal("0.01")
+ZERO = Decimal("0")
+
+
+def _number(value):
+    if value is None or value == "":
+        return ZERO
+    if isinstance(value, bool):
+        raise ValueError(value)
+    try:
+        number = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(value)
+    if not number.is_finite():
+        raise ValueError(value)
+    return number
+
+
+def _money(value):
+    return value.quantize(PAISE, rounding=ROUND_HALF_UP)
+
+
+def _contributions(bill):
+    """{(month, hsn, cgst_rate, sgst_rate): [taxable, cgst, sgst]}; {} for a malformed bill_item."""
+    day = bill.dated_date or bill.created_at.date()
+    month = day.replace(day=1)
+    groups = {}
+    try:
+        for item in bill.bill_item or []:
+            if not isinstance(item, (list, tuple)) or not item:
+                raise ValueError(item)
+
+            def at(index):
+                return item[index] if len(item) > index else None
+
+            amount = at(4)
+            amount = _money(_number(at(2)) * _number(at(3)) if amount is None or amount == "" else _number(amount))
+            cgst_rate, sgst_rate = _number(at(5)), _number(at(7))
+            cgst = at(6)
+            cgst = _money(amount * cgst_rate / 100 if cgst is None or cgst == "" else _number(cgst))
+            sgst = at(8)
+            sgst = _money(amount * sgst_rate / 100 if sgst is None or sgst == "" else _number(sgst))
+
+            hsn = at(1) if at(1) is not None else ""
+            key = (month, str(hsn).strip()[:20], cgst_rate.quantize(PAISE), sgst_rate.quantize(PAISE))
+            totals = groups.setdefault(key, [Decimal("0.00")] * 3)
+            totals[0] += amount
+            totals[1] += cgst
+            totals[2] += sgst
+    except ValueError:
+        return {}
+    return groups
+
+
+def backfill(apps, schema_editor):
+    Billing = apps.get_model("spindoapp", "Billing")
+    GstContribution = apps.get_model("spindoapp", "GstContribution")
+    GstMonthlySummary = apps.get_model("spindoapp", "GstMonthlySummary")
+
+    bills = (
+        Billing.objects.filter(gst_contributions__isnull=True)
+        .only("id", "bill_item", "dated_date", "created_at").order_by("id")
+    )
+    last_pk = 0
+    while True:
+        batch = list(bills.filter(id__gt=last_pk)[:BATCH_SIZE])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        GstContribution.objects.bulk_create([
+            GstContribution(
+                bill_id=bill.pk, month=month, hsn=hsn, cgst_rate=cgst_rate, sgst_rate=sgst_rate,
+                taxable=taxable, cgst=cgst, sgst=sgst,
+            )
+            for bill in batch
+            for (month, hsn, cgst_rate, sgst_rate), (taxable, cgst, sgst) in _contributions(bill).items()
+        ])
+
+    # One contribution row per bill and key, so the summary is their sum
+    totals = (
+        GstContribution.objects.values("month", "hsn", "cgst_rate", "sgst_rate")
+        .annotate(total_taxable=Sum("taxable"), total_cgst=Sum("cgst"), total_sgst=Sum("sgst"), bills=Count("id"))
+        .order_by()
+    )
+    GstMonthlySummary.objects.all().delete()
+    GstMonthlySummary.objects.bulk_create(
+        [
+            GstMonthlySummary(
+                month=row["month"], hsn=row["hsn"], cgst_rate=row["cgst_rate"], sgst_rate=row["sgst_rate"],
+                taxable=row["total_taxable"], cgst=row["total_cgst"], sgst=row["total_sgst"], bill_count=row["bills"],
+            )
+            for row in totals
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spindoapp', '0040_outbound_finished_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
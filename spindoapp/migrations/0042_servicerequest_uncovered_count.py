@@ -0,0 +1,51 @@
+# Generated by Django 4.2 on 2026-10-18 15:02
+
+import json
+
+from django.db import migrations, models
+
+
+BATCH_SIZE = 1000
+CLOSED = ("completed", "cancelled")
+
+
+def _service_key(service):
+    # Copied from utils_state as it was when this migration was written
+    return json.dumps(service, sort_keys=True, default=str)
+
+
+def count_uncovered_services(apps, schema_editor):
+    ServiceAssignment = apps.get_model("spindoapp", "ServiceAssignment")
+    ServiceRequestByUser = apps.get_model("spindoapp", "ServiceRequestByUser")
+
+    covered = {}
+    closed = ServiceAssignment.objects.filter(status__in=CLOSED).values_list("service_request_id", "services")
+    for request_pk, services in closed.iterator(chunk_size=BATCH_SIZE):
+        covered.setdefault(request_pk, set()).update(_service_key(service) for service in services or [])
+
+    pending = []
+    requests = ServiceRequestByUser.objects.order_by("id").only("id", "request_for_services")
+    for service_request in requests.iterator(chunk_size=BATCH_SIZE):
+        keys = covered.get(service_request.pk, set())
+        service_request.uncovered_count = sum(
+            1 for service in service_request.request_for_services or [] if _service_key(service) not in keys
+        )
+        if service_request.uncovered_count:
+            pending.append(service_request)
+    ServiceRequestByUser.objects.bulk_update(pending, ["uncovered_count"], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spindoapp', '0041_backfill_gst_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicerequestbyuser',
+            name='uncovered_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_uncovered_services, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-18 15:40
+
+from django.db import migrations
+
+
+# utils_sms.OTP_REDACTED_TEXT when this migration was written
+OTP_REDACTED_TEXT = "[OTP redacted]"
+
+
+def redact_finished_otps(apps, schema_editor):
+    OutboundMessage = apps.get_model("spindoapp", "OutboundMessage")
+    OutboundMessage.objects.filter(kind="otp", status__in=("sent", "failed")).update(text=OTP_REDACTED_TEXT)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spindoapp', '0042_servicerequest_uncovered_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(redact_finished_otps, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 13:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spindoapp', '0043_redact_otp_messages'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='phoneotp',
+            name='locked_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -4,7 +4,9 @@ from django.db import models
 import uuid
 from datetime import datetime
 from django.db.models import Max
-import re
+from django.utils import timezone
+from .utils_sequence import max_numeric_suffix, next_value
+from .utils_totals import compute_totals, parse_line_items
 class AllLog(models.Model):
 
     ROLE_CHOICES = (
@@ -45,6 +47,15 @@ class AllLog(models.Model):
         return f"{self.phone} ({self.role})"
 
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets the post_save signal spot credential changes without a query
+        if 'password' in field_names and 'is_active' in field_names:
+            instance._loaded_credentials = (instance.password, instance.is_active)
+        return instance
+
+
     @property
     def is_authenticated(self):
         return True
@@ -73,22 +84,30 @@ class RegisteredCustomer(models.Model):
 
     block = models.CharField(max_length=100)
 
+    # Set from district/block on save; indexed for ?district=/?block= filters
+    district_block = models.ForeignKey('DistrictBlock', on_delete=models.SET_NULL, null=True, blank=True,
+                                       related_name='customers', db_index=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
 
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # Keyset pagination of the list endpoints (utils_pagination.py)
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='customer_created_idx'),
+            models.Index(fields=['district_block', 'created_at', 'id'], name='customer_region_idx'),
+        ]
+
 
     def save(self, *args, **kwargs):
 
         if not self.unique_id:
 
-            last_customer = RegisteredCustomer.objects.order_by('-id').first()
-
-            if last_customer:
-                last_number = int(last_customer.unique_id.split('-')[1])
-                new_number = last_number + 1
-            else:
-                new_number = 1
+            new_number = next_value(
+                "customer",
+                seed=lambda: max_numeric_suffix(RegisteredCustomer.objects.all(), "unique_id")
+            )
 
             self.unique_id = f"USER-{new_number:03d}"
 
@@ -117,18 +136,18 @@ class StaffAdmin(models.Model):
 
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['created_at', 'id'], name='staffadmin_created_idx')]
+
 
     def save(self, *args, **kwargs):
 
         if not self.unique_id:
 
-            last = StaffAdmin.objects.order_by('-id').first()
-
-            if last:
-                last_number = int(last.unique_id.split('-')[1])
-                new_number = last_number + 1
-            else:
-                new_number = 1
+            new_number = next_value(
+                "staffadmin",
+                seed=lambda: max_numeric_suffix(StaffAdmin.objects.all(), "unique_id")
+            )
 
             self.unique_id = f"STAFF-{new_number:03d}"
 
@@ -147,6 +166,9 @@ class Vendor(models.Model):
     state = models.CharField(max_length=100)
     district = models.CharField(max_length=100)
     block = models.CharField(max_length=100)
+    # Set from district/block on save; indexed for ?district=/?block= filters
+    district_block = models.ForeignKey('DistrictBlock', on_delete=models.SET_NULL, null=True, blank=True,
+                                       related_name='vendors', db_index=False)
     password = models.CharField(max_length=255)
     aadhar_card = models.FileField(upload_to='vendor_aadhar/', blank=True, null=True)
     vendor_image = models.ImageField(upload_to='vendor_images/',blank=True,null=True)
@@ -157,21 +179,44 @@ class Vendor(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey('AllLog',on_delete=models.SET_NULL,null=True,blank=True, to_field='unique_id',related_name="vendor_created_by")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='vendor_created_idx'),
+            models.Index(fields=['district_block', 'created_at', 'id'], name='vendor_region_idx'),
+            # Incremental refresh of the matching index (utils_matching.py)
+            models.Index(fields=['updated_at'], name='vendor_updated_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.unique_id:
-            last_vendor = Vendor.objects.order_by('-id').first()
-            if last_vendor:
-                last_number = int(last_vendor.unique_id.split('-')[1])
-                new_number = last_number + 1
-            else:
-                new_number = 1
+            new_number = next_value(
+                "vendor",
+                seed=lambda: max_numeric_suffix(Vendor.objects.all(), "unique_id")
+            )
             self.unique_id = f"VENDOR-{new_number:03d}"
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.username} ({self.unique_id})"
         
+class VendorCategory(models.Model):
+    """
+    One service (category / sub-category) a vendor offers; kept in sync with
+    ``Vendor.category`` by the Vendor post_save signal (utils_vendors.py).
+    An empty sub_category means the whole category.
+    """
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, related_name='service_categories')
+    category = models.CharField(max_length=255)
+    sub_category = models.CharField(max_length=255, blank=True, default='')
+
+    class Meta:
+        unique_together = ('vendor', 'category', 'sub_category')
+        indexes = [models.Index(fields=['category', 'sub_category', 'vendor'], name='vendorcategory_lookup_idx')]
+
+    def __str__(self):
+        return f"{self.vendor_id}: {self.category} / {self.sub_category or '*'}"
+
 class ServiceCategory(models.Model):
     STATUS_CHOICES = (
         ('published', 'Published'),
@@ -202,25 +247,28 @@ class VendorRequest(models.Model):
     issue = models.TextField(blank=True, null=True)
     issue_image = models.ImageField(upload_to='vendor_issues/', blank=True, null=True)
     query_id = models.CharField(max_length=20, unique=True, blank=True, null=True)
+    query_number = models.PositiveIntegerField(unique=True, blank=True, null=True)  # numeric part of query_id
     extra_remark  = models.TextField(blank=True, null=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['created_at', 'id'], name='vendorrequest_created_idx')]
     def __str__(self):
         return f"{self.title} ({self.vendor.unique_id})"
     def save(self, *args, **kwargs):
         if not self.query_id:
-            last_query = VendorRequest.objects.aggregate(
-                max_query=Max('query_id')
-            )['max_query']
+            if self.query_number is None:
+                # Seeded from the unique index on query_number, never from the strings
+                self.query_number = next_value(
+                    "vendor_request",
+                    seed=lambda: VendorRequest.objects.aggregate(
+                        max_number=Max('query_number')
+                    )['max_number'] or 0
+                )
     
-            if last_query:
-                last_number = int(re.search(r'\d+', last_query).group())
-                new_number = last_number + 1
-            else:
-                new_number = 1
-    
-            self.query_id = f"QUERY-{new_number:03d}"
+            self.query_id = f"QUERY-{self.query_number:03d}"
     
         super().save(*args, **kwargs)
         
@@ -241,16 +289,16 @@ class CustomerIssue(models.Model):
     issue_image = models.ImageField(upload_to='customer_issues/', blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['created_at', 'id'], name='customerissue_created_idx')]
     def save(self, *args, **kwargs):
         # Auto-generate query_id if not set
         if not self.query_id:
-            last_issue = CustomerIssue.objects.order_by('-id').first()
-            if last_issue and last_issue.query_id:
-                # Extract number from last query_id
-                last_number = int(last_issue.query_id.split('-')[1])
-                new_number = last_number + 1
-            else:
-                new_number = 1
+            new_number = next_value(
+                "customer_issue",
+                seed=lambda: max_numeric_suffix(CustomerIssue.objects.all(), "query_id")
+            )
             self.query_id = f"QUERY-{new_number:03d}"
 
         super().save(*args, **kwargs)
@@ -261,14 +309,16 @@ class CustomerIssue(models.Model):
 class ServiceRequestByUser(models.Model):
     STATUS_CHOICES = (('pending', 'Pending'),('assigned', 'Assigned'),('completed', 'Completed'),('cancelled', 'Cancelled'))
     username = models.CharField(max_length=150,blank=True, null=True)
-    request_id = models.CharField(max_length=20,  blank=True)
+    request_id = models.CharField(max_length=20,  blank=True, db_index=True)
     unique_id = models.CharField(max_length=50, blank=True, null=True)
     contact_number = models.CharField(max_length=15,blank=True, null=True)
     email = models.EmailField(blank=True, null=True)
-    assignments = models.JSONField(default=list, blank=True)
     state = models.CharField(max_length=100,blank=True, null=True)
     district = models.CharField(max_length=100,blank=True, null=True)
     block = models.CharField(max_length=100,blank=True, null=True)
+    # Set from district/block on save; indexed for ?district=/?block= filters
+    district_block = models.ForeignKey('DistrictBlock', on_delete=models.SET_NULL, null=True, blank=True,
+                                       related_name='service_requests', db_index=False)
     address = models.TextField(blank=True, null=True)
     request_for_services = models.JSONField(default=dict,blank=True,null=True)  # For multiple fields
     schedule_date = models.DateField(blank=True, null=True)
@@ -280,19 +330,32 @@ class ServiceRequestByUser(models.Model):
     assigned_to_name = models.CharField(max_length=150, null=True, blank=True)
     assigned_by = models.ForeignKey(AllLog,on_delete=models.SET_NULL,null=True,blank=True, related_name="assigned_by_admin",to_field='unique_id')
     assigned_by_name = models.CharField(max_length=150, null=True, blank=True)
+    # Written only by utils_state.py: status is derived from these counters
+    # and every change bumps the version (optimistic concurrency).
+    # uncovered_count: entries of request_for_services no completed or
+    # cancelled assignment covers yet
+    version = models.PositiveIntegerField(default=0)
+    open_count = models.PositiveIntegerField(default=0)
+    completed_count = models.PositiveIntegerField(default=0)
+    cancelled_count = models.PositiveIntegerField(default=0)
+    uncovered_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='servicerequest_created_idx'),
+            models.Index(fields=['district_block', 'created_at', 'id'], name='servicerequest_region_idx'),
+            models.Index(fields=['updated_at'], name='servicerequest_updated_idx'),
+        ]
     def save(self, *args, **kwargs):
 
         if not self.request_id:
 
-            last_request = ServiceRequestByUser.objects.order_by('-id').first()
-
-            if last_request and last_request.request_id:
-                last_number = int(last_request.request_id.split('-')[1])
-                new_number = last_number + 1
-            else:
-                new_number = 1
+            new_number = next_value(
+                "service_request",
+                seed=lambda: max_numeric_suffix(ServiceRequestByUser.objects.all(), "request_id")
+            )
 
             self.request_id = f"REQ-{new_number:03d}"
 
@@ -300,8 +363,56 @@ class ServiceRequestByUser(models.Model):
 
     def __str__(self):
         return f"{self.request_id} - {self.username}"
+
+
+class ServiceAssignment(models.Model):
+    # One vendor's share of a ServiceRequestByUser
+    STATUS_CHOICES = (('assigned', 'Assigned'), ('completed', 'Completed'), ('cancelled', 'Cancelled'))
+    service_request = models.ForeignKey(ServiceRequestByUser, on_delete=models.CASCADE, related_name="service_assignments")
+    vendor_unique_id = models.CharField(max_length=50)
+    services = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='assigned')
+    vendor_name = models.CharField(max_length=150, blank=True, null=True)  # snapshot at assignment time
+    vendor_phone = models.CharField(max_length=15, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('service_request', 'vendor_unique_id')
+        indexes = [
+            models.Index(fields=['vendor_unique_id', 'status'], name='assignment_vendor_idx'),
+            models.Index(fields=['status'], name='assignment_status_idx'),
+            models.Index(fields=['updated_at'], name='assignment_updated_idx'),
+        ]
+
+    def as_entry(self):
+        # Positional format the API has always returned:
+        # [services_list, vendor_unique_id, vendor_name, status, vendor_phone]
+        return [self.services, self.vendor_unique_id, self.vendor_name, self.status, self.vendor_phone]
+
+    def __str__(self):
+        return f"{self.service_request_id} - {self.vendor_unique_id} ({self.status})"
         
         
+class VendorBooking(models.Model):
+    """
+    The time slot an open assignment books in the vendor's calendar
+    (utils_calendar.py). A request without schedule_time books the whole day.
+    """
+    service_request = models.ForeignKey(ServiceRequestByUser, on_delete=models.CASCADE, related_name="bookings")
+    vendor_unique_id = models.CharField(max_length=50)
+    date = models.DateField()
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+
+    class Meta:
+        unique_together = ('service_request', 'vendor_unique_id')
+        indexes = [models.Index(fields=['vendor_unique_id', 'date', 'start_time'], name='booking_vendor_date_idx')]
+
+    def __str__(self):
+        return f"{self.vendor_unique_id} {self.date} {self.start_time}-{self.end_time}"
+
+
 class StaffIssue(models.Model):
 
     STATUS_CHOICES = (
@@ -322,14 +433,15 @@ class StaffIssue(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['created_at', 'id'], name='staffissue_created_idx')]
+
     def save(self, *args, **kwargs):
         if not self.query_id:
-            last_issue = StaffIssue.objects.order_by('-id').first()
-            if last_issue and last_issue.query_id:
-                last_number = int(last_issue.query_id.split('-')[1])
-                new_number = last_number + 1
-            else:
-                new_number = 1
+            new_number = next_value(
+                "staff_issue",
+                seed=lambda: max_numeric_suffix(StaffIssue.objects.all(), "query_id")
+            )
 
             self.query_id = f"QUERY-{new_number:03d}"
 
@@ -378,9 +490,28 @@ class Billing(models.Model):
     amount_in_words = models.TextField(blank=True, null=True)
     authorized_name = models.CharField(max_length=255, blank=True, null=True)
 
-    
+    # Background rendering of bill_pdf (see utils_render.py)
+    RENDER_STATUS_CHOICES = (('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed'))
+    render_status = models.CharField(max_length=10, choices=RENDER_STATUS_CHOICES, default='pending')
+    render_token = models.UUIDField(null=True, blank=True)  # identifies the latest requested render
+    render_error = models.TextField(blank=True, default='')
+    rendered_at = models.DateTimeField(null=True, blank=True)
+    render_fingerprint = models.CharField(max_length=64, blank=True, default='')  # of the PDF on disk
+
+    # Derived from bill_item on save (see utils_totals.py); null if bill_item is malformed
+    taxable_total = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True)
+    cgst_total = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True)
+    sgst_total = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True)
+    grand_total = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='billing_created_idx'),
+            models.Index(fields=['grand_total', 'id'], name='billing_grand_total_idx'),
+        ]
+
     
     def save(self, *args, **kwargs):
         if not self.bill_id:
@@ -399,8 +530,19 @@ class Billing(models.Model):
 
             self.bill_id = f"BILL/{current_year}/{new_number:04d}"
 
+        self.set_totals()
         super().save(*args, **kwargs)
 
+    def set_totals(self):
+        try:
+            totals = compute_totals(parse_line_items(self.bill_item))
+        except ValueError:
+            totals = None
+        self.taxable_total = totals.taxable if totals else None
+        self.cgst_total = totals.cgst if totals else None
+        self.sgst_total = totals.sgst if totals else None
+        self.grand_total = totals.grand if totals else None
+
     def __str__(self):
         return self.bill_id
 
@@ -414,6 +556,9 @@ class ContactUs(models.Model):
     subject = models.CharField(max_length=200,blank=True, null=True)
     message = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['created_at', 'id'], name='contactus_created_idx')]
     def __str__(self):
         return f"{self.full_name} - {self.subject}"
         
@@ -425,16 +570,17 @@ class SolarInstallationQuery(models.Model):
     mobile_number = models.CharField(max_length=15,blank=True, null=True)
     address = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['created_at', 'id'], name='solarquery_created_idx')]
     def __str__(self):
         return f"{self.full_name} - {self.subject}"
     def save(self, *args, **kwargs):
         if not self.query_id:
-            last_query = SolarInstallationQuery.objects.order_by('-id').first()
-            if last_query and last_query.query_id:
-                last_number = int(last_query.query_id.split('-')[1])
-                new_number = last_number + 1
-            else:
-                new_number = 1
+            new_number = next_value(
+                "solar_query",
+                seed=lambda: max_numeric_suffix(SolarInstallationQuery.objects.all(), "query_id")
+            )
 
             self.query_id = f"QUERY-{new_number:04d}"
 
@@ -462,6 +608,10 @@ class PhoneOTP(models.Model):
     otp_code = models.CharField(max_length=6, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     is_verified = models.BooleanField(default=False)
+    # Verification guesses against the current otp_code (utils_otp.DbOtpStore)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Set once when the attempts run out; a resend does not move it
+    locked_until = models.DateTimeField(null=True, blank=True)
     created_by_name = models.CharField(max_length=100, null=True, blank=True)
     updated_by_name = models.CharField(max_length=100, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -473,6 +623,9 @@ class PhoneOTP(models.Model):
     class Meta:
         managed=True
         db_table='phone_otp'
+        indexes = [
+            models.Index(fields=['updated_at'], name='phone_otp_updated_idx'),
+        ]
 
 class ServiceBill(models.Model):
     title = models.CharField(max_length=255,blank=True, null=True)
@@ -487,5 +640,87 @@ class ServiceBill(models.Model):
     created_by = models.ForeignKey('AllLog', on_delete=models.SET_NULL, null=True, to_field='unique_id', related_name="bill_created_by")
     updated_by = models.ForeignKey('AllLog', on_delete=models.SET_NULL, null=True, to_field='unique_id', related_name="bill_updated_by")
 
+    class Meta:
+        indexes = [models.Index(fields=['created_at', 'id'], name='servicebill_created_idx')]
+
     def __str__(self):
         return self.title
+
+
+class IdSequence(models.Model):
+    # One counter row per human-readable ID series (see utils_sequence.py)
+    name = models.CharField(max_length=50, unique=True)
+    last_value = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} ({self.last_value})"
+
+
+class PrincipalDenylist(models.Model):
+    # Accounts whose already issued tokens must be refused (see authentication.py)
+    user_id = models.IntegerField(unique=True)
+    is_active = models.BooleanField(default=True)
+    revoked_at = models.DateTimeField()  # tokens issued before this are refused
+
+    def __str__(self):
+        return f"{self.user_id} (revoked {self.revoked_at})"
+
+
+class OutboundMessage(models.Model):
+    # SMS waiting to be delivered by the send_sms_queue worker (see utils_sms.py)
+    STATUS_CHOICES = (('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed'))
+    KIND_CHOICES = (('otp', 'OTP'), ('notification', 'Notification'))
+    phone = models.CharField(max_length=15)
+    text = models.TextField()
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='notification')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Earliest time of the next attempt; while sending, the end of the worker's lease
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+    sent_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbound_due_idx'),
+            models.Index(fields=['status', 'updated_at'], name='outbound_finished_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} to {self.phone} ({self.status})"
+
+
+class GstContribution(models.Model):
+    # What one bill adds to a GstMonthlySummary row (see utils_gst.py)
+    bill = models.ForeignKey(Billing, on_delete=models.CASCADE, related_name='gst_contributions')
+    month = models.DateField()  # first day of the month
+    hsn = models.CharField(max_length=20, blank=True, default='')
+    cgst_rate = models.DecimalField(max_digits=6, decimal_places=2)
+    sgst_rate = models.DecimalField(max_digits=6, decimal_places=2)
+    taxable = models.DecimalField(max_digits=14, decimal_places=2)
+    cgst = models.DecimalField(max_digits=14, decimal_places=2)
+    sgst = models.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        unique_together = ('bill', 'month', 'hsn', 'cgst_rate', 'sgst_rate')
+
+
+class GstMonthlySummary(models.Model):
+    # Running totals per month, HSN/SAC code and rates, kept up to date by utils_gst.sync_bill
+    month = models.DateField()  # first day of the month
+    hsn = models.CharField(max_length=20, blank=True, default='')
+    cgst_rate = models.DecimalField(max_digits=6, decimal_places=2)
+    sgst_rate = models.DecimalField(max_digits=6, decimal_places=2)
+    taxable = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    cgst = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    sgst = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    bill_count = models.IntegerField(default=0)
+
+    class Meta:
+        # The unique index also serves the report's month range scans
+        unique_together = ('month', 'hsn', 'cgst_rate', 'sgst_rate')
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.hsn} {self.cgst_rate}+{self.sgst_rate}%"
@@ -4,8 +4,31 @@ from django.contrib.auth.hashers import check_password, make_password
 from rest_framework import serializers
 from django.db import transaction
 from .models import AllLog, CompanyDetailsItem, RegisteredCustomer, ServiceBill, ServiceCategory, SolarInstallationQuery, StaffAdmin, Vendor,VendorRequest,CustomerIssue,ServiceRequestByUser,StaffIssue,Billing,ContactUs
+from .utils_geography import get_geography
+from .utils_totals import parse_line_items
 
 
+def validate_district_block(attrs, instance=None):
+    """
+    Checks district/block against the geography index and stores them with
+    the index's spelling. Skipped while the DistrictBlock table is empty.
+    """
+    geography = get_geography()
+    if not geography or not ({"district", "block"} & attrs.keys()):
+        return attrs
+
+    district = attrs.get("district", getattr(instance, "district", None))
+    canonical = geography.district(district or "")
+    if canonical is None:
+        raise serializers.ValidationError({"district": "Unknown district"})
+    block = attrs.get("block", getattr(instance, "block", None))
+    canonical_block = geography.block(canonical, block or "")
+    if canonical_block is None:
+        raise serializers.ValidationError({"block": f"Unknown block for {canonical}"})
+
+    attrs["district"], attrs["block"] = canonical, canonical_block
+    return attrs
+
 
 class LoginSerializer(serializers.Serializer):
 
@@ -39,6 +62,7 @@ class LoginSerializer(serializers.Serializer):
         refresh['unique_id'] = user.unique_id
         refresh['user_id'] = user.id
         refresh['role'] = user.role
+        refresh['auth_time'] = refresh['iat']
 
         return {
             "refresh": str(refresh),
@@ -55,13 +79,16 @@ class CustomerRegistrationSerializer(serializers.ModelSerializer):
     class Meta:
         model = RegisteredCustomer
         fields = '__all__'
-        read_only_fields = ('id', 'created_at', 'updated_at', 'unique_id')
+        read_only_fields = ('id', 'created_at', 'updated_at', 'unique_id', 'district_block')
 
     def validate_mobile_number(self, value):
         if AllLog.objects.filter(phone=value, role="customer").exists():
             raise serializers.ValidationError("Mobile number already registered for Customer")
         return value
 
+    def validate(self, attrs):
+        return validate_district_block(attrs, self.instance)
+
     @transaction.atomic
     def create(self, validated_data):
         password = validated_data.pop('password')
@@ -122,13 +149,13 @@ class RegisteredCustomerDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = RegisteredCustomer
         fields = '__all__'
-        read_only_fields = ('id', 'created_at', 'updated_at','unique_id')
+        read_only_fields = ('id', 'created_at', 'updated_at','unique_id', 'district_block')
 
 class RegisteredCustomerListSerializer(serializers.ModelSerializer):
     class Meta:
         model = RegisteredCustomer
         fields = '__all__'
-        read_only_fields = ('id', 'created_at', 'updated_at','unique_id')
+        read_only_fields = ('id', 'created_at', 'updated_at','unique_id', 'district_block')
 
 class StaffAdminDetailSerializer(serializers.ModelSerializer):
     class Meta:
@@ -152,13 +179,16 @@ class VendorRegistrationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Vendor
         fields = '__all__'
-        read_only_fields = ('id', 'created_at', 'updated_at','unique_id')
+        read_only_fields = ('id', 'created_at', 'updated_at','unique_id', 'district_block')
 
     def validate_mobile_number(self, value):
         if AllLog.objects.filter(phone=value, role="vendor").exists():
             raise serializers.ValidationError("Mobile number already registered for vendor")
         return value
 
+    def validate(self, attrs):
+        return validate_district_block(attrs, self.instance)
+
     
 
     @transaction.atomic
@@ -196,7 +226,7 @@ class VendorRequestSerializer(serializers.ModelSerializer):
     class Meta:
         model = VendorRequest
         fields = '__all__'
-        read_only_fields = ('id', 'created_at', 'updated_at')
+        read_only_fields = ('id', 'query_number', 'created_at', 'updated_at')
 
 class CustomerIssueSerializer(serializers.ModelSerializer):
     class Meta:
@@ -206,10 +236,30 @@ class CustomerIssueSerializer(serializers.ModelSerializer):
 
 
 class ServiceRequestByUserSerializer(serializers.ModelSerializer):
+    # Built from ServiceAssignment rows; prefetch "service_assignments" for lists
+    assignments = serializers.SerializerMethodField()
+
     class Meta:
         model = ServiceRequestByUser
         fields = '__all__'
-        read_only_fields = ('created_at', 'updated_at')
+        # Status changes go through utils_state
+        read_only_fields = (
+            'created_at', 'updated_at', 'district_block',
+            'status', 'version', 'open_count', 'completed_count', 'cancelled_count', 'uncovered_count',
+        )
+
+    def get_assignments(self, obj):
+        return [assignment.as_entry() for assignment in obj.service_assignments.all()]
+
+    def update(self, instance, validated_data):
+        # Save only the fields sent, so a concurrent status transition is never overwritten
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        update_fields = {*validated_data, 'updated_at'}
+        if {'district', 'block'} & update_fields:
+            update_fields.add('district_block')
+        instance.save(update_fields=update_fields)
+        return instance
 class StaffIssueSerializer(serializers.ModelSerializer):
     class Meta:
         model = StaffIssue
@@ -221,7 +271,20 @@ class BillingSerializer(serializers.ModelSerializer):
     class Meta:
         model = Billing
         fields = "__all__"
-        read_only_fields = ("bill_id", "bill_pdf", "created_at")
+        read_only_fields = (
+            "bill_id", "bill_pdf", "render_status", "render_token", "render_error", "rendered_at",
+            "render_fingerprint", "taxable_total", "cgst_total", "sgst_total", "grand_total", "created_at",
+        )
+
+    def validate_bill_item(self, value):
+        # Totals and the invoice are computed from these rows; reject what they can't read
+        if not isinstance(value, list):
+            raise serializers.ValidationError("bill_item must be a list of items")
+        try:
+            parse_line_items(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        return value
 class ContactUsSerializer(serializers.ModelSerializer):
     class Meta:
         model = ContactUs
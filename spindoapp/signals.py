@@ -0,0 +1,120 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .authentication import revoke_principal
+from .models import (
+    AllLog, Billing, DistrictBlock, RegisteredCustomer, ServiceAssignment, ServiceCategory, ServiceRequestByUser, Vendor,
+)
+from .utils_cache import evict_alllog
+from .utils_calendar import sync_request_bookings
+from .utils_categories import invalidate_category_tree
+from .utils_geography import get_geography, invalidate_geography
+from .utils_matching import assignment_deleted, requests_changed, vendor_deleted, vendors_changed
+from .utils_vendors import sync_vendor_categories
+from .utils_gst import SOURCE_FIELDS, sync_bill
+
+
+@receiver(pre_save, sender=AllLog)
+def remember_alllog_credentials(sender, instance, **kwargs):
+    # Instances loaded from the database already carry them (AllLog.from_db)
+    if instance.pk and not hasattr(instance, '_loaded_credentials'):
+        instance._loaded_credentials = AllLog.objects.filter(pk=instance.pk).values_list(
+            'password', 'is_active'
+        ).first()
+
+
+@receiver(post_save, sender=AllLog)
+def alllog_saved(sender, instance, created, **kwargs):
+    evict_alllog(instance)
+    previous = getattr(instance, '_loaded_credentials', None)
+    instance._loaded_credentials = (instance.password, instance.is_active)
+    if created or previous is None:
+        return
+    password, is_active = previous
+    if password != instance.password or is_active != instance.is_active:
+        revoke_principal(instance.pk, instance.is_active)
+
+
+@receiver(post_delete, sender=AllLog)
+def alllog_deleted(sender, instance, **kwargs):
+    evict_alllog(instance)
+    revoke_principal(instance.pk, False)
+
+
+@receiver(post_save, sender=Billing)
+def billing_saved(sender, instance, update_fields=None, **kwargs):
+    # Saves limited to other fields (e.g. bill_pdf) leave the GST figures alone
+    if update_fields is not None and not SOURCE_FIELDS & set(update_fields):
+        return
+    sync_bill(instance)
+
+
+@receiver(pre_delete, sender=Billing)
+def billing_deleted(sender, instance, **kwargs):
+    # Before the contribution rows are removed by the cascade
+    sync_bill(instance, deleting=True)
+
+
+@receiver(post_save, sender=ServiceCategory)
+@receiver(post_delete, sender=ServiceCategory)
+def service_category_changed(sender, instance, **kwargs):
+    # After commit, so no process rebuilds the tree from the old rows
+    transaction.on_commit(invalidate_category_tree)
+
+
+@receiver(post_save, sender=DistrictBlock)
+@receiver(post_delete, sender=DistrictBlock)
+def district_block_changed(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_geography)
+
+
+@receiver(pre_save, sender=RegisteredCustomer)
+@receiver(pre_save, sender=Vendor)
+@receiver(pre_save, sender=ServiceRequestByUser)
+def link_district_block(sender, instance, update_fields=None, **kwargs):
+    # Saves limited to other fields keep the stored link
+    if update_fields is not None and not {"district", "block"} & set(update_fields):
+        return
+    geography = get_geography()
+    if geography:
+        instance.district_block_id = geography.block_id(instance.district, instance.block)
+
+
+@receiver(post_save, sender=Vendor)
+def vendor_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or "category" in update_fields:
+        sync_vendor_categories(instance)
+    transaction.on_commit(lambda: vendors_changed([instance.pk]))
+
+
+@receiver(post_delete, sender=Vendor)
+def vendor_deleted_from_index(sender, instance, **kwargs):
+    transaction.on_commit(lambda: vendor_deleted(instance.unique_id))
+
+
+@receiver(post_save, sender=ServiceAssignment)
+@receiver(post_save, sender=ServiceRequestByUser)
+def matching_inputs_saved(sender, instance, **kwargs):
+    # Open assignments and their schedule feed the matching index
+    request_pk = instance.service_request_id if sender is ServiceAssignment else instance.pk
+    transaction.on_commit(lambda: requests_changed([request_pk]))
+
+
+@receiver(post_save, sender=ServiceRequestByUser)
+def service_request_saved(sender, instance, **kwargs):
+    # Assignment status changes are queryset updates followed by this save
+    sync_request_bookings(instance)
+
+
+@receiver(post_save, sender=ServiceAssignment)
+@receiver(post_delete, sender=ServiceAssignment)
+def assignment_changed(sender, instance, **kwargs):
+    service_request = ServiceRequestByUser.objects.filter(pk=instance.service_request_id).first()
+    if service_request is not None:
+        sync_request_bookings(service_request)
+
+
+@receiver(post_delete, sender=ServiceAssignment)
+def assignment_deleted_from_index(sender, instance, **kwargs):
+    transaction.on_commit(lambda: assignment_deleted(instance.pk))
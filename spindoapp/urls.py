@@ -1,7 +1,7 @@
 # urls.py
 
 from django.urls import path
-from .views import CompanyDetailsItemAPIView, CustomerRegistrationView,BillingAPIView,ContactUsAPIView, LoginView, ResetPassword, SendOTP, ServiceBillAPIView, SolarInstallationQueryAPIView,StaffIssueAPIView, StaffAdminRegistrationView, VerifyOTP,get_all_vendors,DistrictBlockAPIView, VendorRegistrationView, get_services_categories, ServiceCategoryView,CustomTokenRefreshView,VendorRequestView,CustomerIssueAPIView,ServiceRequestAPIView,AssignVendorAPIView
+from .views import CompanyDetailsItemAPIView, CustomerRegistrationView,BillingAPIView,ContactUsAPIView, LoginView, ResetPassword, SendOTP, ServiceBillAPIView, SolarInstallationQueryAPIView,StaffIssueAPIView, StaffAdminRegistrationView, VerifyOTP,get_all_vendors,DistrictBlockAPIView, VendorRegistrationView, get_services_categories, ServiceCategoryView,CustomTokenRefreshView,VendorRequestView,CustomerIssueAPIView,ServiceRequestAPIView,AssignVendorAPIView,BillRenderStatusAPIView,BillDownloadAPIView,BillExportAPIView,GstReportAPIView,VendorMatchAPIView,VendorCalendarAPIView
 
 urlpatterns = [
 
@@ -15,11 +15,17 @@ urlpatterns = [
     path('login/', LoginView.as_view()),
     path('customer/requestservices/', ServiceRequestAPIView.as_view(), name='customer-requestservices'),
     path('assign-vendor/', AssignVendorAPIView.as_view(), name='assign-vendor'),
+    path('assign-vendor/match/', VendorMatchAPIView.as_view(), name='assign-vendor-match'),
     path('get-service/categories/',  get_services_categories, name='get_categories'),
     path('vendor/list/', get_all_vendors, name='get_all_vendors'),
+    path('vendor/calendar/', VendorCalendarAPIView.as_view(), name='vendor-calendar'),
     path('staffadmin/issue/', StaffIssueAPIView.as_view(), name='staff-issue'),
     path('district-blocks/', DistrictBlockAPIView.as_view(), name='district-blocks'),
     path("billing/", BillingAPIView.as_view(), name="billing-api"),
+    path("billing/render-status/", BillRenderStatusAPIView.as_view(), name="billing-render-status"),
+    path("billing/download/", BillDownloadAPIView.as_view(), name="billing-download"),
+    path("billing/export/", BillExportAPIView.as_view(), name="billing-export"),
+    path("billing/gst-report/", GstReportAPIView.as_view(), name="billing-gst-report"),
     path("contact-us/", ContactUsAPIView.as_view(), name="contact-us-api"),
     path('solar-query/', SolarInstallationQueryAPIView.as_view(),name="solar-query"),
     path('company-details/', CompanyDetailsItemAPIView.as_view(),name="company-details"),
@@ -1,21 +1,149 @@
+import datetime
+import hashlib
+import io
+import json
 import os
-from django.conf import settings
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+import re
+from functools import lru_cache
+from types import SimpleNamespace
+
+from reportlab.platypus import PageBreak, SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib import colors
 from reportlab.lib.units import inch
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import enums
 
+from .utils_totals import compute_totals, parse_line_items
+
+
+# Every Billing field the invoice shows
+INVOICE_FIELDS = (
+    "bill_id", "address_1", "address_2", "address_3", "invoice_no",
+    "dated_date", "delv_note", "mode_of_pay", "ref_no_date", "other_ref",
+    "buyer_ord_no", "dated_1", "dispatch_doc_no", "del_note_date",
+    "bill_item", "bank_detail", "amount_in_words", "authorized_name",
+)
+
+
+def bill_snapshot(bill):
+    """
+    Plain-data copy of the invoice fields of ``bill``. It can be pickled to
+    a worker process, which then renders without touching the database.
+    """
+    data = {}
+    for field in INVOICE_FIELDS:
+        value = getattr(bill, field, None)
+        if isinstance(value, datetime.date):
+            value = value.isoformat()
+        data[field] = value
+    return data
+
+
+# Bump when the invoice layout changes so every stored fingerprint goes stale
+# 2: amounts computed in Decimal (utils_totals)
+TEMPLATE_VERSION = 2
+
+
+def bill_fingerprint(data):
+    """
+    Deterministic hash of a bill_snapshot(): equal fingerprints render to
+    the same PDF, so an existing file can be reused.
+    """
+    payload = json.dumps([TEMPLATE_VERSION, data], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def bill_file_name(bill_id):
+    """Flat, filesystem- and header-safe name: BILL/2026/0001 -> BILL-2026-0001.pdf"""
+    stem = re.sub(r"[^A-Za-z0-9._-]+", "-", bill_id or "").strip("-.")
+    return f"{stem or 'Invoice_PI'}.pdf"
+
+
+def render_bill_file(data, path):
+    # Entry point of the render worker processes: keep this module free of model imports
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    render_bill_pdf(data, path)
+
+
+class InvoiceTemplate:
+    """
+    The fixed parts of the invoice: paragraph styles, table styles, column
+    widths and static text. Built once per process by invoice_template();
+    render_bill_pdf only adds the per-bill data. Flowables are not shared
+    because ReportLab mutates them while laying out a document.
+    """
+
+    def __init__(self):
+        styles = getSampleStyleSheet()
+
+        self.style_n = ParagraphStyle('Small', parent=styles['Normal'], fontSize=7.5, leading=9)
+        self.style_b = ParagraphStyle('SmallBold', parent=styles['Normal'], fontSize=7.5, leading=9, fontName='Helvetica-Bold')
+        self.style_header = ParagraphStyle('Header', parent=styles['Normal'], fontSize=10, leading=12, fontName='Helvetica-Bold')
+        self.style_center_bold = ParagraphStyle('CenterBold', parent=styles['Normal'], fontSize=10, fontName='Helvetica-Bold', alignment=1)
+
+        self.supplier_widths = [3.9 * inch]
+        self.meta_widths = [1.85 * inch, 1.85 * inch]
+        self.meta_row_height = 0.33 * inch
+        self.header_widths = [3.9 * inch, 3.7 * inch]
+        self.ship_buyer_widths = [3.9 * inch, 3.7 * inch]
+        self.prod_widths = [0.35*inch,2.2*inch,0.55*inch,0.55*inch,0.55*inch,0.40*inch,
+                            0.45*inch,0.60*inch,0.45*inch,0.60*inch,0.90*inch]
+        self.footer_widths = [4.5*inch, 3.1*inch]
+
+        self.meta_style = TableStyle([
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ])
+        self.header_style = TableStyle([
+            ('GRID', (0, 0), (0, 0), 0.5, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ])
+        self.ship_buyer_style = TableStyle([
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+            ('SPAN', (1, 0), (1, 3)),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ])
+        self.prod_style = TableStyle([
+            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+            ('SPAN', (6,0), (7,0)),
+            ('SPAN', (8,0), (9,0)),
+            ('SPAN', (0,0), (0,1)),
+            ('SPAN', (1,0), (1,1)),
+            ('SPAN', (2,0), (2,1)),
+            ('SPAN', (3,0), (3,1)),
+            ('SPAN', (4,0), (4,1)),
+            ('SPAN', (5,0), (5,1)),
+            ('SPAN', (10,0), (10,1)),
+            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+            ('ALIGN', (1,2), (1,-1), 'LEFT'),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+            ('FONTSIZE', (0,0), (-1,-1), 7),
+        ])
+        self.footer_style = TableStyle([
+            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+            ('BOX', (1,2), (1,2), 0.5, colors.black),
+        ])
+
+        self.prod_header = (
+            ("SI\nNo.", "Description of Goods", "HSN/SAC", "Quantity", "Rate", "per",
+             "CGST", "", "SGST", "", "Amount"),
+            ("", "", "", "", "", "", "Rate", "Amount", "Rate", "Amount", ""),
+        )
+        self.declaration = (
+            "Declaration<br/>We declare that this invoice shows the actual price of the goods "
+            "described and that all particulars are true and correct."
+        )
+
 
-def generate_bill_pdf(bill):
+@lru_cache(maxsize=None)
+def invoice_template():
+    return InvoiceTemplate()
 
-    file_name = f"{getattr(bill, 'bill_id', 'Invoice_PI')}.pdf"
-    file_path = os.path.join(settings.MEDIA_ROOT, f"bills/{file_name}")
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
 
-    doc = SimpleDocTemplate(
-        file_path,
+def _invoice_document(target):
+    return SimpleDocTemplate(
+        target,
         pagesize=A4,
         rightMargin=15,
         leftMargin=15,
@@ -23,15 +151,55 @@ def generate_bill_pdf(bill):
         bottomMargin=20
     )
 
+
+def render_bill_pdf(data, target):
+    """
+    Renders the invoice described by ``data`` (see bill_snapshot) to
+    ``target``, a file path or a binary file object, and returns the
+    number of pages. Pure: no Django models are used, so it runs in
+    worker processes.
+    """
+    doc = _invoice_document(target)
+    doc.build(invoice_elements(data))
+    return doc.page
+
+
+def render_bills_pdf(datas, target):
+    """Renders several invoices into one document, each on a new page."""
     elements = []
-    styles = getSampleStyleSheet()
+    for data in datas:
+        if elements:
+            elements.append(PageBreak())
+        elements.extend(invoice_elements(data))
+    doc = _invoice_document(target)
+    doc.build(elements)
+    return doc.page
+
+
+def render_bill_bytes(data):
+    # Worker process entry point; the PDF travels back to the caller
+    buffer = io.BytesIO()
+    render_bill_pdf(data, buffer)
+    return buffer.getvalue()
 
-    style_n = ParagraphStyle('Small', parent=styles['Normal'], fontSize=7.5, leading=9)
-    style_b = ParagraphStyle('SmallBold', parent=styles['Normal'], fontSize=7.5, leading=9, fontName='Helvetica-Bold')
-    style_header = ParagraphStyle('Header', parent=styles['Normal'], fontSize=10, leading=12, fontName='Helvetica-Bold')
-    style_center_bold = ParagraphStyle('CenterBold', parent=styles['Normal'], fontSize=10, fontName='Helvetica-Bold', alignment=1)
 
-    elements.append(Paragraph("Tax Invoice", style_center_bold))
+def render_bills_bytes(datas):
+    # Worker process entry point for a combined export
+    buffer = io.BytesIO()
+    render_bills_pdf(datas, buffer)
+    return buffer.getvalue()
+
+
+def invoice_elements(data):
+    """The flowables of one invoice."""
+    bill = SimpleNamespace(**data)
+    tpl = invoice_template()
+    style_n = tpl.style_n
+    style_b = tpl.style_b
+
+    elements = []
+
+    elements.append(Paragraph("Tax Invoice", tpl.style_center_bold))
     elements.append(Spacer(1, 5))
 
     # =========================
@@ -41,11 +209,11 @@ def generate_bill_pdf(bill):
     supplier_html = "<br/>".join(bill.address_1 or [])
 
     supplier_info = [
-        [Paragraph(f"<b>{bill.authorized_name or ''}</b>", style_header)],
+        [Paragraph(f"<b>{bill.authorized_name or ''}</b>", tpl.style_header)],
         [Paragraph(supplier_html, style_n)]
     ]
 
-    supplier_table = Table(supplier_info, colWidths=[3.9 * inch])
+    supplier_table = Table(supplier_info, colWidths=tpl.supplier_widths)
 
     # =========================
     # META DETAILS
@@ -75,17 +243,11 @@ def generate_bill_pdf(bill):
         ["", ""]
     ]
 
-    meta_table = Table(meta_data, colWidths=[1.85 * inch, 1.85 * inch], rowHeights=0.33 * inch)
-    meta_table.setStyle(TableStyle([
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-    ]))
+    meta_table = Table(meta_data, colWidths=tpl.meta_widths, rowHeights=tpl.meta_row_height)
+    meta_table.setStyle(tpl.meta_style)
 
-    header_top = Table([[supplier_table, meta_table]], colWidths=[3.9 * inch, 3.7 * inch])
-    header_top.setStyle(TableStyle([
-        ('GRID', (0, 0), (0, 0), 0.5, colors.black),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-    ]))
+    header_top = Table([[supplier_table, meta_table]], colWidths=tpl.header_widths)
+    header_top.setStyle(tpl.header_style)
 
     elements.append(header_top)
 
@@ -103,12 +265,8 @@ def generate_bill_pdf(bill):
         [Paragraph(buyer_html, style_n), ""]
     ]
 
-    ship_buyer_table = Table(ship_to_buyer_data, colWidths=[3.9 * inch, 3.7 * inch])
-    ship_buyer_table.setStyle(TableStyle([
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-        ('SPAN', (1, 0), (1, 3)),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-    ]))
+    ship_buyer_table = Table(ship_to_buyer_data, colWidths=tpl.ship_buyer_widths)
+    ship_buyer_table.setStyle(tpl.ship_buyer_style)
 
     elements.append(ship_buyer_table)
 
@@ -116,81 +274,36 @@ def generate_bill_pdf(bill):
     # GOODS TABLE (Dynamic Items)
     # =========================
 
-    prod_data = [
-        ["SI\nNo.", "Description of Goods", "HSN/SAC", "Quantity", "Rate", "per",
-         "CGST", "", "SGST", "", "Amount"],
-        ["", "", "", "", "", "", "Rate", "Amount", "Rate", "Amount", ""]
-    ]
-
-    total = 0
-    total_cgst = 0
-    total_sgst = 0
-
-    for i, item in enumerate(bill.bill_item or [], start=1):
+    prod_data = [list(row) for row in tpl.prod_header]
 
-        # Unpack list safely
-        item_name   = item[0] if len(item) > 0 else ""
-        hsn         = item[1] if len(item) > 1 else ""
-        qty         = float(item[2]) if len(item) > 2 else 0
-        rate        = float(item[3]) if len(item) > 3 else 0
-        amount      = float(item[4]) if len(item) > 4 else qty * rate
-        cgst_rate   = float(item[5]) if len(item) > 5 else 0
-        cgst_amt    = float(item[6]) if len(item) > 6 else (amount * cgst_rate / 100)
-        sgst_rate   = float(item[7]) if len(item) > 7 else 0
-        sgst_amt    = float(item[8]) if len(item) > 8 else (amount * sgst_rate / 100)
-        per         = item[9] if len(item) > 9 else ""
-
-        total += amount
-        total_cgst += cgst_amt
-        total_sgst += sgst_amt
+    lines = parse_line_items(bill.bill_item)
+    totals = compute_totals(lines)
 
+    for i, line in enumerate(lines, start=1):
         prod_data.append([
             str(i),
-            item_name,
-            hsn,
-            qty,
-            rate,
-            per,
-            f"{cgst_rate}%",
-            f"{cgst_amt:.2f}",
-            f"{sgst_rate}%",
-            f"{sgst_amt:.2f}",
-            f"{amount:.2f}"
+            line.description,
+            line.hsn,
+            float(line.quantity),
+            float(line.rate),
+            line.per,
+            f"{float(line.cgst_rate)}%",
+            f"{line.cgst_amount:.2f}",
+            f"{float(line.sgst_rate)}%",
+            f"{line.sgst_amount:.2f}",
+            f"{line.amount:.2f}"
         ])
 
-    # Totals
-    grand_total = total + total_cgst + total_sgst
-
-    prod_data.append(["", "", "", "", "", "", "", "", "", "CGST Total", f"{total_cgst:.2f}"])
-    prod_data.append(["", "", "", "", "", "", "", "", "", "SGST Total", f"{total_sgst:.2f}"])
+    prod_data.append(["", "", "", "", "", "", "", "", "", "CGST Total", f"{totals.cgst:.2f}"])
+    prod_data.append(["", "", "", "", "", "", "", "", "", "SGST Total", f"{totals.sgst:.2f}"])
     prod_data.append([
         "",
         Paragraph("<b>Grand Total</b>", style_b),
         "", "", "", "", "", "", "", "",
-        Paragraph(f"<b>{grand_total:.2f}</b>", style_b)
+        Paragraph(f"<b>{totals.grand:.2f}</b>", style_b)
     ])
-    prod_table = Table(
-        prod_data,
-        colWidths=[0.35*inch,2.2*inch,0.55*inch,0.55*inch,0.55*inch,0.40*inch,
-                   0.45*inch,0.60*inch,0.45*inch,0.60*inch,0.90*inch]
-    )
-
-    prod_table.setStyle(TableStyle([
-        ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-        ('SPAN', (6,0), (7,0)),
-        ('SPAN', (8,0), (9,0)),
-        ('SPAN', (0,0), (0,1)),
-        ('SPAN', (1,0), (1,1)),
-        ('SPAN', (2,0), (2,1)),
-        ('SPAN', (3,0), (3,1)),
-        ('SPAN', (4,0), (4,1)),
-        ('SPAN', (5,0), (5,1)),
-        ('SPAN', (10,0), (10,1)),
-        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-        ('ALIGN', (1,2), (1,-1), 'LEFT'),
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ('FONTSIZE', (0,0), (-1,-1), 7),
-    ]))
+    prod_table = Table(prod_data, colWidths=tpl.prod_widths)
+    prod_table.setStyle(tpl.prod_style)
 
     elements.append(prod_table)
 
@@ -221,7 +334,7 @@ def generate_bill_pdf(bill):
             Paragraph("<b>E. & O.E</b>", style_n)
         ],
         [
-            Paragraph("Declaration<br/>We declare that this invoice shows the actual price of the goods described and that all particulars are true and correct.", style_n),
+            Paragraph(tpl.declaration, style_n),
             Paragraph(f"<b>Company's Bank Details</b><br/>{bank_html}", style_n)
         ],
         [
@@ -230,20 +343,11 @@ def generate_bill_pdf(bill):
         ],
     ]
 
-    footer_table = Table(footer_data, colWidths=[4.5*inch, 3.1*inch])
-    footer_table.setStyle(TableStyle([
-        ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-        ('BOX', (1,2), (1,2), 0.5, colors.black),
-    ]))
+    footer_table = Table(footer_data, colWidths=tpl.footer_widths)
+    footer_table.setStyle(tpl.footer_style)
 
     elements.append(footer_table)
     elements.append(Spacer(1, 4))
     elements.append(Paragraph("This is a Computer Generated Invoice", style_n))
 
-    doc.build(elements)
-
-    if hasattr(bill, 'bill_pdf'):
-        bill.bill_pdf.name = f"bills/{file_name}"
-        bill.save(update_fields=["bill_pdf"])
-
-    return file_path
\ No newline at end of file
+    return elements
\ No newline at end of file
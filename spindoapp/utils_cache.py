@@ -0,0 +1,94 @@
+"""
+Shared cache of AllLog accounts, keyed by ``id`` and by ``unique_id``.
+
+Entries live in the Django cache named by ALLLOG_CACHE_ALIAS (local memory
+by default, or any shared backend) and are evicted by the AllLog
+post_save/post_delete signals. On top of that every request memoizes the
+accounts it has loaded, so one request never loads the same account twice.
+
+Cached accounts are for reading only: another worker's copy can be up to
+ALLLOG_CACHE_TIMEOUT old. Write with update_alllog().
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import AllLog
+
+DEFAULT_TIMEOUT = 300
+
+_LOOKUPS = ("id", "unique_id")
+
+
+def _cache():
+    return caches[getattr(settings, "ALLLOG_CACHE_ALIAS", "default")]
+
+
+def _cache_key(lookup, value):
+    return f"alllog:{lookup}:{value}"
+
+
+def _request_memo(request):
+    if request is None:
+        return {}
+    # DRF's Request wraps Django's HttpRequest; share one memo between them
+    target = getattr(request, "_request", request)
+    memo = target.__dict__.get("_alllog_memo")
+    if memo is None:
+        memo = target.__dict__["_alllog_memo"] = {}
+    return memo
+
+
+def _remember(memo, account):
+    for lookup in _LOOKUPS:
+        memo[(lookup, getattr(account, lookup))] = account
+
+
+def get_alllog(request=None, **lookup):
+    """
+    AllLog matching ``id=...`` or ``unique_id=...``, or None.
+    Pass the current request to memoize the account for its lifetime.
+    """
+    (field, value), = lookup.items()
+    if field not in _LOOKUPS:
+        raise ValueError(f"Unsupported AllLog lookup: {field}")
+
+    memo = _request_memo(request)
+    account = memo.get((field, value))
+    if account is not None:
+        return account
+
+    cache = _cache()
+    account = cache.get(_cache_key(field, value))
+    if account is None:
+        account = AllLog.objects.filter(**{field: value}).first()
+        if account is None:
+            return None
+        timeout = getattr(settings, "ALLLOG_CACHE_TIMEOUT", DEFAULT_TIMEOUT)
+        cache.set_many(
+            {_cache_key(name, getattr(account, name)): account for name in _LOOKUPS},
+            timeout,
+        )
+
+    _remember(memo, account)
+    return account
+
+
+def evict_alllog(account):
+    _cache().delete_many([_cache_key(name, getattr(account, name)) for name in _LOOKUPS])
+
+
+def update_alllog(unique_id, **fields):
+    """
+    Sets ``fields`` on the AllLog account ``unique_id`` and returns it, or
+    None if there is none. The row is read from the database, not the cache,
+    and only ``fields`` are written, so a stale copy can never overwrite a
+    newer password or is_active. The post_save signal still evicts the
+    cache entries and revokes tokens.
+    """
+    account = AllLog.objects.filter(unique_id=unique_id).first()
+    if account is None:
+        return None
+    for name, value in fields.items():
+        setattr(account, name, value)
+    account.save(update_fields=[*fields, "updated_at"])
+    return account
@@ -0,0 +1,129 @@
+"""
+Vendor calendars: the slots booked by open assignments (VendorBooking).
+
+A request scheduled at ``schedule_time`` books [time, time + VENDOR_SLOT_MINUTES)
+on ``schedule_date`` (cut at midnight); without a time it books the whole
+day. Bookings are indexed on (vendor_unique_id, date, start_time), so
+conflict checks and calendar reads are index range scans.
+
+AssignVendorAPIView creates bookings and refuses overlapping ones;
+sync_request_bookings (called when a request is saved) moves them with a
+rescheduled request and drops them once the assignment or the request is
+closed. It does not check for conflicts itself: code that reschedules a
+request checks schedule_conflicts first, in the transaction that saves it.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+
+from .models import ServiceAssignment, Vendor, VendorBooking
+
+CLOSED_REQUEST_STATUSES = ("completed", "cancelled")
+
+DEFAULT_SLOT_MINUTES = 120
+
+
+def slot_for(schedule_date, schedule_time):
+    """(start_time, end_time) booked by a request scheduled at this date/time."""
+    if schedule_time is None:
+        return time.min, time.max
+    minutes = getattr(settings, "VENDOR_SLOT_MINUTES", DEFAULT_SLOT_MINUTES)
+    end = datetime.combine(schedule_date, schedule_time) + timedelta(minutes=minutes)
+    return schedule_time, end.time() if end.date() == schedule_date else time.max
+
+
+def overlaps(first, second):
+    return first[0] < second[1] and second[0] < first[1]
+
+
+class Calendar:
+    """
+    Bookings of some vendors on some dates, read in one indexed query, plus
+    the slots booked since (so a batch cannot double-book either).
+    """
+
+    def __init__(self, vendor_ids, dates):
+        self._slots = defaultdict(list)  # (vendor, date) -> [(start, end, request pk, request_id)]
+        vendor_ids, dates = set(vendor_ids), set(dates)
+        if vendor_ids and dates:
+            rows = VendorBooking.objects.filter(
+                vendor_unique_id__in=vendor_ids, date__in=dates
+            ).values_list(
+                "vendor_unique_id", "date", "start_time", "end_time", "service_request_id", "service_request__request_id"
+            )
+            for vendor_id, date, start, end, request_pk, request_id in rows:
+                self._slots[(vendor_id, date)].append((start, end, request_pk, request_id))
+
+    def conflict(self, vendor_id, date, slot, request_pk=None):
+        """request_id of a request ``vendor_id`` is booked for during ``slot``, or None."""
+        for start, end, booked_pk, request_id in self._slots.get((vendor_id, date), ()):
+            if booked_pk != request_pk and overlaps(slot, (start, end)):
+                return request_id
+        return None
+
+    def book(self, vendor_id, date, slot, service_request):
+        self._slots[(vendor_id, date)].append((slot[0], slot[1], service_request.pk, service_request.request_id))
+
+
+def schedule_conflicts(service_request, schedule_date, schedule_time):
+    """
+    {vendor_unique_id: conflicting request_id} for the vendors with an open
+    assignment on ``service_request`` that are booked elsewhere during the
+    slot of ``schedule_date``/``schedule_time``. Locks those vendors as
+    AssignVendorAPIView does, so it must run inside a transaction.
+    """
+    if schedule_date is None:
+        return {}
+    vendor_ids = list(
+        ServiceAssignment.objects.filter(service_request_id=service_request.pk, status="assigned")
+        .values_list("vendor_unique_id", flat=True)
+    )
+    list(Vendor.objects.select_for_update().filter(unique_id__in=vendor_ids).order_by("id").values_list("id"))
+    calendar = Calendar(vendor_ids, [schedule_date])
+    slot = slot_for(schedule_date, schedule_time)
+    conflicts = {}
+    for vendor_id in vendor_ids:
+        request_id = calendar.conflict(vendor_id, schedule_date, slot, service_request.pk)
+        if request_id:
+            conflicts[vendor_id] = request_id
+    return conflicts
+
+
+def sync_request_bookings(service_request):
+    """
+    Makes the bookings of ``service_request`` match its open assignments and
+    its current schedule_date/schedule_time.
+    """
+    bookings = VendorBooking.objects.filter(service_request_id=service_request.pk)
+    if service_request.status in CLOSED_REQUEST_STATUSES or service_request.schedule_date is None:
+        bookings.delete()
+        return
+
+    open_vendors = set(
+        ServiceAssignment.objects.filter(service_request_id=service_request.pk, status="assigned")
+        .values_list("vendor_unique_id", flat=True)
+    )
+    bookings.exclude(vendor_unique_id__in=open_vendors).delete()
+
+    date = service_request.schedule_date
+    start, end = slot_for(date, service_request.schedule_time)
+    bookings.exclude(date=date, start_time=start, end_time=end).update(date=date, start_time=start, end_time=end)
+    booked = set(bookings.values_list("vendor_unique_id", flat=True))
+    VendorBooking.objects.bulk_create(
+        [
+            VendorBooking(service_request_id=service_request.pk, vendor_unique_id=vendor_id,
+                          date=date, start_time=start, end_time=end)
+            for vendor_id in open_vendors - booked
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def vendor_calendar(vendor_id, first_day, last_day):
+    """Bookings of ``vendor_id`` from ``first_day`` to ``last_day`` (one indexed query)."""
+    return (
+        VendorBooking.objects.filter(vendor_unique_id=vendor_id, date__range=(first_day, last_day))
+        .select_related("service_request")
+        .order_by("date", "start_time")
+    )
@@ -0,0 +1,99 @@
+"""
+Cached tree of published service categories (get_services_categories).
+
+The category -> subcategories grouping is done by the database (distinct
+prod_cate/sub_cate pairs). The finished tree is kept in this process and in
+the Django cache named by CATEGORY_CACHE_ALIAS, under a version token that
+also lives in that cache. The ServiceCategory post_save/post_delete signals
+replace the token once the transaction commits. With a shared cache every
+process notices on its next request and rebuilds. With a per-process cache
+(the default locmem) only the process that made the change does; the
+others pick it up when their token expires, after CATEGORY_VERSION_TIMEOUT
+seconds. Queryset.update() bypasses the signals: call
+invalidate_category_tree() after bulk changes.
+"""
+import hashlib
+import json
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import quote_etag
+
+from .models import ServiceCategory
+
+DEFAULT_TIMEOUT = 3600
+DEFAULT_VERSION_TIMEOUT = 60
+
+VERSION_KEY = "categories:version"
+
+# (version, tree, etag) last seen by this process
+_local = None
+
+
+def _cache():
+    return caches[getattr(settings, "CATEGORY_CACHE_ALIAS", "default")]
+
+
+def _timeout():
+    return getattr(settings, "CATEGORY_CACHE_TIMEOUT", DEFAULT_TIMEOUT)
+
+
+def _version_timeout():
+    # Bounds how long a process with its own cache serves an outdated tree
+    return getattr(settings, "CATEGORY_VERSION_TIMEOUT", DEFAULT_VERSION_TIMEOUT)
+
+
+def _tree_key(version):
+    return f"categories:tree:{version}"
+
+
+def build_category_tree():
+    """[{"category": ..., "subcategories": [...]}, ...] in name order."""
+    pairs = (
+        ServiceCategory.objects.filter(status="published")
+        .values_list("prod_cate", "sub_cate")
+        .distinct()
+        .order_by("prod_cate", "sub_cate")
+    )
+    tree = []
+    for category, subcategory in pairs:
+        if not tree or tree[-1]["category"] != category:
+            tree.append({"category": category, "subcategories": []})
+        tree[-1]["subcategories"].append(subcategory)
+    return tree
+
+
+def _etag(tree):
+    # Content-based, so a rebuild with the same categories keeps the ETag
+    body = json.dumps(tree, separators=(",", ":"), ensure_ascii=False)
+    return quote_etag(hashlib.sha256(body.encode()).hexdigest()[:32])
+
+
+def get_category_tree():
+    """(tree, etag) of the published categories."""
+    global _local
+    cache = _cache()
+    version = cache.get(VERSION_KEY)
+
+    local = _local
+    if version is not None and local is not None and local[0] == version:
+        return local[1], local[2]
+
+    cached = cache.get(_tree_key(version)) if version is not None else None
+    if cached is None:
+        if version is None:
+            version = uuid.uuid4().hex
+            # Another process may have published a version meanwhile; use theirs
+            if not cache.add(VERSION_KEY, version, _version_timeout()):
+                version = cache.get(VERSION_KEY) or version
+        tree = build_category_tree()
+        cached = (tree, _etag(tree))
+        cache.set(_tree_key(version), cached, _timeout())
+
+    _local = (version, *cached)
+    return cached
+
+
+def invalidate_category_tree():
+    _cache().set(VERSION_KEY, uuid.uuid4().hex, _version_timeout())
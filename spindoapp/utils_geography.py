@@ -0,0 +1,262 @@
+"""
+In-memory index of the district/block list (DistrictBlock).
+
+The list hardly ever changes, so each process builds one immutable
+GeographyIndex from the table and keeps it until a DistrictBlock row is
+saved or deleted. As in utils_categories, a version token in the Django
+cache (GEOGRAPHY_CACHE_ALIAS) is replaced after the change commits, and
+every process sharing that cache rebuilds on its next lookup. The token
+also expires after GEOGRAPHY_VERSION_TIMEOUT seconds. Workers with a
+per-process cache (the default locmem), and changes that bypass the
+signals, are therefore picked up within that time. An example is
+seed_district_blocks run from another process. Bulk changes should still
+call invalidate_geography() so this process sees them at once.
+
+Lookups are case-insensitive and return the spelling stored in the table.
+The JSON bodies of DistrictBlockAPIView are rendered when the index is
+built, each with its own ETag.
+
+The list itself ships as data/district_blocks.json and is loaded with
+seed_district_blocks() (also the seed_district_blocks command), which test
+fixtures can call to get the whole geography in a few queries.
+"""
+import hashlib
+import json
+import os
+import uuid
+from collections import Counter
+from types import MappingProxyType
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import quote_etag
+
+from .models import DistrictBlock
+
+STATE = "Uttarakhand"
+
+DATASET_PATH = os.path.join(os.path.dirname(__file__), "data", "district_blocks.json")
+
+VERSION_KEY = "geography:version"
+DEFAULT_VERSION_TIMEOUT = 60
+
+# (version, GeographyIndex) last built by this process
+_local = None
+
+
+def _fold(name):
+    return " ".join(str(name).split()).casefold()
+
+
+def _body(data):
+    # Same bytes DRF's JSONRenderer would produce
+    body = json.dumps({"status": True, "data": data}, ensure_ascii=False, separators=(",", ":")).encode()
+    return body, quote_etag(hashlib.sha256(body).hexdigest()[:32])
+
+
+class GeographyIndex:
+    """Districts and their sorted blocks, looked up case-insensitively."""
+
+    __slots__ = ("_districts", "_blocks", "_district_ids", "all_body", "_district_bodies")
+
+    def __init__(self, rows):
+        # rows: (DistrictBlock id, district, block)
+        names, grouped = {}, {}
+        for pk, district, block in rows:
+            key = _fold(district)
+            names.setdefault(key, district)
+            grouped.setdefault(key, {}).setdefault(_fold(block), (block, pk))
+
+        districts, blocks, district_ids = {}, {}, {}
+        for key in sorted(grouped):
+            entries = sorted(grouped[key].values(), key=lambda entry: _fold(entry[0]))
+            districts[key] = (names[key], tuple(name for name, _ in entries))
+            blocks[key] = MappingProxyType(grouped[key])
+            district_ids[key] = tuple(pk for _, pk in entries)
+        self._districts = MappingProxyType(districts)
+        self._blocks = MappingProxyType(blocks)
+        self._district_ids = MappingProxyType(district_ids)
+
+        self.all_body = _body({
+            "state": STATE,
+            "districts": [{"district": name, "blocks": list(names)} for name, names in districts.values()],
+        })
+        self._district_bodies = MappingProxyType({
+            key: _body({"state": STATE, "district": name, "blocks": list(names)})
+            for key, (name, names) in districts.items()
+        })
+
+    def __bool__(self):
+        return bool(self._districts)
+
+    def district(self, name):
+        """Stored spelling of the district ``name``, or None."""
+        entry = self._districts.get(_fold(name))
+        return entry[0] if entry else None
+
+    def blocks(self, district):
+        """Sorted block names of ``district``, or None for an unknown district."""
+        entry = self._districts.get(_fold(district))
+        return entry[1] if entry else None
+
+    def block(self, district, name):
+        """Stored spelling of block ``name`` in ``district``, or None."""
+        entry = self._blocks.get(_fold(district), {}).get(_fold(name))
+        return entry[0] if entry else None
+
+    def block_id(self, district, name):
+        """DistrictBlock id of block ``name`` in ``district``, or None."""
+        if not district or not name:
+            return None
+        entry = self._blocks.get(_fold(district), {}).get(_fold(name))
+        return entry[1] if entry else None
+
+    def block_ids(self, name, district=None):
+        """
+        DistrictBlock ids of blocks called ``name``, in ``district`` or (block
+        names are only unique within a district) in any district.
+        """
+        keys = [_fold(district)] if district else self._blocks.keys()
+        entries = (self._blocks.get(key, {}).get(_fold(name)) for key in keys)
+        return [entry[1] for entry in entries if entry]
+
+    def district_ids(self, district):
+        """DistrictBlock ids of every block of ``district`` (empty if unknown)."""
+        return self._district_ids.get(_fold(district), ())
+
+    def district_body(self, district):
+        """(JSON body, ETag) of one district's blocks, or None."""
+        return self._district_bodies.get(_fold(district))
+
+
+def _cache():
+    return caches[getattr(settings, "GEOGRAPHY_CACHE_ALIAS", "default")]
+
+
+def _version_timeout():
+    return getattr(settings, "GEOGRAPHY_VERSION_TIMEOUT", DEFAULT_VERSION_TIMEOUT)
+
+
+def build_geography_index():
+    return GeographyIndex(DistrictBlock.objects.values_list("id", "district", "block"))
+
+
+def get_geography():
+    """This process's GeographyIndex, rebuilt if the table changed."""
+    global _local
+    cache = _cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        # Finite, so processes that never see the change signal still rebuild
+        if not cache.add(VERSION_KEY, version, _version_timeout()):
+            version = cache.get(VERSION_KEY) or version
+
+    local = _local
+    if local is not None and local[0] == version:
+        return local[1]
+
+    index = build_geography_index()
+    _local = (version, index)
+    return index
+
+
+def invalidate_geography():
+    _cache().set(VERSION_KEY, uuid.uuid4().hex, _version_timeout())
+
+
+def load_dataset(path=DATASET_PATH):
+    """{(state, district, block), ...} from a district_blocks.json file."""
+    with open(path, encoding="utf-8") as dataset_file:
+        dataset = json.load(dataset_file)
+    state = dataset.get("state", STATE)
+    return {
+        (state, " ".join(district.split()), " ".join(block.split()))
+        for district, blocks in dataset["districts"].items()
+        for block in blocks
+    }
+
+
+@transaction.atomic
+def seed_district_blocks(rows=None, prune=True, dry_run=False):
+    """
+    Makes DistrictBlock match ``rows`` (the bundled dataset by default):
+    rows missing from the table are created and, with ``prune``, rows not
+    in the dataset are deleted. Safe to run any number of times. Returns
+    {"created": n, "deleted": n, "unchanged": n}.
+    """
+    wanted = load_dataset() if rows is None else set(rows)
+    existing = {
+        (state, district, block): pk
+        for pk, state, district, block in DistrictBlock.objects.values_list("id", "state", "district", "block")
+    }
+
+    missing = wanted - existing.keys()
+    extra = [pk for row, pk in existing.items() if row not in wanted] if prune else []
+    counts = {"created": len(missing), "deleted": len(extra), "unchanged": len(wanted & existing.keys())}
+    if dry_run or not (missing or extra):
+        return counts
+
+    # Delete first: a case-insensitive collation sees "dehradun" and
+    # "Dehradun" as the same (district, block)
+    if extra:
+        DistrictBlock.objects.filter(id__in=extra).delete()
+    DistrictBlock.objects.bulk_create(
+        [DistrictBlock(state=state, district=district, block=block) for state, district, block in sorted(missing)],
+        ignore_conflicts=True,
+    )
+    transaction.on_commit(invalidate_geography)
+    return counts
+
+
+def filter_by_geography(request, queryset):
+    """
+    Applies ?district= and ?block= to a queryset of a model with a
+    ``district_block`` foreign key, as an indexed ``district_block_id``
+    lookup. Unknown names match nothing.
+    """
+    district = request.query_params.get("district", "").strip()
+    block = request.query_params.get("block", "").strip()
+    if not district and not block:
+        return queryset
+
+    geography = get_geography()
+    if block:
+        ids = geography.block_ids(block, district or None)
+    else:
+        ids = geography.district_ids(district)
+    return queryset.filter(district_block_id__in=ids) if ids else queryset.none()
+
+
+def link_district_blocks(model, district_blocks=DistrictBlock, only_unlinked=True, batch_size=1000):
+    """
+    Sets ``district_block`` on the rows of ``model`` from their free-text
+    district/block (case- and whitespace-insensitive). Also used by the
+    migration, which passes its historical models. Returns
+    (number linked, Counter of unmapped (district, block) values).
+    """
+    geography = GeographyIndex(district_blocks.objects.values_list("id", "district", "block"))
+    rows = model.objects.order_by("id")
+    if only_unlinked:
+        rows = rows.filter(district_block__isnull=True)
+
+    linked, unmapped = 0, Counter()
+    last_pk = 0
+    while True:
+        batch = list(rows.filter(id__gt=last_pk).only("id", "district", "block", "district_block")[:batch_size])
+        if not batch:
+            return linked, unmapped
+        last_pk = batch[-1].pk
+
+        changed = []
+        for row in batch:
+            pk = geography.block_id(row.district, row.block)
+            if pk is None:
+                unmapped[(row.district, row.block)] += 1
+            elif pk != row.district_block_id:
+                row.district_block_id = pk
+                changed.append(row)
+        if changed:
+            model.objects.bulk_update(changed, ["district_block"])
+            linked += len(changed)
@@ -0,0 +1,109 @@
+"""
+Monthly GST summary (taxable value, CGST, SGST by HSN/SAC and rate).
+
+Every bill keeps one GstContribution row per (month, HSN, CGST rate, SGST
+rate) it contributes to. When a bill is saved or deleted its new
+contributions are diffed against the stored ones and only the difference
+is added to the GstMonthlySummary rows, so the report never has to read
+bill_item and costs one indexed range query however many bills exist.
+
+The month is the invoice date (dated_date), or the creation date when the
+bill has none. Migration 0041 backfilled the bills that existed before
+the summary; the rebuild_gst_summary command recomputes everything from the
+bills for reconciliation.
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import GstContribution, GstMonthlySummary
+from .utils_totals import PAISE, parse_line_items
+
+ZERO = (Decimal("0.00"), Decimal("0.00"), Decimal("0.00"))
+
+# Billing fields the contributions depend on
+SOURCE_FIELDS = {"bill_item", "dated_date"}
+
+
+def bill_month(bill):
+    day = bill.dated_date or (bill.created_at or timezone.now()).date()
+    return day.replace(day=1)
+
+
+def contributions_for(bill):
+    """
+    {(month, hsn, cgst_rate, sgst_rate): (taxable, cgst, sgst)} for ``bill``.
+    A malformed bill_item contributes nothing (it has no totals either).
+    """
+    try:
+        lines = parse_line_items(bill.bill_item)
+    except ValueError:
+        return {}
+
+    month = bill_month(bill)
+    groups = {}
+    for line in lines:
+        key = (
+            month,
+            str(line.hsn).strip()[:20],
+            line.cgst_rate.quantize(PAISE),
+            line.sgst_rate.quantize(PAISE),
+        )
+        taxable, cgst, sgst = groups.get(key, ZERO)
+        groups[key] = (taxable + line.amount, cgst + line.cgst_amount, sgst + line.sgst_amount)
+    return groups
+
+
+def _key_filter(key):
+    month, hsn, cgst_rate, sgst_rate = key
+    return {"month": month, "hsn": hsn, "cgst_rate": cgst_rate, "sgst_rate": sgst_rate}
+
+
+def _add_to_summary(key, delta, bill_delta):
+    rows = GstMonthlySummary.objects.filter(**_key_filter(key))
+    changes = {
+        "taxable": F("taxable") + delta[0],
+        "cgst": F("cgst") + delta[1],
+        "sgst": F("sgst") + delta[2],
+        "bill_count": F("bill_count") + bill_delta,
+    }
+    if not rows.update(**changes):
+        try:
+            with transaction.atomic():
+                GstMonthlySummary.objects.create(
+                    **_key_filter(key), taxable=delta[0], cgst=delta[1], sgst=delta[2], bill_count=bill_delta
+                )
+        except IntegrityError:
+            # Another bill created the row first
+            rows.update(**changes)
+    if bill_delta < 0:
+        rows.filter(bill_count__lte=0).delete()
+
+
+@transaction.atomic
+def sync_bill(bill, deleting=False):
+    """Brings the contributions of ``bill`` and the summary up to date."""
+    stored = GstContribution.objects.select_for_update().filter(bill_id=bill.pk)
+    old = {
+        (row.month, row.hsn, row.cgst_rate, row.sgst_rate): (row.taxable, row.cgst, row.sgst)
+        for row in stored
+    }
+    new = {} if deleting else contributions_for(bill)
+    if old == new:
+        return
+
+    stored.delete()
+    GstContribution.objects.bulk_create([
+        GstContribution(bill_id=bill.pk, **_key_filter(key), taxable=taxable, cgst=cgst, sgst=sgst)
+        for key, (taxable, cgst, sgst) in new.items()
+    ])
+
+    # A fixed order keeps concurrent syncs from deadlocking on summary rows
+    for key in sorted(old.keys() | new.keys()):
+        before, after = old.get(key, ZERO), new.get(key, ZERO)
+        delta = tuple(a - b for a, b in zip(after, before))
+        bill_delta = (key in new) - (key in old)
+        if any(delta) or bill_delta:
+            _add_to_summary(key, delta, bill_delta)
@@ -0,0 +1,346 @@
+"""
+Ranks active vendors for a service request (VendorMatchAPIView).
+
+Every process keeps a MatchIndex in memory:
+
+    category      -> vendors offering it (VendorCategory)
+    block / district -> vendors registered there
+    vendor        -> open assignments with their booked slot (utils_calendar)
+
+so a match reads no vendor rows until the final few candidates are
+checked against the database. Changes made by this process are applied
+after commit by the signal handlers; changes made by other processes are
+picked up every MATCH_INDEX_REFRESH_SECONDS by re-reading only the rows
+whose updated_at moved, and the whole index is rebuilt every
+MATCH_INDEX_REBUILD_SECONDS (deletions by other processes, queryset
+updates that skip updated_at).
+
+Candidates are sorted by, in this order: share of the requested services
+they offer, same block, same district, no overlapping booking, fewest open
+assignments. When no vendor offers any requested service, the vendors of
+the request's block and district are ranked instead.
+"""
+import heapq
+import os
+import threading
+import time
+from collections import Counter, defaultdict, namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import ServiceAssignment, ServiceRequestByUser, Vendor, VendorCategory
+from .utils_calendar import overlaps, slot_for
+from .utils_vendors import request_service_pairs
+
+CLOSED_REQUEST_STATUSES = ("completed", "cancelled")
+
+VendorEntry = namedtuple("VendorEntry", "pk unique_id district block_id pairs categories")
+Match = namedtuple("Match", "vendor_unique_id services_matched same_block same_district schedule_conflict open_assignments")
+
+
+def _fold(name):
+    return " ".join(str(name or "").split()).casefold()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class MatchIndex:
+    """In-memory vendor/assignment index. Callers hold ``lock`` for every use."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.vendors = {}                          # unique_id -> VendorEntry
+        self.vendor_ids = {}                       # Vendor pk -> unique_id
+        self.by_category = defaultdict(set)        # folded category -> unique_ids
+        self.by_pair = defaultdict(set)            # folded (category, sub_category) -> unique_ids
+        self.by_block = defaultdict(set)           # district_block_id -> unique_ids
+        self.by_district = defaultdict(set)        # folded district -> unique_ids
+        self.open_assignments = defaultdict(dict)  # unique_id -> {assignment id: (date, start, end)}
+        self.busy = set()                          # unique_ids with open assignments
+        self.assignment_vendor = {}                # assignment id -> (unique_id, request pk)
+        self.by_request = defaultdict(set)         # ServiceRequestByUser pk -> assignment ids
+        self.synced_at = None                      # database time of the last read
+        self.refreshed_at = None                   # time.monotonic() of the last refresh
+        self.rebuilt_at = None
+
+    # Vendors
+
+    def remove_vendor(self, unique_id):
+        entry = self.vendors.pop(unique_id, None)
+        if entry is None:
+            return
+        self.vendor_ids.pop(entry.pk, None)
+        for category in entry.categories:
+            self.by_category[category].discard(unique_id)
+        for pair in entry.pairs:
+            self.by_pair[pair].discard(unique_id)
+        self.by_block[entry.block_id].discard(unique_id)
+        self.by_district[entry.district].discard(unique_id)
+
+    def put_vendor(self, entry):
+        self.remove_vendor(entry.unique_id)
+        self.vendors[entry.unique_id] = entry
+        self.vendor_ids[entry.pk] = entry.unique_id
+        for category in entry.categories:
+            self.by_category[category].add(entry.unique_id)
+        for pair in entry.pairs:
+            self.by_pair[pair].add(entry.unique_id)
+        self.by_block[entry.block_id].add(entry.unique_id)
+        self.by_district[entry.district].add(entry.unique_id)
+
+    def load_vendors(self, vendors):
+        """Re-reads the Vendor rows of the queryset ``vendors`` (2 queries)."""
+        rows = list(vendors.values_list("id", "unique_id", "district", "district_block_id", "is_active"))
+        pairs = defaultdict(set)
+        for vendor_id, category, sub_category in VendorCategory.objects.filter(
+            vendor__in=vendors.filter(is_active=True)
+        ).values_list("vendor_id", "category", "sub_category"):
+            pairs[vendor_id].add((_fold(category), _fold(sub_category)))
+
+        for pk, unique_id, district, block_id, is_active in rows:
+            # A renamed unique_id leaves the old key behind
+            previous = self.vendor_ids.get(pk)
+            if previous is not None and previous != unique_id:
+                self.remove_vendor(previous)
+            if not is_active or not unique_id:
+                self.remove_vendor(unique_id)
+                continue
+            vendor_pairs = frozenset(pairs[pk])
+            self.put_vendor(VendorEntry(
+                pk=pk,
+                unique_id=unique_id,
+                district=_fold(district),
+                block_id=block_id,
+                pairs=vendor_pairs,
+                categories=frozenset(category for category, _ in vendor_pairs),
+            ))
+
+    # Assignments
+
+    def remove_assignment(self, assignment_id):
+        unique_id, request_pk = self.assignment_vendor.pop(assignment_id, (None, None))
+        if unique_id is not None:
+            bookings = self.open_assignments[unique_id]
+            bookings.pop(assignment_id, None)
+            if not bookings:
+                self.busy.discard(unique_id)
+            self.by_request[request_pk].discard(assignment_id)
+
+    def load_assignments(self, assignments):
+        """Re-reads the ServiceAssignment rows of the queryset ``assignments`` (1 query)."""
+        rows = assignments.values_list(
+            "id", "vendor_unique_id", "status", "service_request_id",
+            "service_request__status", "service_request__schedule_date", "service_request__schedule_time",
+        )
+        for pk, unique_id, status, request_pk, request_status, schedule_date, schedule_time in rows:
+            self.remove_assignment(pk)
+            if status != "assigned" or request_status in CLOSED_REQUEST_STATUSES:
+                continue
+            self.assignment_vendor[pk] = (unique_id, request_pk)
+            if schedule_date is not None:
+                self.open_assignments[unique_id][pk] = (schedule_date, *slot_for(schedule_date, schedule_time))
+            else:
+                self.open_assignments[unique_id][pk] = (None, None, None)
+            self.busy.add(unique_id)
+            self.by_request[request_pk].add(pk)
+
+    def load_requests(self, request_pks):
+        """Re-reads the assignments of the given service requests."""
+        request_pks = list(request_pks)
+        if not request_pks:
+            return
+        for pk in request_pks:
+            for assignment_id in list(self.by_request.pop(pk, ())):
+                self.remove_assignment(assignment_id)
+        self.load_assignments(ServiceAssignment.objects.filter(service_request_id__in=request_pks))
+
+    # Loading
+
+    def rebuild(self):
+        fresh = MatchIndex()
+        fresh.synced_at = timezone.now()
+        fresh.load_vendors(Vendor.objects.filter(is_active=True))
+        fresh.load_assignments(
+            ServiceAssignment.objects.filter(status="assigned").exclude(
+                service_request__status__in=CLOSED_REQUEST_STATUSES
+            )
+        )
+        for name in ("vendors", "vendor_ids", "by_category", "by_pair", "by_block", "by_district",
+                     "open_assignments", "busy", "assignment_vendor", "by_request", "synced_at"):
+            setattr(self, name, getattr(fresh, name))
+        self.refreshed_at = self.rebuilt_at = time.monotonic()
+
+    def refresh(self):
+        """Applies the rows changed since the last read (by any process)."""
+        # Rows committed a little after they were stamped must not be missed
+        since = self.synced_at - timedelta(seconds=_setting("MATCH_INDEX_REFRESH_OVERLAP_SECONDS", 60))
+        self.synced_at = timezone.now()
+        self.load_vendors(Vendor.objects.filter(updated_at__gte=since))
+        self.load_assignments(ServiceAssignment.objects.filter(updated_at__gte=since))
+        self.load_requests(
+            ServiceRequestByUser.objects.filter(updated_at__gte=since).values_list("id", flat=True)
+        )
+        self.refreshed_at = time.monotonic()
+
+
+_index = MatchIndex()
+
+
+def _reset_after_fork():
+    global _index
+    _index = MatchIndex()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_match_index():
+    """The process's MatchIndex, refreshed or rebuilt when due."""
+    now = time.monotonic()
+    with _index.lock:
+        if _index.rebuilt_at is None or now - _index.rebuilt_at >= _setting("MATCH_INDEX_REBUILD_SECONDS", 900):
+            _index.rebuild()
+        elif now - _index.refreshed_at >= _setting("MATCH_INDEX_REFRESH_SECONDS", 30):
+            _index.refresh()
+    return _index
+
+
+def _loaded():
+    return _index.rebuilt_at is not None
+
+
+# Incremental updates from this process, called by the signal handlers after commit
+
+def vendors_changed(vendor_pks):
+    if _loaded():
+        with _index.lock:
+            _index.load_vendors(Vendor.objects.filter(id__in=list(vendor_pks)))
+
+
+def vendor_deleted(unique_id):
+    if _loaded():
+        with _index.lock:
+            _index.remove_vendor(unique_id)
+
+
+def requests_changed(request_pks):
+    if _loaded():
+        with _index.lock:
+            _index.load_requests(request_pks)
+
+
+def assignment_deleted(assignment_id):
+    if _loaded():
+        with _index.lock:
+            _index.remove_assignment(assignment_id)
+
+
+# Matching
+
+def requested_pairs(service_request):
+    """Folded (category, sub_category) pairs named by ``request_for_services``."""
+    return {
+        (_fold(category), _fold(sub_category))
+        for category, sub_category in request_service_pairs(service_request.request_for_services)
+    }
+
+
+def _has_conflict(bookings, schedule_date, slot):
+    return any(date == schedule_date and overlaps(booked, slot) for date, *booked in bookings)
+
+
+def _service_tiers(index, pairs):
+    """
+    {score: unique_ids}, where score counts half-matches per requested
+    service: 2 if the vendor offers it (or its whole category), 1 if it
+    offers only other services of the category. Set operations and
+    Counter.update keep this in C however many vendors there are.
+    """
+    def split(category, sub_category):
+        full = index.by_pair.get((category, sub_category), set()) | index.by_pair.get((category, ""), set())
+        return full, index.by_category.get(category, set()) - full
+
+    if len(pairs) == 1:
+        # The usual request: two set operations, no per-vendor loop
+        full, partial = split(*next(iter(pairs)))
+        return {2: full, 1: partial}
+
+    units = Counter()
+    for pair in pairs:
+        full, partial = split(*pair)
+        units.update(full)
+        units.update(full)
+        units.update(partial)
+    tiers = defaultdict(set)
+    for unique_id, score in units.items():
+        tiers[score].add(unique_id)
+    return tiers
+
+
+def rank_vendors(service_request, limit=10):
+    """
+    Top ``limit`` vendors for ``service_request`` as Match tuples, best
+    first. Vendors already assigned to the request are left out.
+    """
+    pairs = requested_pairs(service_request)
+    district = _fold(service_request.district)
+    block_id = service_request.district_block_id
+    schedule_date = service_request.schedule_date
+    slot = slot_for(schedule_date, service_request.schedule_time) if schedule_date else None
+    assigned = set(service_request.service_assignments.values_list("vendor_unique_id", flat=True))
+    # Spare candidates for vendors the final check drops
+    wanted = 2 * limit
+
+    index = get_match_index()
+    with index.lock:
+        tiers = _service_tiers(index, pairs) if pairs else {}
+        if not any(vendors - assigned for vendors in tiers.values()):
+            # Nobody (else) offers the requested services: rank by location alone
+            pairs = set()
+            if block_id or district:
+                tiers = {0: index.by_block.get(block_id, set()) | index.by_district.get(district, set())}
+            else:
+                tiers = {0: set(index.vendors)}
+
+        top = []
+        for score in sorted(tiers, reverse=True):
+            tier = tiers[score] - assigned
+            in_block = tier & index.by_block.get(block_id, set()) if block_id else set()
+            in_district = (tier & index.by_district.get(district, set())) - in_block if district else set()
+            groups = (
+                (in_block, True, True),
+                (in_district, False, True),
+                (tier - in_block - in_district, False, False),
+            )
+            for group, same_block, same_district in groups:
+                busy = group & index.busy
+                # Vendors without open assignments have no conflict and no load: they come first
+                ranked = [(False, 0, unique_id) for unique_id in heapq.nsmallest(wanted - len(top), group - busy)]
+                for unique_id in busy:
+                    bookings = index.open_assignments[unique_id].values()
+                    conflict = slot is not None and _has_conflict(bookings, schedule_date, slot)
+                    ranked.append((conflict, len(bookings), unique_id))
+                for conflict, load, unique_id in sorted(ranked)[:wanted - len(top)]:
+                    top.append(Match(
+                        vendor_unique_id=unique_id,
+                        services_matched=round(score / (2 * len(pairs)), 3) if pairs else 0.0,
+                        same_block=same_block,
+                        same_district=same_district,
+                        schedule_conflict=conflict,
+                        open_assignments=load,
+                    ))
+                if len(top) >= wanted:
+                    break
+            if len(top) >= wanted:
+                break
+
+    # Vendors deactivated or deleted by another process since the last refresh drop out here
+    active = set(
+        Vendor.objects.filter(unique_id__in=[match.vendor_unique_id for match in top], is_active=True)
+        .values_list("unique_id", flat=True)
+    )
+    return [match for match in top if match.vendor_unique_id in active][:limit]
@@ -0,0 +1,229 @@
+"""
+One-time passwords for phone verification (SendOTP, VerifyOTP, ResetPassword).
+
+Two interchangeable stores keep the issued codes:
+
+- CacheOtpStore keeps them in the Django cache named by OTP_CACHE_ALIAS.
+  The cache TTL expires them, and sending or verifying an OTP writes
+  nothing to the database.
+- DbOtpStore keeps them in the PhoneOTP table (phone_otp) and checks expiry
+  against created_at.
+
+OTP_STORE picks one: "cache", "db", or "auto" (the default), which uses the
+cache when it is shared by all workers and falls back to the table for the
+per-process caches (locmem, dummy), where an OTP sent through one worker
+could not be verified through another. "cache" with a per-process cache
+fails the system check (spindoapp.apps).
+
+A phone number gets at most one code per OTP_RESEND_SECONDS; ``issue``
+returns False for a request inside that interval. Both stores allow
+OTP_MAX_ATTEMPTS wrong guesses. The guess that reaches the limit discards
+the code and locks the phone for OTP_LOCK_SECONDS; the lock is set once
+and nothing extends it, so resending cannot keep the owner locked out.
+Sending a new code while the previous one is still valid keeps the
+attempt count, so resending does not buy more guesses; the count starts
+over once the previous code expired or was verified. A correct code can be used once.
+Verifying a code stores a verification that ResetPassword can use once,
+within OTP_VERIFIED_TTL_SECONDS. The purge_otps command deletes expired
+rows from the table (all of its rows once the cache store is in use).
+"""
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+
+from .models import PhoneOTP
+
+DEFAULT_TTL_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_VERIFIED_TTL_SECONDS = 600
+DEFAULT_RESEND_SECONDS = 60
+DEFAULT_LOCK_SECONDS = 900
+
+# Cache backends that live inside one process
+LOCAL_CACHE_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+VERIFIED, INVALID, EXPIRED, LOCKED, MISSING = "verified", "invalid", "expired", "locked", "missing"
+
+_store = None
+
+
+def ttl_seconds():
+    return getattr(settings, "OTP_TTL_SECONDS", DEFAULT_TTL_SECONDS)
+
+
+def max_attempts():
+    return getattr(settings, "OTP_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS)
+
+
+def verified_ttl_seconds():
+    return getattr(settings, "OTP_VERIFIED_TTL_SECONDS", DEFAULT_VERIFIED_TTL_SECONDS)
+
+
+def resend_seconds():
+    return getattr(settings, "OTP_RESEND_SECONDS", DEFAULT_RESEND_SECONDS)
+
+
+def lock_seconds():
+    return getattr(settings, "OTP_LOCK_SECONDS", DEFAULT_LOCK_SECONDS)
+
+
+def new_code():
+    return f"{secrets.randbelow(900000) + 100000}"
+
+
+class CacheOtpStore:
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    @staticmethod
+    def _keys(phone):
+        return f"otp:code:{phone}", f"otp:attempts:{phone}", f"otp:verified:{phone}"
+
+    def issue(self, phone, code):
+        # add() only succeeds for the first request of the interval
+        if not self.cache.add(f"otp:sent:{phone}", True, resend_seconds()):
+            return False
+        code_key, attempts_key, verified_key = self._keys(phone)
+        if self.cache.get(code_key) is None:
+            self.cache.set_many({code_key: code, attempts_key: 0}, ttl_seconds())
+        else:
+            # The previous code is still valid: keep its attempts for the new one
+            self.cache.set(code_key, code, ttl_seconds())
+            if not self.cache.touch(attempts_key, ttl_seconds()):
+                self.cache.add(attempts_key, 0, ttl_seconds())
+        self.cache.delete(verified_key)
+        return True
+
+    def _lock(self, phone):
+        # add() keeps the expiry of an existing lock
+        self.cache.add(f"otp:locked:{phone}", True, lock_seconds())
+        self.cache.delete_many(self._keys(phone)[:2])
+
+    def verify(self, phone, code):
+        if self.cache.get(f"otp:locked:{phone}"):
+            return LOCKED
+        code_key, attempts_key, verified_key = self._keys(phone)
+        expected = self.cache.get(code_key)
+        if expected is None:
+            # Expired entries are gone from the cache
+            return MISSING
+        try:
+            attempts = self.cache.incr(attempts_key)
+        except ValueError:
+            return MISSING
+        if attempts > max_attempts():
+            self._lock(phone)
+            return LOCKED
+        if not constant_time_compare(expected, str(code)):
+            if attempts == max_attempts():
+                self._lock(phone)
+            return INVALID
+        self.cache.delete_many([code_key, attempts_key])
+        self.cache.set(verified_key, True, verified_ttl_seconds())
+        return VERIFIED
+
+    def consume_verification(self, phone):
+        # delete() reports whether the key existed, so only one caller wins
+        return bool(self.cache.delete(self._keys(phone)[2]))
+
+
+class DbOtpStore:
+    def issue(self, phone, code):
+        now = timezone.now()
+        # Only a row sent before the resend interval is replaced, so parallel requests send one code
+        replaced = PhoneOTP.objects.filter(
+            phone_number=phone, created_at__lte=now - timedelta(seconds=resend_seconds())
+        ).update(
+            # First: MySQL evaluates SET left to right, and this reads the old code and time
+            attempts=Case(
+                When(otp_code__isnull=False, created_at__gte=now - timedelta(seconds=ttl_seconds()), then=F("attempts")),
+                default=Value(0),
+            ),
+            otp_code=code, is_verified=False, created_at=now, updated_at=now,
+        )
+        if replaced:
+            return True
+        if PhoneOTP.objects.filter(phone_number=phone).exists():
+            return False
+        try:
+            with transaction.atomic():
+                PhoneOTP.objects.create(phone_number=phone, otp_code=code, created_at=now)
+        except IntegrityError:
+            # Another request created it first
+            return False
+        return True
+
+    @staticmethod
+    def _lock(current, now):
+        # Clearing otp_code makes this the only update that sets the lock
+        current.filter(attempts__gte=max_attempts()).update(
+            otp_code=None, attempts=0, locked_until=now + timedelta(seconds=lock_seconds()), updated_at=now
+        )
+
+    def verify(self, phone, code):
+        entry = PhoneOTP.objects.filter(phone_number=phone).values("otp_code", "created_at", "locked_until").first()
+        now = timezone.now()
+        if entry is not None and entry["locked_until"] and entry["locked_until"] > now:
+            return LOCKED
+        if entry is None or not entry["otp_code"]:
+            return MISSING
+        if entry["created_at"] < now - timedelta(seconds=ttl_seconds()):
+            return EXPIRED
+
+        current = PhoneOTP.objects.filter(phone_number=phone, otp_code=entry["otp_code"])
+        # Counted before comparing, so parallel guesses cannot exceed the limit
+        if not current.filter(attempts__lt=max_attempts()).update(attempts=F("attempts") + 1):
+            self._lock(current, now)
+            return LOCKED
+        if not constant_time_compare(entry["otp_code"], str(code)):
+            self._lock(current, now)
+            return INVALID
+        if not current.update(otp_code=None, is_verified=True, updated_at=now):
+            return MISSING
+        return VERIFIED
+
+    def consume_verification(self, phone):
+        now = timezone.now()
+        return bool(
+            PhoneOTP.objects.filter(
+                phone_number=phone, is_verified=True,
+                updated_at__gte=now - timedelta(seconds=verified_ttl_seconds()),
+            ).update(is_verified=False, updated_at=now)
+        )
+
+
+def _uses_cache():
+    choice = getattr(settings, "OTP_STORE", "auto")
+    if choice == "auto":
+        alias = getattr(settings, "OTP_CACHE_ALIAS", "default")
+        return settings.CACHES[alias]["BACKEND"] not in LOCAL_CACHE_BACKENDS
+    return choice == "cache"
+
+
+def check_otp_store(app_configs=None, **kwargs):
+    """System check: the cache store needs a cache shared by all workers."""
+    alias = getattr(settings, "OTP_CACHE_ALIAS", "default")
+    if getattr(settings, "OTP_STORE", "auto") == "cache" and settings.CACHES[alias]["BACKEND"] in LOCAL_CACHE_BACKENDS:
+        return [checks.Error(
+            f"OTP_STORE is \"cache\" but the {alias!r} cache is local to each process",
+            hint="Point CACHE_BACKEND at a shared cache, or set OTP_STORE to \"auto\" or \"db\".",
+            id="spindoapp.E001",
+        )]
+    return []
+
+
+def get_otp_store():
+    global _store
+    if _store is None:
+        _store = CacheOtpStore(getattr(settings, "OTP_CACHE_ALIAS", "default")) if _uses_cache() else DbOtpStore()
+    return _store
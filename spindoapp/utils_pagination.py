@@ -0,0 +1,114 @@
+"""
+Keyset (cursor) pagination for the list endpoints.
+
+Pages are ordered by ``(order_field, id)`` and each page continues strictly
+after the last row of the previous one, so a page costs one index range
+scan however deep the client has scrolled. The cursor is opaque to
+clients. The total count is only computed on request (``?with_count=true``).
+
+Query parameters:
+    cursor      value of ``next_cursor`` from the previous page
+    page_size   rows per page, capped at LIST_MAX_PAGE_SIZE
+    with_count  "true" to include the total ``count``
+    paginate    "false" to get the whole list in the legacy envelope
+"""
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+DEFAULT_PAGE_SIZE = 50
+DEFAULT_MAX_PAGE_SIZE = 200
+
+
+def _is_false(value):
+    return str(value).lower() in ("false", "0", "no")
+
+
+def _is_true(value):
+    return str(value).lower() in ("true", "1", "yes")
+
+
+def encode_cursor(value, pk):
+    raw = json.dumps([str(value), pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, field):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, pk = json.loads(raw)
+        return field.to_python(value), int(pk)
+    except (ValueError, TypeError, DjangoValidationError):
+        raise ValidationError({"message": "Invalid cursor"})
+
+
+def _page_size(request):
+    default = getattr(settings, "LIST_PAGE_SIZE", DEFAULT_PAGE_SIZE)
+    maximum = getattr(settings, "LIST_MAX_PAGE_SIZE", DEFAULT_MAX_PAGE_SIZE)
+    try:
+        size = int(request.query_params.get("page_size", default))
+    except (TypeError, ValueError):
+        raise ValidationError({"message": "Invalid page_size"})
+    return max(1, min(size, maximum))
+
+
+def paginate_queryset(request, queryset, order_field="created_at", descending=True):
+    """
+    Returns ``(rows, pagination)`` for the page selected by the request.
+
+    ``pagination`` holds the keys to merge into the response envelope
+    (``next_cursor``, ``page_size`` and optionally ``count``). It is None
+    when the client opted out with ``?paginate=false``; ``rows`` is then
+    the whole queryset in the same order.
+    """
+    prefix = "-" if descending else ""
+    ordered = queryset.order_by(f"{prefix}{order_field}", f"{prefix}id")
+
+    if _is_false(request.query_params.get("paginate", "true")):
+        return ordered, None
+
+    size = _page_size(request)
+    page = ordered
+
+    cursor = request.query_params.get("cursor")
+    if cursor:
+        field = queryset.model._meta.get_field(order_field)
+        value, pk = decode_cursor(cursor, field)
+        op = "lt" if descending else "gt"
+        page = page.filter(
+            Q(**{f"{order_field}__{op}": value}) | Q(**{order_field: value, f"id__{op}": pk})
+        )
+
+    rows = list(page[:size + 1])
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, order_field), last.pk)
+
+    pagination = {"next_cursor": next_cursor, "page_size": size}
+    if _is_true(request.query_params.get("with_count")):
+        pagination["count"] = queryset.count()
+    return rows, pagination
+
+
+def iterate_in_batches(queryset, batch_size=100):
+    """
+    Yields every row of ``queryset`` in id order, fetching ``batch_size``
+    rows per query after the last id seen. Memory stays bounded on every
+    backend, unlike iterator() on drivers that buffer the whole result.
+    """
+    last_pk = None
+    while True:
+        batch = queryset.order_by("id")
+        if last_pk is not None:
+            batch = batch.filter(id__gt=last_pk)
+        rows = list(batch[:batch_size])
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        last_pk = rows[-1].pk
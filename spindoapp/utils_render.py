@@ -0,0 +1,309 @@
+"""
+Background rendering of bill PDFs.
+
+Views call ``schedule_render`` instead of rendering inside the request. Once
+the surrounding transaction commits, a plain-data snapshot of the bill is
+handed to a process pool (ReportLab is CPU-bound, so threads would not help)
+and the request returns. The worker writes a temporary file; back in the
+web process the file is moved into place and ``Billing.render_status`` is
+set to "ready" or "failed".
+
+Nothing is rendered when the bill's fingerprint (a hash of every field
+the invoice shows) matches the PDF already on disk.
+
+Every scheduled render stores a fresh ``render_token``. A render only
+publishes its result while its token is still the bill's latest one, so a
+slow, outdated render can never overwrite a newer PDF.
+
+BILL_RENDER_WORKERS=0 renders synchronously in the calling process.
+
+Files on disk are only a cache of what ``render_to_memory`` produces for a
+download. With BILL_PDF_WRITE_THROUGH=False nothing is written at all and
+every download renders in memory.
+"""
+import io
+import multiprocessing
+import os
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import Billing
+from .utils_billing import (
+    bill_file_name, bill_fingerprint, bill_snapshot, render_bill_bytes, render_bill_file, render_bill_pdf,
+    render_bills_bytes,
+)
+
+DEFAULT_WORKERS = 2
+# Renders queued per worker by render_batch/iter_bill_pdfs
+WINDOW_PER_WORKER = 4
+
+_lock = threading.Lock()
+_pool = None
+_finisher = None
+
+
+def _reset_after_fork():
+    global _lock, _pool, _finisher
+    _lock = threading.Lock()
+    _pool = None
+    _finisher = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _workers():
+    return getattr(settings, "BILL_RENDER_WORKERS", DEFAULT_WORKERS)
+
+
+def _write_through():
+    return getattr(settings, "BILL_PDF_WRITE_THROUGH", True)
+
+
+def new_pool(workers):
+    # spawn: children start clean instead of inheriting sockets and locks
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def _executors():
+    global _pool, _finisher
+    with _lock:
+        if _pool is None:
+            _pool = new_pool(_workers())
+        if _finisher is None:
+            # Stores results; keeps DB work off the pool's management thread
+            _finisher = ThreadPoolExecutor(max_workers=1)
+        return _pool, _finisher
+
+
+def _shared_submit(fn, *args):
+    """Submits to the shared pool, replacing it once if a dead worker broke it."""
+    global _pool
+    pool, _ = _executors()
+    try:
+        return pool.submit(fn, *args)
+    except BrokenProcessPool:
+        # A pool whose worker died refuses all further work; start a new one
+        with _lock:
+            if _pool is pool:
+                pool.shutdown(wait=False)
+                _pool = new_pool(_workers())
+            pool = _pool
+        return pool.submit(fn, *args)
+
+
+def _window(window):
+    return window or WINDOW_PER_WORKER * max(_workers(), 1)
+
+
+def bill_pdf_name(bill_id):
+    return f"bills/{bill_file_name(bill_id)}"
+
+
+def _paths(snapshot, token):
+    final_path = os.path.join(settings.MEDIA_ROOT, bill_pdf_name(snapshot["bill_id"]))
+    return final_path, f"{final_path}.{token.hex}.tmp"
+
+
+def _store_result(pk, token, snapshot, error):
+    """
+    Publishes a finished render if ``token`` is still the latest one.
+    Returns the stored field values, or None for a superseded render.
+    """
+    final_path, tmp_path = _paths(snapshot, token)
+    latest = Billing.objects.filter(pk=pk, render_token=token)
+
+    if error is None:
+        fields = {
+            "render_status": "ready",
+            "bill_pdf": bill_pdf_name(snapshot["bill_id"]),
+            "render_error": "",
+            "rendered_at": timezone.now(),
+            "render_fingerprint": bill_fingerprint(snapshot),
+        }
+    else:
+        fields = {"render_status": "failed", "render_error": str(error) or error.__class__.__name__}
+
+    stored = latest.update(**fields)
+    if stored and error is None:
+        os.replace(tmp_path, final_path)
+    elif os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    return fields if stored else None
+
+
+def _finish(pk, token, snapshot, future):
+    close_old_connections()
+    try:
+        _store_result(pk, token, snapshot, future.exception())
+    finally:
+        close_old_connections()
+
+
+def _submit(pk, token, snapshot):
+    _, finisher = _executors()
+    _, tmp_path = _paths(snapshot, token)
+    future = _shared_submit(render_bill_file, snapshot, tmp_path)
+    future.add_done_callback(lambda f: finisher.submit(_finish, pk, token, snapshot, f))
+
+
+def _start(bill):
+    token = uuid.uuid4()
+    Billing.objects.filter(pk=bill.pk).update(render_status="pending", render_token=token, render_error="")
+    bill.render_status, bill.render_token, bill.render_error = "pending", token, ""
+    return token, bill_snapshot(bill)
+
+
+def current_pdf_path(bill, fingerprint=None):
+    """Path of the PDF on disk if it shows the current content of ``bill``, else None."""
+    path = pdf_path(bill)
+    if path is None:
+        return None
+    fingerprint = fingerprint or bill_fingerprint(bill_snapshot(bill))
+    return path if bill.render_fingerprint == fingerprint else None
+
+
+def is_current(bill):
+    return current_pdf_path(bill) is not None
+
+
+def schedule_render(bill):
+    """
+    Renders ``bill`` in the background once the current transaction
+    commits, unless its PDF is already current or nothing is kept on disk.
+    """
+    if not _write_through() or is_current(bill):
+        return
+    if not _workers():
+        render_now(bill)
+        return
+
+    token, snapshot = _start(bill)
+    transaction.on_commit(lambda: _submit(bill.pk, token, snapshot))
+
+
+def render_now(bill):
+    """Renders ``bill`` in this process and stores the result before returning."""
+    token, snapshot = _start(bill)
+    _, tmp_path = _paths(snapshot, token)
+    error = None
+    try:
+        render_bill_file(snapshot, tmp_path)
+    except Exception as exc:
+        error = exc
+    _store_result(bill.pk, token, snapshot, error)
+    bill.refresh_from_db()
+
+
+def render_batch(bills, pool=None, window=None):
+    """
+    Renders every bill of the iterable ``bills`` in worker processes and
+    yields each one, in input order, once its result is stored. At most
+    ``window`` renders are queued at a time, so memory stays bounded however
+    many bills there are. Uses the shared pool unless ``pool`` is given
+    (pass the matching ``window`` with it).
+    """
+    submit = pool.submit if pool is not None else _shared_submit
+    window = _window(window)
+    queued = deque()
+
+    def store_oldest():
+        bill, token, snapshot, future = queued.popleft()
+        try:
+            future.result()
+            error = None
+        except Exception as exc:
+            error = exc
+        fields = _store_result(bill.pk, token, snapshot, error)
+        for name, value in (fields or {}).items():
+            setattr(bill, name, value)
+        return bill
+
+    for bill in bills:
+        token, snapshot = _start(bill)
+        _, tmp_path = _paths(snapshot, token)
+        queued.append((bill, token, snapshot, submit(render_bill_file, snapshot, tmp_path)))
+        if len(queued) >= window:
+            yield store_oldest()
+
+    while queued:
+        yield store_oldest()
+
+
+def render_to_memory(bill, snapshot=None):
+    """
+    Renders ``bill`` into memory and returns the PDF bytes. With write-through
+    on, the bytes are also stored as the bill's PDF on disk.
+    """
+    snapshot = snapshot or bill_snapshot(bill)
+    buffer = io.BytesIO()
+    render_bill_pdf(snapshot, buffer)
+    content = buffer.getvalue()
+    _write_cache(bill, content)
+    return content
+
+
+def _write_cache(bill, content):
+    if not _write_through():
+        return
+    token, snapshot = _start(bill)
+    _, tmp_path = _paths(snapshot, token)
+    os.makedirs(os.path.dirname(tmp_path), exist_ok=True)
+    with open(tmp_path, "wb") as tmp_file:
+        tmp_file.write(content)
+    _store_result(bill.pk, token, snapshot, None)
+
+
+def iter_bill_pdfs(bills, pool=None, window=None):
+    """
+    Yields ``(bill, pdf bytes, error)`` for the iterable ``bills`` in order.
+    Current PDFs are read from disk; the others are rendered in worker
+    processes, at most ``window`` at a time, so memory stays bounded. A
+    failed render yields ``(bill, None, error text)``.
+    """
+    submit = pool.submit if pool is not None else _shared_submit
+    window = _window(window)
+    queued = deque()
+
+    def oldest():
+        bill, path, future = queued.popleft()
+        if future is None:
+            with open(path, "rb") as pdf_file:
+                return bill, pdf_file.read(), None
+        try:
+            content = future.result()
+        except Exception as exc:
+            return bill, None, str(exc) or exc.__class__.__name__
+        _write_cache(bill, content)
+        return bill, content, None
+
+    for bill in bills:
+        snapshot = bill_snapshot(bill)
+        path = current_pdf_path(bill, bill_fingerprint(snapshot))
+        future = None if path else submit(render_bill_bytes, snapshot)
+        queued.append((bill, path, future))
+        if len(queued) >= window:
+            yield oldest()
+
+    while queued:
+        yield oldest()
+
+
+def render_combined(snapshots):
+    """Renders the invoices of ``snapshots`` as one PDF in a worker process."""
+    return _shared_submit(render_bills_bytes, snapshots).result()
+
+
+def pdf_path(bill):
+    """Path of the rendered PDF of ``bill``, or None if it is not on disk."""
+    if bill.render_status != "ready" or not bill.bill_pdf:
+        return None
+    path = bill.bill_pdf.path
+    return path if os.path.exists(path) else None
@@ -0,0 +1,158 @@
+"""
+Allocation of human-readable IDs (USER-001, REQ-001, QUERY-0001, ...).
+
+Every ID series keeps one counter row in ``IdSequence``. A worker process
+reserves a block of numbers with a single ``UPDATE`` and then hands them
+out from memory, so most inserts need no extra query at all.
+
+Blocks are reserved on a private autocommit connection. The reservation is
+committed straight away and never rolls back with the caller's transaction,
+so two workers can never be handed the same block. Numbers still unused in
+a block when a process exits are skipped, never reused.
+
+SQLite allows a single writer, so a second connection would block behind
+the caller's transaction. There numbers are taken one at a time inside the
+caller's transaction instead.
+"""
+import os
+import re
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, InterfaceError, OperationalError, connections, transaction
+from django.db.models import F
+
+DEFAULT_BLOCK_SIZE = 20
+RESERVE_ATTEMPTS = 3
+
+_SUFFIX_RE = re.compile(r"(\d+)$")
+
+_lock = threading.Lock()
+_blocks = {}  # series name -> [next value, last reserved value]
+_connection = None
+
+
+def _reset_after_fork():
+    # A forked worker must neither reuse its parent's block nor its socket
+    global _lock, _connection
+    _lock = threading.Lock()
+    _blocks.clear()
+    _connection = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def max_numeric_suffix(queryset, field):
+    """
+    Highest trailing number found in ``field`` across ``queryset``.
+    Only used to seed a series that has no counter row yet.
+    """
+    highest = 0
+    values = queryset.exclude(**{f"{field}__isnull": True}).values_list(field, flat=True)
+    for value in values.iterator():
+        match = _SUFFIX_RE.search(value)
+        if match:
+            highest = max(highest, int(match.group(1)))
+    return highest
+
+
+def next_value(name, seed=None, block_size=None):
+    """
+    Next number of the ``name`` series.
+
+    ``seed`` is an optional callable returning the highest number already
+    in use; it is only called when the series has no counter row yet.
+    """
+    if connections[DEFAULT_DB_ALIAS].vendor == "sqlite":
+        return _next_value_in_transaction(name, seed)
+
+    size = block_size or getattr(settings, "ID_SEQUENCE_BLOCK_SIZE", DEFAULT_BLOCK_SIZE)
+
+    with _lock:
+        block = _blocks.get(name)
+        if block is None or block[0] > block[1]:
+            block = list(_reserve_block(name, size, seed))
+            _blocks[name] = block
+        value = block[0]
+        block[0] += 1
+
+    return value
+
+
+def _next_value_in_transaction(name, seed):
+    from .models import IdSequence
+
+    with transaction.atomic():
+        updated = IdSequence.objects.filter(name=name).update(last_value=F("last_value") + 1)
+        if not updated:
+            IdSequence.objects.create(name=name, last_value=(seed() if seed else 0) + 1)
+        return IdSequence.objects.values_list("last_value", flat=True).get(name=name)
+
+
+def _sequence_connection():
+    global _connection
+    if _connection is None:
+        _connection = connections.create_connection(DEFAULT_DB_ALIAS)
+        # Only ever used while holding _lock
+        _connection.inc_thread_sharing()
+    return _connection
+
+
+def _sequence_table(conn):
+    from .models import IdSequence
+    return conn.ops.quote_name(IdSequence._meta.db_table)
+
+
+def _bump_counter(conn, table, name, size):
+    try:
+        conn.set_autocommit(False)
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET last_value = last_value + %s WHERE name = %s",
+                [size, name],
+            )
+            last = None
+            if cursor.rowcount:
+                cursor.execute(f"SELECT last_value FROM {table} WHERE name = %s", [name])
+                last = cursor.fetchone()[0]
+        conn.commit()
+        conn.set_autocommit(True)
+    except Exception:
+        # Dropping the connection discards the open transaction
+        conn.close()
+        raise
+    return last
+
+
+def _create_counter(conn, table, name, start):
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (name, last_value) VALUES (%s, %s)",
+                [name, start],
+            )
+    except IntegrityError:
+        # Another worker created the row first
+        pass
+
+
+def _reserve_block(name, size, seed):
+    conn = _sequence_connection()
+    table = _sequence_table(conn)
+
+    for attempt in range(RESERVE_ATTEMPTS):
+        try:
+            last = _bump_counter(conn, table, name, size)
+        except (OperationalError, InterfaceError):
+            # Dropped connection, lock wait timeout or deadlock: try again
+            if attempt == RESERVE_ATTEMPTS - 1:
+                raise
+            continue
+
+        if last is not None:
+            return last - size + 1, last
+
+        _create_counter(conn, table, name, seed() if seed else 0)
+
+    raise OperationalError(f"Could not reserve a block for ID series '{name}'")
@@ -0,0 +1,482 @@
+"""
+Outbound SMS.
+
+Views never call the gateway themselves. ``enqueue_sms`` stores the message
+as an OutboundMessage row and returns straight away; the ``send_sms_queue``
+management command delivers queued messages with a bounded number of
+gateway calls in flight and retries failures with exponential backoff until
+SMS_MAX_ATTEMPTS is reached.
+
+OTP messages skip the table when OTP_SMS_DIRECT is on: ``send_otp_sms``
+hands them to a small thread pool of the web process, and only a message
+the gateway did not take is queued. Queued OTP texts are replaced with
+OTP_REDACTED_TEXT once they are sent or failed, so codes do not stay in
+the table.
+
+All sends go through one SmsGateway client per process: a keep-alive
+connection pool, connect/read timeouts, retries with exponential backoff,
+a circuit breaker that fails fast while the provider is down, batching of
+one text to many numbers, and latency/error counters (``stats``).
+
+SMS_GATEWAY selects the provider: "bulksms" (production) or "fake", which
+sends nothing and keeps messages in memory so tests and benchmarks run
+offline.
+
+Delivered and failed messages are kept for SMS_RETENTION_DAYS and then
+deleted by ``purge_finished_messages``, which the worker runs periodically.
+"""
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboundMessage
+
+BULKSMS_URL = "http://bulksms.saakshisoftware.com/api/mt/SendSMS"
+BULKSMS_PARAMS = {
+    "senderid": "BCSINF",
+    "channel": "trans",
+    "DCS": "0",
+    "flashsms": "0",
+    "route": "04",
+    "DLTTemplateId": "1207163827265054435",
+    "PEID": "1201163222226675668",
+}
+
+DEFAULT_WORKERS = 8
+DEFAULT_RETENTION_DAYS = 30
+PURGE_BATCH_SIZE = 1000
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_RETRY_BASE_SECONDS = 30
+# A claimed message whose worker died is picked up again after this long
+LEASE_SECONDS = 300
+# Threads per web process sending OTP SMS directly
+OTP_SEND_THREADS = 4
+OTP_REDACTED_TEXT = "[OTP redacted]"
+
+
+class SmsError(Exception):
+    """The gateway refused the message; retrying the same call won't help."""
+
+
+class TransientSmsError(SmsError):
+    """Network error, timeout or 5xx: the call may succeed if repeated."""
+
+
+class CircuitOpenError(SmsError):
+    """The gateway is failing and calls are refused without trying."""
+
+
+class CircuitBreaker:
+    """
+    Opens after ``threshold`` consecutive failed calls and refuses calls
+    for ``cooldown`` seconds. After that a single trial call is let through:
+    success closes the breaker, failure keeps it open for another cooldown.
+    """
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.cooldown:
+                # Let this call through as the trial; others wait for its outcome
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class GatewayStats:
+    """Counters of one gateway client, shared by all its threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.messages = 0
+        self.errors = 0
+        self.retries = 0
+        self.short_circuited = 0
+        self.latency_total_ms = 0.0
+        self.latency_max_ms = 0.0
+
+    def record_call(self, latency_ms, messages, failed):
+        with self._lock:
+            self.calls += 1
+            self.latency_total_ms += latency_ms
+            self.latency_max_ms = max(self.latency_max_ms, latency_ms)
+            if failed:
+                self.errors += 1
+            else:
+                self.messages += messages
+
+    def increment(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "messages": self.messages,
+                "errors": self.errors,
+                "retries": self.retries,
+                "short_circuited": self.short_circuited,
+                "latency_avg_ms": round(self.latency_total_ms / self.calls, 2) if self.calls else 0.0,
+                "latency_max_ms": round(self.latency_max_ms, 2),
+            }
+
+
+class SmsGateway:
+    """
+    Client side of an SMS provider: retries transient failures with
+    exponential backoff, guards the provider with a circuit breaker and
+    sends one text to many numbers in batches of ``batch_size``.
+    Subclasses implement ``_deliver``. One instance is shared per process.
+    """
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or getattr(settings, "SMS_BATCH_SIZE", 100)
+        self.retries = getattr(settings, "SMS_CALL_RETRIES", 2)
+        self.backoff = getattr(settings, "SMS_BACKOFF_SECONDS", 0.5)
+        self.breaker = CircuitBreaker(
+            getattr(settings, "SMS_BREAKER_THRESHOLD", 5),
+            getattr(settings, "SMS_BREAKER_COOLDOWN_SECONDS", 30),
+        )
+        self.stats = GatewayStats()
+
+    def available(self):
+        return self.breaker.state != "open"
+
+    def send(self, phone, text):
+        self.send_many([phone], text)
+
+    def send_many(self, phones, text):
+        for start in range(0, len(phones), self.batch_size):
+            self._call(phones[start:start + self.batch_size], text)
+
+    def _call(self, phones, text):
+        if not self.breaker.allow():
+            self.stats.increment("short_circuited")
+            raise CircuitOpenError("SMS gateway circuit is open")
+
+        for attempt in range(self.retries + 1):
+            started = time.perf_counter()
+            try:
+                self._deliver(phones, text)
+            except TransientSmsError:
+                self.stats.record_call((time.perf_counter() - started) * 1000, len(phones), failed=True)
+                if attempt == self.retries:
+                    self.breaker.record_failure()
+                    raise
+                self.stats.increment("retries")
+                # Full jitter keeps parallel senders from retrying in lockstep
+                time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+            except SmsError:
+                # The provider answered, so it is up; the message itself was refused
+                self.stats.record_call((time.perf_counter() - started) * 1000, len(phones), failed=True)
+                self.breaker.record_success()
+                raise
+            else:
+                self.stats.record_call((time.perf_counter() - started) * 1000, len(phones), failed=False)
+                self.breaker.record_success()
+                return
+
+    def _deliver(self, phones, text):
+        raise NotImplementedError
+
+
+class BulkSmsGateway(SmsGateway):
+
+    def __init__(self):
+        super().__init__()
+        if not settings.SMS_USER or not settings.SMS_PASSWORD:
+            raise ImproperlyConfigured("Set SMS_USER and SMS_PASSWORD to send through the bulksms gateway")
+        self.params = {
+            "user": settings.SMS_USER,
+            "password": settings.SMS_PASSWORD,
+            **BULKSMS_PARAMS,
+        }
+        self.timeout = (
+            getattr(settings, "SMS_CONNECT_TIMEOUT", 3.05),
+            getattr(settings, "SMS_READ_TIMEOUT", 10),
+        )
+        # Keep-alive connections, one per sending thread
+        pool_size = getattr(settings, "SMS_WORKERS", DEFAULT_WORKERS)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _deliver(self, phones, text):
+        try:
+            response = self.session.get(
+                BULKSMS_URL,
+                params={**self.params, "number": ",".join(phones), "text": text},
+                timeout=self.timeout,
+            )
+        except (requests.ConnectionError, requests.Timeout) as exc:
+            raise TransientSmsError(str(exc))
+
+        if response.status_code >= 500:
+            raise TransientSmsError(f"HTTP {response.status_code}: {response.text[:200]}")
+        if response.status_code != 200:
+            raise SmsError(f"HTTP {response.status_code}: {response.text[:200]}")
+
+
+class FakeSmsGateway(SmsGateway):
+    """
+    Sends nothing. Delivered messages are appended to ``outbox``;
+    ``latency`` and ``failure_rate`` simulate a slow or flaky provider.
+    """
+    outbox = []
+    _outbox_lock = threading.Lock()
+
+    def __init__(self, latency=0.0, failure_rate=0.0, batch_size=None):
+        super().__init__(batch_size)
+        self.latency = latency
+        self.failure_rate = failure_rate
+
+    def _deliver(self, phones, text):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise TransientSmsError("fake gateway failure")
+        with self._outbox_lock:
+            self.outbox.extend((phone, text) for phone in phones)
+
+
+_gateways = {}
+_gateways_lock = threading.Lock()
+_otp_pool = None
+
+
+def _reset_after_fork():
+    # Pooled sockets and threads must not be shared with a forked child
+    global _gateways_lock, _otp_pool
+    _gateways_lock = threading.Lock()
+    _gateways.clear()
+    _otp_pool = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_gateway(name=None):
+    """Shared per-process gateway client, so pool, breaker and counters are too."""
+    name = name or getattr(settings, "SMS_GATEWAY", "bulksms")
+    with _gateways_lock:
+        if name not in _gateways:
+            if name == "fake":
+                _gateways[name] = FakeSmsGateway(
+                    latency=getattr(settings, "SMS_FAKE_LATENCY", 0.0),
+                    failure_rate=getattr(settings, "SMS_FAKE_FAILURE_RATE", 0.0),
+                )
+            elif name == "bulksms":
+                _gateways[name] = BulkSmsGateway()
+            else:
+                raise ValueError(f"Unknown SMS gateway: {name}")
+        return _gateways[name]
+
+
+def enqueue_sms(phones, text, kind="notification"):
+    """
+    Queues ``text`` for every number in ``phones`` (a number or a list).
+    Blank and repeated numbers are skipped.
+    """
+    if isinstance(phones, str):
+        phones = [phones]
+    unique_phones = dict.fromkeys(phone for phone in phones if phone)
+    return OutboundMessage.objects.bulk_create(
+        [OutboundMessage(phone=phone, text=text, kind=kind) for phone in unique_phones]
+    )
+
+
+def send_otp_sms(phone, text):
+    """
+    Sends an OTP message from a background thread without storing it. When
+    the gateway fails (after its own retries) or is not configured in this
+    process, the message is queued with enqueue_sms instead. With
+    OTP_SMS_DIRECT off it is always queued.
+    """
+    global _otp_pool
+    if not getattr(settings, "OTP_SMS_DIRECT", True):
+        enqueue_sms(phone, text, kind="otp")
+        return
+
+    def send():
+        try:
+            get_gateway().send(phone, text)
+        except Exception:
+            try:
+                enqueue_sms(phone, text, kind="otp")
+            finally:
+                connection.close()
+
+    with _gateways_lock:
+        if _otp_pool is None:
+            _otp_pool = ThreadPoolExecutor(max_workers=OTP_SEND_THREADS, thread_name_prefix="otp-sms")
+        pool = _otp_pool
+    pool.submit(send)
+
+
+def claim_due_messages(limit):
+    """
+    Claims up to ``limit`` due messages for this worker. A message is
+    claimed with a conditional UPDATE, so concurrent workers never send
+    the same message twice.
+    """
+    now = timezone.now()
+    lease_until = now + timedelta(seconds=LEASE_SECONDS)
+    candidates = (
+        OutboundMessage.objects
+        .filter(status__in=("pending", "sending"), next_attempt_at__lte=now)
+        .order_by("next_attempt_at", "id")
+        .values_list("id", "status", "next_attempt_at")[:limit]
+    )
+
+    claimed = []
+    for pk, current_status, due in candidates:
+        won = OutboundMessage.objects.filter(
+            pk=pk, status=current_status, next_attempt_at=due
+        ).update(
+            status="sending", next_attempt_at=lease_until, attempts=F("attempts") + 1, updated_at=now
+        )
+        if won:
+            claimed.append(pk)
+
+    return list(OutboundMessage.objects.filter(pk__in=claimed))
+
+
+def deliver(messages, gateway, workers):
+    """
+    Sends ``messages`` with at most ``workers`` gateway calls in flight.
+    Messages with the same text go out together, ``gateway.batch_size``
+    numbers per call. Returns {message id: error text, or None when sent}.
+    No DB access happens in the sending threads.
+    """
+    by_text = {}
+    for message in messages:
+        by_text.setdefault(message.text, []).append(message)
+
+    batches = []
+    for group in by_text.values():
+        for start in range(0, len(group), gateway.batch_size):
+            batches.append(group[start:start + gateway.batch_size])
+
+    def send(batch):
+        try:
+            gateway.send_many([message.phone for message in batch], batch[0].text)
+        except Exception as exc:
+            error = str(exc) or exc.__class__.__name__
+        else:
+            error = None
+        return [(message.pk, error) for message in batch]
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for batch_results in pool.map(send, batches):
+            results.update(batch_results)
+    return results
+
+
+def record_results(messages, results):
+    max_attempts = getattr(settings, "SMS_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS)
+    retry_base = getattr(settings, "SMS_RETRY_BASE_SECONDS", DEFAULT_RETRY_BASE_SECONDS)
+    now = timezone.now()
+
+    for message in messages:
+        error = results[message.pk]
+        if error is None:
+            message.status = "sent"
+            message.sent_at = now
+            message.last_error = ""
+        elif message.attempts >= max_attempts:
+            message.status = "failed"
+            message.last_error = error
+        else:
+            message.status = "pending"
+            message.last_error = error
+            message.next_attempt_at = now + timedelta(seconds=retry_base * 2 ** (message.attempts - 1))
+        if message.kind == "otp" and message.status != "pending":
+            message.text = OTP_REDACTED_TEXT
+        message.updated_at = now
+
+    OutboundMessage.objects.bulk_update(
+        messages, ["status", "sent_at", "last_error", "next_attempt_at", "text", "updated_at"]
+    )
+
+
+def process_queue(gateway, batch_size=100, workers=None):
+    """
+    Claims one batch of due messages, sends it and stores the outcome.
+    Returns {"sent": n, "retry": n, "failed": n}.
+    """
+    workers = workers or getattr(settings, "SMS_WORKERS", DEFAULT_WORKERS)
+    counts = {"sent": 0, "retry": 0, "failed": 0}
+    # Leave messages queued while the breaker is open instead of burning attempts
+    if not gateway.available():
+        return counts
+
+    messages = claim_due_messages(batch_size)
+    if not messages:
+        return counts
+
+    record_results(messages, deliver(messages, gateway, workers))
+
+    for message in messages:
+        counts["retry" if message.status == "pending" else message.status] += 1
+    return counts
+
+
+def purge_finished_messages(retention_days=None):
+    """
+    Deletes sent and failed messages last updated more than
+    ``retention_days`` (default SMS_RETENTION_DAYS) ago, in batches.
+    Returns the number of deleted messages.
+    """
+    if retention_days is None:
+        retention_days = getattr(settings, "SMS_RETENTION_DAYS", DEFAULT_RETENTION_DAYS)
+    finished = OutboundMessage.objects.filter(
+        status__in=("sent", "failed"), updated_at__lt=timezone.now() - timedelta(days=retention_days)
+    )
+    deleted = 0
+    while True:
+        batch = list(finished.values_list("pk", flat=True)[:PURGE_BATCH_SIZE])
+        if not batch:
+            return deleted
+        deleted += OutboundMessage.objects.filter(pk__in=batch).delete()[0]
@@ -0,0 +1,234 @@
+"""
+Status transitions of service requests and their vendor assignments.
+
+Every ServiceRequestByUser keeps a ``version``, the number of its
+assignments that are open (assigned), completed and cancelled, and the
+number of entries of ``request_for_services`` that no completed or
+cancelled assignment covers yet. The request status follows from those
+counters alone:
+
+    no assignments                           -> unchanged (pending, or cancelled outright)
+    every assignment cancelled               -> cancelled
+    every requested service covered by a
+    completed or cancelled assignment        -> completed
+    otherwise                                -> assigned
+
+The uncovered count is recounted by each transition from the request's
+assignment rows (a handful per request), read under the same version.
+
+A transition reads the request, computes the new counters and status in
+memory, and writes them with ``UPDATE ... WHERE version = n``. The changed
+assignments are then written with ``UPDATE ... WHERE status = <old>`` in the
+same transaction. When another worker got there first the version no
+longer matches, nothing is written and the transition is retried on a
+fresh read, so concurrent vendors never lose each other's changes and no
+row stays locked while a client waits.
+
+Creating assignments only adds to the open counter (``add_open_assignments``)
+and bumps the version, so it needs no retry. New assignments are open, so
+they do not change the uncovered count. Assignments are only ever
+deleted together with their request.
+
+The retries need fresh reads: call ``set_assignment_status`` and
+``cancel_request`` outside of any transaction (as the views do).
+"""
+import json
+import random
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, CharField, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from .models import ServiceAssignment, ServiceRequestByUser
+from .utils_calendar import sync_request_bookings
+from .utils_matching import requests_changed
+
+DEFAULT_ATTEMPTS = 10
+RETRY_BASE_SECONDS = 0.005
+
+OPEN, COMPLETED, CANCELLED = "assigned", "completed", "cancelled"
+
+COUNTERS = {OPEN: "open_count", COMPLETED: "completed_count", CANCELLED: "cancelled_count"}
+
+# Assignment status -> statuses it may change to. A vendor can reopen work
+# marked completed by mistake; a cancelled assignment stays cancelled.
+ASSIGNMENT_TRANSITIONS = {
+    OPEN: {COMPLETED, CANCELLED},
+    COMPLETED: {OPEN},
+    CANCELLED: set(),
+}
+
+
+class TransitionError(ValueError):
+    """The transition is not allowed from the current status."""
+
+
+class TransitionConflict(Exception):
+    """Concurrent changes kept winning; the transition was given up."""
+
+
+def derive_status(open_count, completed_count, cancelled_count, uncovered_count, current):
+    if not (open_count or completed_count or cancelled_count):
+        return current
+    if not (open_count or completed_count):
+        return CANCELLED
+    if not uncovered_count and (completed_count or cancelled_count):
+        return COMPLETED
+    return OPEN
+
+
+def _service_key(service):
+    # Entries may be plain names or JSON objects
+    return json.dumps(service, sort_keys=True, default=str)
+
+
+def count_uncovered(requested, closed_services):
+    """
+    Entries of ``requested`` (a request_for_services value) missing from all
+    of ``closed_services``, the service lists of the closed assignments.
+    """
+    covered = {_service_key(service) for services in closed_services for service in services or []}
+    return sum(1 for service in requested or [] if _service_key(service) not in covered)
+
+
+def _attempts():
+    return getattr(settings, "REQUEST_TRANSITION_ATTEMPTS", DEFAULT_ATTEMPTS)
+
+
+def _backoff(attempt):
+    # Jitter keeps the losers of one race from colliding again
+    time.sleep(random.uniform(0, RETRY_BASE_SECONDS * 2 ** min(attempt, 6)))
+
+
+def _transition(service_request, vendor_ids, new_status, strict, whole_request=False):
+    """
+    Moves the assignments of ``vendor_ids`` to ``new_status`` and returns
+    the vendor IDs that actually changed. With ``strict`` an assignment that
+    is missing or may not change raises TransitionError, otherwise it is
+    left alone. ``whole_request`` cancels a request that has no assignments.
+    """
+    pk = service_request.pk
+    fields = ("version", "status", "request_for_services", "uncovered_count", *COUNTERS.values())
+
+    for attempt in range(_attempts()):
+        row = ServiceRequestByUser.objects.filter(pk=pk).values(*fields).first()
+        if row is None:
+            raise ServiceRequestByUser.DoesNotExist(f"service request {pk} no longer exists")
+
+        assignments = {
+            vendor_id: (assignment_status, services)
+            for vendor_id, assignment_status, services in ServiceAssignment.objects.filter(service_request_id=pk)
+            .values_list("vendor_unique_id", "status", "services")
+        }
+        moves = {}
+        for vendor_id in vendor_ids:
+            old = assignments.get(vendor_id, (None, None))[0]
+            if old is None or new_status not in ASSIGNMENT_TRANSITIONS.get(old, ()):
+                if strict and old is None:
+                    raise TransitionError("Vendor not assigned to this request")
+                if strict and old != new_status:
+                    raise TransitionError(f"A {old} assignment cannot be changed to {new_status}")
+                continue
+            moves[vendor_id] = old
+
+        counters = {field: row[field] for field in COUNTERS.values()}
+        for old in moves.values():
+            counters[COUNTERS[old]] -= 1
+            counters[COUNTERS[new_status]] += 1
+        uncovered = count_uncovered(row["request_for_services"], [
+            services for vendor_id, (assignment_status, services) in assignments.items()
+            if (new_status if vendor_id in moves else assignment_status) in (COMPLETED, CANCELLED)
+        ])
+        status = derive_status(
+            counters["open_count"], counters["completed_count"], counters["cancelled_count"], uncovered, row["status"]
+        )
+        if whole_request and not any(counters.values()):
+            status = CANCELLED
+
+        if not moves and status == row["status"] and uncovered == row["uncovered_count"]:
+            for name, value in row.items():
+                setattr(service_request, name, value)
+            return []
+
+        now = timezone.now()
+        with transaction.atomic():
+            won = ServiceRequestByUser.objects.filter(pk=pk, version=row["version"]).update(
+                version=row["version"] + 1, status=status, uncovered_count=uncovered, updated_at=now, **counters
+            )
+            if won:
+                # Every writer bumps the version, so the statuses read above are still current
+                for old in set(moves.values()):
+                    ServiceAssignment.objects.filter(
+                        service_request_id=pk, status=old,
+                        vendor_unique_id__in=[vendor_id for vendor_id, moved in moves.items() if moved == old],
+                    ).update(status=new_status, updated_at=now)
+
+                for name, value in counters.items():
+                    setattr(service_request, name, value)
+                service_request.uncovered_count = uncovered
+                service_request.version, service_request.status, service_request.updated_at = (
+                    row["version"] + 1, status, now
+                )
+                sync_request_bookings(service_request)
+                transaction.on_commit(lambda: requests_changed([pk]))
+                return list(moves)
+
+        _backoff(attempt)
+
+    raise TransitionConflict(f"service request {pk} kept changing; gave up after {_attempts()} attempts")
+
+
+def set_assignment_status(service_request, vendor_id, new_status):
+    """
+    Changes the status of one vendor's assignment and updates the request's
+    counters and status. Raises TransitionError for an unknown vendor or a
+    transition ASSIGNMENT_TRANSITIONS does not allow.
+    """
+    if new_status not in ASSIGNMENT_TRANSITIONS:
+        raise TransitionError(f"Unknown status: {new_status}")
+    return _transition(service_request, [vendor_id], new_status, strict=True)
+
+
+def cancel_request(service_request, vendor_ids):
+    """
+    Cancels the open assignments of ``vendor_ids`` and returns the vendor IDs
+    that were cancelled. A request without any assignments is cancelled as
+    a whole.
+    """
+    return _transition(service_request, list(vendor_ids), CANCELLED, strict=False, whole_request=True)
+
+
+def refresh_request_status(service_request):
+    """
+    Recounts the uncovered services and the status of a request whose
+    request_for_services changed. Writes nothing when neither changed.
+    """
+    _transition(service_request, [], OPEN, strict=False)
+
+
+def add_open_assignments(counts, now=None):
+    """
+    Adds newly created open assignments to the counters: ``counts`` maps
+    request pk -> number of assignments created. One UPDATE for the batch;
+    the version bump makes concurrent transitions of these requests retry.
+    """
+    counts = {pk: count for pk, count in counts.items() if count}
+    if not counts:
+        return
+    added = Case(
+        *(When(pk=pk, then=Value(count)) for pk, count in counts.items()),
+        default=Value(0), output_field=IntegerField(),
+    )
+    # derive_status in SQL, with at least one open assignment
+    status = Case(
+        When(Q(uncovered_count=0) & (Q(completed_count__gt=0) | Q(cancelled_count__gt=0)), then=Value(COMPLETED)),
+        default=Value(OPEN), output_field=CharField(),
+    )
+    ServiceRequestByUser.objects.filter(pk__in=list(counts)).update(
+        open_count=F("open_count") + added,
+        version=F("version") + 1,
+        status=status,
+        updated_at=now or timezone.now(),
+    )
@@ -0,0 +1,96 @@
+"""
+Bill line items and totals, in Decimal.
+
+``Billing.bill_item`` rows are positional lists:
+
+    [description, hsn, quantity, rate, amount, cgst_rate, cgst_amount,
+     sgst_rate, sgst_amount, per]
+
+Only the description is required. A missing amount is quantity * rate, and
+a missing tax amount is amount * rate / 100. Amounts are rounded to paise
+(half up) per line, and totals are the sums of the rounded lines, so the
+stored totals always match the invoice. No Django models are used here:
+the PDF workers import this module too.
+"""
+from collections import namedtuple
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+PAISE = Decimal("0.01")
+
+LineItem = namedtuple(
+    "LineItem",
+    "description hsn quantity rate amount cgst_rate cgst_amount sgst_rate sgst_amount per",
+)
+BillTotals = namedtuple("BillTotals", "taxable cgst sgst grand")
+
+
+def to_decimal(value, default=None):
+    if value is None or value == "":
+        if default is None:
+            raise ValueError("missing number")
+        return default
+    if isinstance(value, bool):
+        raise ValueError(f"not a number: {value!r}")
+    try:
+        number = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(f"not a number: {value!r}")
+    if not number.is_finite():
+        raise ValueError(f"not a number: {value!r}")
+    return number
+
+
+def money(value):
+    return value.quantize(PAISE, rounding=ROUND_HALF_UP)
+
+
+def parse_line_item(item):
+    """LineItem for one ``bill_item`` row; raises ValueError if it is malformed."""
+    if not isinstance(item, (list, tuple)) or not item:
+        raise ValueError("each item must be a non-empty list")
+
+    def at(index):
+        return item[index] if len(item) > index else None
+
+    zero = Decimal(0)
+    quantity = to_decimal(at(2), zero)
+    rate = to_decimal(at(3), zero)
+    amount = money(to_decimal(at(4), quantity * rate))
+    cgst_rate = to_decimal(at(5), zero)
+    cgst_amount = money(to_decimal(at(6), amount * cgst_rate / 100))
+    sgst_rate = to_decimal(at(7), zero)
+    sgst_amount = money(to_decimal(at(8), amount * sgst_rate / 100))
+
+    return LineItem(
+        description=at(0) if at(0) is not None else "",
+        hsn=at(1) if at(1) is not None else "",
+        quantity=quantity,
+        rate=rate,
+        amount=amount,
+        cgst_rate=cgst_rate,
+        cgst_amount=cgst_amount,
+        sgst_rate=sgst_rate,
+        sgst_amount=sgst_amount,
+        per=at(9) if at(9) is not None else "",
+    )
+
+
+def parse_line_items(items):
+    """
+    LineItems for a whole ``bill_item`` list. The ValueError of a bad row
+    names its position (1-based, as on the invoice).
+    """
+    lines = []
+    for position, item in enumerate(items or [], start=1):
+        try:
+            lines.append(parse_line_item(item))
+        except ValueError as exc:
+            raise ValueError(f"item {position}: {exc}")
+    return lines
+
+
+def compute_totals(lines):
+    taxable = sum((line.amount for line in lines), Decimal("0.00"))
+    cgst = sum((line.cgst_amount for line in lines), Decimal("0.00"))
+    sgst = sum((line.sgst_amount for line in lines), Decimal("0.00"))
+    return BillTotals(taxable=taxable, cgst=cgst, sgst=sgst, grand=taxable + cgst + sgst)
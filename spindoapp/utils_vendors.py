@@ -0,0 +1,164 @@
+"""
+Vendor service categories as indexed rows (VendorCategory).
+
+``Vendor.category`` is free-form JSON written by the apps, in one of the
+shapes below. It stays the value the API reads and writes; after every
+save its (category, sub-category) pairs are copied into VendorCategory so
+the vendor directory can filter with an index instead of scanning JSON.
+
+    {"Solar": ["Installation", "Repair"], "Electrical": "Wiring"}
+    [{"category": "Solar", "subcategories": ["Installation"]}]
+    ["Solar", "Electrical"]                      (whole categories)
+    "Solar"
+
+Names are matched case-insensitively against the published category tree
+and stored with its spelling; unknown names are stored as given.
+"""
+from django.db import transaction
+from django.db.models import Q
+
+from .models import VendorCategory
+from .utils_categories import get_category_tree
+
+_CATEGORY_KEYS = ("category", "prod_cate", "name")
+_SUB_KEYS = ("subcategories", "sub_categories", "subcategory", "sub_category", "sub_cate")
+
+
+def _clean(name):
+    return " ".join(str(name).split()) if name is not None else ""
+
+
+def _fold(name):
+    return _clean(name).casefold()
+
+
+def _as_list(value):
+    if value is None or value is True or value is False:
+        return []
+    if isinstance(value, (list, tuple, set)):
+        return list(value)
+    if isinstance(value, dict):
+        return [key for key, enabled in value.items() if enabled]
+    return [value]
+
+
+def category_pairs(value):
+    """{(category, sub_category), ...} named by a ``Vendor.category`` value."""
+    entries = []
+    if isinstance(value, dict):
+        entries = list(value.items())
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            if isinstance(item, dict):
+                category = next((item[key] for key in _CATEGORY_KEYS if key in item), None)
+                subs = next((item[key] for key in _SUB_KEYS if key in item), None)
+                entries.append((category, subs))
+            else:
+                entries.append((item, None))
+    elif value:
+        entries = [(value, None)]
+
+    pairs = set()
+    for category, subs in entries:
+        category = _clean(category)
+        if not category:
+            continue
+        names = [_clean(sub) for sub in _as_list(subs) if _clean(sub)]
+        for sub in names or [""]:
+            pairs.add((category, sub))
+    return pairs
+
+
+def _catalogue():
+    # {folded category: (category, {folded sub: sub})} from the cached tree
+    tree, _ = get_category_tree()
+    return {
+        _fold(node["category"]): (node["category"], {_fold(sub): sub for sub in node["subcategories"]})
+        for node in tree
+    }
+
+
+def canonical_pair(category, sub_category="", catalogue=None):
+    """(category, sub_category) with the spelling of the category tree."""
+    catalogue = _catalogue() if catalogue is None else catalogue
+    category, sub_category = _clean(category), _clean(sub_category)
+    entry = catalogue.get(_fold(category))
+    if entry is None:
+        return category, sub_category
+    name, subs = entry
+    return name, subs.get(_fold(sub_category), sub_category)
+
+
+def canonical_pairs(value):
+    """category_pairs(value) with the spelling of the category tree."""
+    catalogue = _catalogue()
+    return {canonical_pair(category, sub, catalogue) for category, sub in category_pairs(value)}
+
+
+def subcategory_owners(sub_category, catalogue=None):
+    """[(category, sub_category), ...] of the tree that have a subcategory of this name."""
+    catalogue = _catalogue() if catalogue is None else catalogue
+    folded = _fold(sub_category)
+    return [(name, subs[folded]) for name, subs in catalogue.values() if folded in subs]
+
+
+def request_service_pairs(value):
+    """
+    canonical_pairs for a ``request_for_services`` value, which is usually a
+    flat list of names. A bare name that is not a category of the tree but
+    one of its subcategories names that subcategory, in every category that
+    has it.
+    """
+    catalogue = _catalogue()
+    pairs = set()
+    for category, sub_category in category_pairs(value):
+        owners = [] if sub_category or _fold(category) in catalogue else subcategory_owners(category, catalogue)
+        pairs.update(owners or [canonical_pair(category, sub_category, catalogue)])
+    return pairs
+
+
+@transaction.atomic
+def sync_vendor_categories(vendor):
+    """Makes the VendorCategory rows of ``vendor`` match ``vendor.category``."""
+    wanted = canonical_pairs(vendor.category)
+    stored = {
+        (row.category, row.sub_category): row.pk
+        for row in VendorCategory.objects.filter(vendor_id=vendor.pk)
+    }
+
+    stale = [pk for pair, pk in stored.items() if pair not in wanted]
+    if stale:
+        VendorCategory.objects.filter(pk__in=stale).delete()
+    missing = wanted - stored.keys()
+    if missing:
+        VendorCategory.objects.bulk_create(
+            [VendorCategory(vendor_id=vendor.pk, category=category, sub_category=sub) for category, sub in missing],
+            ignore_conflicts=True,
+        )
+
+
+def filter_by_category(request, queryset):
+    """
+    Applies ?category= and ?subcategory= to a Vendor queryset through the
+    VendorCategory index. A vendor offering a whole category matches every
+    subcategory of it; a subcategory given without its category matches it
+    in every category of the tree that has it.
+    """
+    category = request.query_params.get("category", "").strip()
+    sub_category = request.query_params.get("subcategory", "").strip()
+    if not category and not sub_category:
+        return queryset
+
+    rows = VendorCategory.objects.all()
+    if category:
+        category, sub_category = canonical_pair(category, sub_category)
+        rows = rows.filter(category=category)
+        if sub_category:
+            rows = rows.filter(Q(sub_category=sub_category) | Q(sub_category=""))
+    else:
+        owners = subcategory_owners(sub_category)
+        spellings = {_clean(sub_category), *(sub for _, sub in owners)}
+        rows = rows.filter(
+            Q(sub_category__in=spellings) | Q(category__in=[category for category, _ in owners], sub_category="")
+        )
+    return queryset.filter(id__in=rows.values("vendor_id"))
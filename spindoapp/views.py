@@ -1,6 +1,9 @@
-import random
-import requests
-from shlex import quote
+import io
+import zipfile
+from decimal import Decimal
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags, quote_etag
 from django.utils import timezone
 from datetime import datetime, timedelta
 from django.utils import timezone
@@ -9,14 +12,31 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.decorators import api_view
 from django.contrib.auth.hashers import make_password
-from .utils_billing import generate_bill_pdf
+from .utils_billing import bill_file_name, bill_fingerprint, bill_snapshot
+from .utils_render import current_pdf_path, iter_bill_pdfs, render_combined, render_to_memory, schedule_render
 from rest_framework_simplejwt.tokens import RefreshToken, TokenError
 from rest_framework.permissions import AllowAny
 from .serializers import (CustomerRegistrationSerializer, LoginSerializer, ServiceBillSerializer, StaffAdminRegistrationSerializer,StaffIssueSerializer,BillingSerializer, ContactUsSerializer,SolarInstallationQuerySerializer,CompanyDetailsItemSerializer,
                           RegisteredCustomerDetailSerializer, RegisteredCustomerListSerializer,
                           StaffAdminDetailSerializer, StaffAdminListSerializer,VendorRegistrationSerializer,ServiceCategorySerializer,ServiceRequestByUserSerializer,VendorRequestSerializer,CustomerIssueSerializer)
 from rest_framework.permissions import IsAuthenticated
-from .authentication import CustomJWTAuthentication
+from .authentication import CustomJWTAuthentication, is_token_revoked
+from .utils_cache import get_alllog, update_alllog
+from .utils_calendar import Calendar, schedule_conflicts, slot_for, vendor_calendar
+from .utils_categories import get_category_tree
+from .utils_geography import filter_by_geography, get_geography
+from .utils_matching import rank_vendors, requests_changed
+from .utils_vendors import filter_by_category
+from .utils_pagination import iterate_in_batches, paginate_queryset
+from .utils_sms import enqueue_sms, send_otp_sms
+from .utils_otp import (
+    EXPIRED as OTP_EXPIRED, INVALID as OTP_INVALID, LOCKED as OTP_LOCKED, VERIFIED as OTP_VERIFIED, get_otp_store, new_code,
+)
+from .utils_state import (
+    TransitionConflict, TransitionError, add_open_assignments, cancel_request, refresh_request_status,
+    set_assignment_status,
+)
+from .utils_totals import to_decimal
 from .permissions import (IsAdmin, IsAdminFromAllLog, IsAdminOrCustomerFromAllLog, IsAdminOrStaff, IsCustomerFromAllLog, IsStaffAdminOwner, check_admin_or_staff_role,IsAdminOrStaffAdminFromAllLog,IsStaffAdminFromAllLog,
                           PERMISSION_DENIED, ONLY_ADMIN_CAN_CREATE_STAFF, ONLY_CUSTOMERS_CAN_UPDATE,
                           ONLY_ADMIN_AND_STAFF_CAN_UPDATE, ONLY_ACCESS_OWN_DATA, ONLY_UPDATE_OWN_DATA,
@@ -24,7 +44,7 @@ from .permissions import (IsAdmin, IsAdminFromAllLog, IsAdminOrCustomerFromAllLo
                           STAFF_NOT_FOUND, UNIQUE_ID_REQUIRED, UNIQUE_ID_REQUIRED_FOR_CUSTOMER,
                           UNIQUE_ID_REQUIRED_FOR_STAFF, EMAIL_ALREADY_REGISTERED, 
                           MOBILE_NUMBER_ALREADY_REGISTERED)
-from .models import ServiceBill, StaffAdmin, RegisteredCustomer, AllLog, Vendor,ServiceCategory,PhoneOTP,VendorRequest,CustomerIssue,ServiceRequestByUser,StaffIssue,DistrictBlock,Billing, ContactUs,SolarInstallationQuery,CompanyDetailsItem
+from .models import ServiceBill, StaffAdmin, RegisteredCustomer, AllLog, Vendor,ServiceCategory,VendorRequest,CustomerIssue,ServiceRequestByUser,ServiceAssignment,VendorBooking,StaffIssue,GstMonthlySummary,DistrictBlock,Billing, ContactUs,SolarInstallationQuery,CompanyDetailsItem
 from django.db import transaction
 
 class CustomTokenRefreshView(APIView):
@@ -37,6 +57,11 @@ class CustomTokenRefreshView(APIView):
             return Response({"status": False, "message": "Refresh token is required"}, status=status.HTTP_400_BAD_REQUEST)
         try:
             refresh = RefreshToken(refresh_token)
+            if settings.JWT_CLAIMS_PRINCIPAL and is_token_revoked(refresh):
+                return Response({
+                    "status": False,
+                    "message": "Invalid or expired refresh token"
+                }, status=status.HTTP_401_UNAUTHORIZED)
             access_token = str(refresh.access_token)
             return Response({
                 "status": True,
@@ -86,12 +111,20 @@ class CustomerRegistrationView(APIView):
 
         # If user is admin or staff, return all users
         if check_admin_or_staff_role(request.user):
-            customers = RegisteredCustomer.objects.all().order_by("-created_at")
+            customers, pagination = paginate_queryset(
+                request, filter_by_geography(request, RegisteredCustomer.objects.all())
+            )
             serializer = RegisteredCustomerListSerializer(customers, many=True)
+            if pagination is None:
+                return Response({
+                    "status": True,
+                    "data": serializer.data,
+                    "count": len(serializer.data)
+                }, status=status.HTTP_200_OK)
             return Response({
                 "status": True,
                 "data": serializer.data,
-                "count": customers.count()
+                **pagination
             }, status=status.HTTP_200_OK)
 
         # If user is customer, return only their own data
@@ -104,8 +137,8 @@ class CustomerRegistrationView(APIView):
             try:
                 customer = RegisteredCustomer.objects.get(unique_id=unique_id)
                 # Check if the logged-in user matches the requested unique_id
-                log = AllLog.objects.get(unique_id=unique_id)
-                if log.phone != request.user.phone:
+                log = get_alllog(request, unique_id=unique_id)
+                if log is None or log.phone != request.user.phone:
                     return Response({
                         "status": False,
                         "message": ONLY_ACCESS_OWN_DATA
@@ -260,12 +293,18 @@ class StaffAdminRegistrationView(APIView):
         
         # Admin can view all staff with is_active field
         if request.user.role == "admin":
-            staffs = StaffAdmin.objects.all().order_by("-created_at")
+            staffs, pagination = paginate_queryset(request, StaffAdmin.objects.all())
             serializer = StaffAdminRegistrationSerializer(staffs, many=True)
+            if pagination is None:
+                return Response({
+                    "status": True,
+                    "data": serializer.data,
+                    "count": len(serializer.data)
+                }, status=status.HTTP_200_OK)
             return Response({
                 "status": True,
                 "data": serializer.data,
-                "count": len(serializer.data)
+                **pagination
             }, status=status.HTTP_200_OK)
         
         # Staff admin can only view their own data with unique_id
@@ -354,6 +393,8 @@ class StaffAdminRegistrationView(APIView):
         
         try:
             staff = StaffAdmin.objects.get(unique_id=unique_id)
+            # AllLog fields to change, written in one update_alllog call
+            account_changes = {}
             
             # If staffadmin, verify they are updating their own data
             if user_role == "staffadmin":
@@ -370,19 +411,14 @@ class StaffAdminRegistrationView(APIView):
                         "status": False,
                         "message": MOBILE_NUMBER_CANNOT_CHANGE
                     }, status=status.HTTP_400_BAD_REQUEST)
-                if 'password' in request.data:
-                    try:
-                        alllog = AllLog.objects.get(unique_id=unique_id)
-                        alllog.password = make_password(request.data['password'])
-                        alllog.save()
-                    except AllLog.DoesNotExist:
-                        pass
                 # Staffadmin cannot change is_active
                 if 'is_active' in request.data:
                     return Response({
                         "status": False,
                         "message": CANNOT_CHANGE_ACTIVE_STATUS
                     }, status=status.HTTP_400_BAD_REQUEST)
+                if 'password' in request.data:
+                    account_changes['password'] = make_password(request.data['password'])
                 
                 # Update allowed fields for staff: can_name, email_id, address, can_aadharcard
                 if 'can_name' in request.data:
@@ -391,12 +427,7 @@ class StaffAdminRegistrationView(APIView):
                     staff.email_id = request.data['email_id']
                 
                     # Also update in AllLog
-                    try:
-                        alllog = AllLog.objects.get(unique_id=unique_id)
-                        alllog.email = request.data['email_id']
-                        alllog.save()
-                    except AllLog.DoesNotExist:
-                        pass
+                    account_changes['email'] = request.data['email_id']
                 if 'address' in request.data:
                     staff.address = request.data['address']
                 if 'staff_image' in request.FILES:
@@ -416,19 +447,9 @@ class StaffAdminRegistrationView(APIView):
                     staff.email_id = request.data['email_id']
                 
                     # Also update in AllLog
-                    try:
-                        alllog = AllLog.objects.get(unique_id=unique_id)
-                        alllog.email = request.data['email_id']
-                        alllog.save()
-                    except AllLog.DoesNotExist:
-                        pass
+                    account_changes['email'] = request.data['email_id']
                 if 'password' in request.data:
-                    try:
-                        alllog = AllLog.objects.get(unique_id=unique_id)
-                        alllog.password = make_password(request.data['password'])
-                        alllog.save()
-                    except AllLog.DoesNotExist:
-                        pass
+                    account_changes['password'] = make_password(request.data['password'])
                 if 'can_aadharcard' in request.FILES:
                     staff.can_aadharcard = request.FILES['can_aadharcard']
                 if 'mobile_number' in request.data:
@@ -447,23 +468,15 @@ class StaffAdminRegistrationView(APIView):
 
                     staff.mobile_number = new_mobile
 
-                    try:
-                        alllog = AllLog.objects.get(unique_id=unique_id)
-                        alllog.phone = new_mobile
-                        alllog.save()
-                    except AllLog.DoesNotExist:
-                        pass
+                    account_changes['phone'] = new_mobile
                 
                 # Update is_active status
                 if 'is_active' in request.data:
-                    try:
-                        alllog = AllLog.objects.get(unique_id=unique_id)
-                        staff.is_active = request.data['is_active']
-                        alllog.is_active = request.data['is_active']
-                        alllog.save()
-                    except AllLog.DoesNotExist:
-                        pass
+                    account_changes['is_active'] = request.data['is_active']
             
+            # One load and one save of the account, however many fields changed
+            if account_changes and update_alllog(unique_id, **account_changes) and 'is_active' in account_changes:
+                staff.is_active = account_changes['is_active']
             staff.save()
             
             return Response({
@@ -492,7 +505,7 @@ class VendorRegistrationView(APIView):
 
         serializer = VendorRegistrationSerializer(data=request.data)
         if serializer.is_valid():
-            user_log = AllLog.objects.filter(unique_id=request.user.unique_id).first()
+            user_log = get_alllog(request, unique_id=request.user.unique_id)
             if not user_log:
                 return Response({
                     "status": False,
@@ -522,16 +535,22 @@ class VendorRegistrationView(APIView):
 
         # Admin or staff: get all vendors
         if user_role in ["admin", "staffadmin"]:
-            vendors = Vendor.objects.all().order_by("-created_at")
+            vendors, pagination = paginate_queryset(request, filter_by_geography(request, Vendor.objects.all()))
             serializer = VendorRegistrationSerializer(vendors, many=True)
             data = serializer.data
             
                 # Remove 'is_active' from each vendor dict for staffadmin
                 
+            if pagination is None:
+                return Response({
+                    "status": True,
+                    "data": data,
+                    "count": len(data)
+                }, status=status.HTTP_200_OK)
             return Response({
                 "status": True,
                 "data": data,
-                "count": len(data)
+                **pagination
             }, status=status.HTTP_200_OK)
 
         # Vendor: get only own data
@@ -543,8 +562,8 @@ class VendorRegistrationView(APIView):
                 }, status=status.HTTP_400_BAD_REQUEST)
             try:
                 vendor = Vendor.objects.get(unique_id=unique_id)
-                log = AllLog.objects.get(unique_id=unique_id)
-                if log.phone != request.user.phone:
+                log = get_alllog(request, unique_id=unique_id)
+                if log is None or log.phone != request.user.phone:
                     return Response({
                         "status": False,
                         "message": "You can only access your own data"
@@ -718,12 +737,18 @@ class VendorRequestView(APIView):
 
        
         if user_role == "admin":
-            requests = VendorRequest.objects.all()
+            requests, pagination = paginate_queryset(request, VendorRequest.objects.all())
             serializer = VendorRequestSerializer(requests, many=True)
+            if pagination is None:
+                return Response({
+                    "status": True,
+                    "data": serializer.data,
+                    "count": len(serializer.data)
+                }, status=status.HTTP_200_OK)
             return Response({
                 "status": True,
                 "data": serializer.data,
-                "count": requests.count()
+                **pagination
             }, status=status.HTTP_200_OK)
 
        
@@ -744,13 +769,21 @@ class VendorRequestView(APIView):
                         "message": "You can only access your own requests"
                     }, status=status.HTTP_403_FORBIDDEN)
 
-                requests = VendorRequest.objects.filter(vendor=vendor)
+                requests, pagination = paginate_queryset(
+                    request, VendorRequest.objects.filter(vendor=vendor)
+                )
                 serializer = VendorRequestSerializer(requests, many=True)
 
+                if pagination is None:
+                    return Response({
+                        "status": True,
+                        "data": serializer.data,
+                        "count": len(serializer.data)
+                    }, status=status.HTTP_200_OK)
                 return Response({
                     "status": True,
                     "data": serializer.data,
-                    "count": requests.count()
+                    **pagination
                 }, status=status.HTTP_200_OK)
 
             except Vendor.DoesNotExist:
@@ -828,11 +861,12 @@ class CustomerIssueAPIView(APIView):
         if user_id:
             issues = CustomerIssue.objects.filter(unique_id=user_id)
         else:
-            issues = CustomerIssue.objects.all().order_by("-created_at")
+            issues = CustomerIssue.objects.all()
 
+        issues, pagination = paginate_queryset(request, issues)
         serializer = CustomerIssueSerializer(issues, many=True)
         return Response(
-            {"status": True, "data": serializer.data},
+            {"status": True, "data": serializer.data, **(pagination or {})},
             status=status.HTTP_200_OK
         )
     def post(self, request):
@@ -931,23 +965,14 @@ class ServiceRequestAPIView(APIView):
             )
     
         elif request.user.role in ["admin", "staffadmin"]:
-            requests = ServiceRequestByUser.objects.all().order_by("-created_at")
+            requests = ServiceRequestByUser.objects.all()
     
         elif request.user.role == "vendor":
     
-            all_requests = ServiceRequestByUser.objects.all().order_by("-created_at")
-            vendor_requests = []
-    
-            for service_request in all_requests:
-                if service_request.assignments:
-                    for entry in service_request.assignments:
-                        # entry format:
-                        # [[services], vendor_unique_id, vendor_name]
-                        if entry[1] == request.user.unique_id:
-                            vendor_requests.append(service_request)
-                            break
-    
-            requests = vendor_requests
+            # One indexed join on ServiceAssignment (vendor_unique_id, status)
+            requests = ServiceRequestByUser.objects.filter(
+                service_assignments__vendor_unique_id=request.user.unique_id
+            )
     
         else:
             return Response(
@@ -955,10 +980,13 @@ class ServiceRequestAPIView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
     
+        requests, pagination = paginate_queryset(
+            request, filter_by_geography(request, requests).prefetch_related("service_assignments")
+        )
         serializer = ServiceRequestByUserSerializer(requests, many=True)
     
         return Response(
-            {"status": True, "data": serializer.data},
+            {"status": True, "data": serializer.data, **(pagination or {})},
             status=status.HTTP_200_OK
         )
 
@@ -1062,37 +1090,23 @@ class ServiceRequestAPIView(APIView):
                 vendor_ids_to_cancel = [vendor_ids_to_cancel]
         
             # ===============================
-            # ✅ IF NO ASSIGNMENTS → DIRECT CANCEL
+            # ✅ CANCEL ASSIGNMENTS (or the whole request if it has none)
             # ===============================
-            if not service.assignments:
-                service.status = "cancelled"
-                service.save()
-        
+            try:
+                cancelled_vendor_ids = cancel_request(service, vendor_ids_to_cancel)
+            except TransitionConflict:
+                return Response(
+                    {"status": False, "message": "Request is being updated, please retry"},
+                    status=status.HTTP_409_CONFLICT
+                )
+
+            if not service.open_count + service.completed_count + service.cancelled_count:
                 serializer = ServiceRequestByUserSerializer(service)
                 return Response(
                     {"status": True, "data": serializer.data},
                     status=status.HTTP_200_OK
                 )
-        
-            # ===============================
-            # ✅ UPDATE ASSIGNMENTS
-            # ===============================
-            updated_assignments = []
-            cancelled_vendor_ids = []
-        
-            for entry in service.assignments:
-                vendor_unique_id = entry[1]
-                current_status = entry[3]
-        
-                if vendor_unique_id in vendor_ids_to_cancel and current_status != "cancelled":
-                    entry[3] = "cancelled"
-                    cancelled_vendor_ids.append(vendor_unique_id)
-        
-                updated_assignments.append(entry)
-        
-            service.assignments = updated_assignments
-        
-          
+
             if cancelled_vendor_ids:
 
                 cancelled_vendors = AllLog.objects.filter(
@@ -1101,55 +1115,13 @@ class ServiceRequestAPIView(APIView):
                 )
             
                 message = f"Service Request {service.request_id} has been cancelled. Regards-ICDS Technical"
-                encoded_message = quote(message)
-            
-                for vendor in cancelled_vendors:
-                    if vendor.phone:
-            
-                        url = (
-                            f"http://bulksms.saakshisoftware.com/api/mt/SendSMS"
-                            f"?user=Brainrock"
-                            f"&password=123456"
-                            f"&senderid=BCSINF"
-                            f"&channel=trans"
-                            f"&DCS=0"
-                            f"&flashsms=0"
-                            f"&number=9058423148"   # use real vendor phone
-                            f"&text={encoded_message}"
-                            f"&route=04"
-                            f"&DLTTemplateId=1207163827265054435"
-                            f"&PEID=1201163222226675668"
-                        )
-            
-                        try:
-                            response = requests.get(url,  timeout=100000)
-            
-                            print("SMS Response:", response.status_code, response.text)
-            
-                            if response.status_code != 200:
-                                print("SMS failed for:", vendor.phone)
-            
-                        except Exception as e:
-                            print("SMS sending failed:", str(e)) # prevent crash if SMS fails
-        
-            
-            if service.assignments:
+                enqueue_sms(
+                    [vendor.phone for vendor in cancelled_vendors],
+                    message,
+                    kind="notification"
+                )
 
-                all_cancelled = all(entry[3] == "cancelled" for entry in service.assignments)
-                all_completed = all(entry[3] == "completed" for entry in service.assignments)
-            
-                if all_completed:
-                    service.status = "completed"
-            
-                elif all_cancelled:
-                    service.status = "cancelled"
-            
-                else:
-                    service.status = "assigned"
-            
-            else:
-                service.status = "cancelled"
-                # ✅ VENDOR STATUS UPDATE LOGIC
+        # ✅ VENDOR STATUS UPDATE LOGIC
         if request.user.role == "vendor":
 
             vendor_unique_id = request.data.get("vendor_unique_id")
@@ -1161,59 +1133,32 @@ class ServiceRequestAPIView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            updated = False
-
-            for entry in service.assignments:
-                # entry format:
-                # [services_list, vendor_unique_id, vendor_name, status]
-                if entry[1] == vendor_unique_id:
-                    entry[3] = new_status
-                    updated = True
-                    break
-
-            if not updated:
+            # Counters and status are updated in O(1), retried on concurrent changes
+            try:
+                set_assignment_status(service, vendor_unique_id, new_status)
+            except TransitionError as exc:
                 return Response(
-                    {"status": False, "message": "Vendor not assigned to this request"},
+                    {"status": False, "message": str(exc)},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-
-        
-            completed_services = []
-            cancelled_services = []
-
-           
-            for entry in service.assignments:
-                services_list = entry[0]     # list of services
-                vendor_status = entry[3]
-
-                if vendor_status == "completed":
-                    completed_services.extend(services_list)
-
-                elif vendor_status == "cancelled":
-                    cancelled_services.extend(services_list)
-
-           
-            closed_services = set(completed_services) | set(cancelled_services)
-
-          
-            all_services_closed = all(
-                req_service in closed_services
-                for req_service in service.request_for_services
-            )
-
-            if all_services_closed:
-                service.status = "completed"
-            else:
-                service.status = "assigned"
-
-            service.save()
+            except TransitionConflict:
+                return Response(
+                    {"status": False, "message": "Request is being updated, please retry"},
+                    status=status.HTTP_409_CONFLICT
+                )
 
             return Response(
                 {"status": True, "message": "Assignment status updated successfully"},
                 status=status.HTTP_200_OK
             )
 
-        
+        # The status follows the assignments; cancellations were handled above
+        if "status" in request.data and request.data.get("status") != "cancelled":
+            return Response(
+                {"status": False, "message": "status cannot be set directly; update the vendor assignments instead"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         serializer = ServiceRequestByUserSerializer(
             service,
             data=request.data,
@@ -1221,7 +1166,37 @@ class ServiceRequestAPIView(APIView):
         )
 
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                # A reschedule moves the vendors' bookings; refuse to double-book them
+                schedule = serializer.validated_data
+                if {"schedule_date", "schedule_time"} & schedule.keys() and not request.data.get("allow_conflict"):
+                    conflicts = schedule_conflicts(
+                        service,
+                        schedule.get("schedule_date", service.schedule_date),
+                        schedule.get("schedule_time", service.schedule_time)
+                    )
+                    if conflicts:
+                        return Response(
+                            {
+                                "status": False,
+                                "message": "Schedule conflict",
+                                "conflicts": [
+                                    {"vendor_unique_id": vendor_id, "conflicting_request_id": request_id}
+                                    for vendor_id, request_id in conflicts.items()
+                                ]
+                            },
+                            status=status.HTTP_409_CONFLICT
+                        )
+                serializer.save()
+
+            if "request_for_services" in serializer.validated_data:
+                try:
+                    refresh_request_status(service)
+                except TransitionConflict:
+                    return Response(
+                        {"status": False, "message": "Request is being updated, please retry"},
+                        status=status.HTTP_409_CONFLICT
+                    )
 
             return Response(
                 {"status": True, "message": "Request updated successfully"},
@@ -1262,10 +1237,29 @@ class ServiceRequestAPIView(APIView):
 
 
 class AssignVendorAPIView(APIView):
+    """
+    Assigns vendors to service requests.
+
+    Single request:  {"request_id": "REQ-001", "assignments": [...]}
+    Bulk:            {"bulk": {"REQ-001": [...], "REQ-002": [...]}}
+
+    Each assignment is {"vendor_unique_id": ..., "request_for_services": [...]}.
+    Both forms resolve every vendor with one query per table and write all
+    rows in one transaction, so the query count does not grow with the
+    number of requests or vendors.
+
+    A vendor already booked at an overlapping time on the request's
+    schedule_date is skipped ("schedule conflict") unless the assignment
+    has "allow_conflict": true. See utils_calendar.
+    """
     permission_classes = [IsAdminOrStaffAdminFromAllLog]
 
     @transaction.atomic
     def post(self, request):
+        bulk_payload = request.data.get("bulk")
+        if bulk_payload is not None:
+            return self.post_bulk(bulk_payload)
+
         request_id = request.data.get("request_id")
         assignments_payload = request.data.get("assignments")
 
@@ -1275,9 +1269,8 @@ class AssignVendorAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        try:
-            service_request = ServiceRequestByUser.objects.get(request_id=request_id)
-        except ServiceRequestByUser.DoesNotExist:
+        service_request = ServiceRequestByUser.objects.filter(request_id=request_id).first()
+        if service_request is None:
             return Response(
                 {"status": False, "message": "Request not found"},
                 status=status.HTTP_404_NOT_FOUND
@@ -1289,93 +1282,311 @@ class AssignVendorAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        if not service_request.assignments:
-            service_request.assignments = []
+        self.assign_vendors({request_id: service_request}, {request_id: assignments_payload})
 
-        for assignment in assignments_payload:
-            vendor_unique_id = assignment.get("vendor_unique_id")
-            service_list = assignment.get("request_for_services")
+        return Response(
+            {"status": True, "message": "Vendors assigned successfully"},
+            status=status.HTTP_200_OK
+        )
 
-            if not vendor_unique_id or not isinstance(service_list, list):
-                continue
+    def post_bulk(self, bulk_payload):
+        if not isinstance(bulk_payload, dict) or not bulk_payload:
+            return Response(
+                {"status": False, "message": "bulk must map request_id to assignments"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-            # Validate Vendor
-            try:
-                vendor_alllog = AllLog.objects.get(unique_id=vendor_unique_id, role="vendor")
-                vendor_obj = Vendor.objects.get(unique_id=vendor_unique_id)
-            except (AllLog.DoesNotExist, Vendor.DoesNotExist):
-                continue
+        service_requests = {}
+        for service_request in ServiceRequestByUser.objects.filter(request_id__in=list(bulk_payload)).order_by("id"):
+            service_requests.setdefault(service_request.request_id, service_request)
+
+        results = {}
+        payloads = {}
+        for request_id, assignments_payload in bulk_payload.items():
+            if request_id not in service_requests:
+                results[request_id] = {"request_id": request_id, "status": False, "message": "Request not found"}
+            elif not isinstance(assignments_payload, list):
+                results[request_id] = {"request_id": request_id, "status": False, "message": "assignments must be a list"}
+            else:
+                payloads[request_id] = assignments_payload
 
-            # Prevent duplicate vendor assignment
-            already_exists = any(
-                vendor_unique_id == entry[1]
-                for entry in service_request.assignments
-            )
+        found = {request_id: service_requests[request_id] for request_id in payloads}
+        for result in self.assign_vendors(found, payloads):
+            results[result["request_id"]] = result
 
-            if already_exists:
-                continue
+        return Response(
+            {"status": True, "results": [results[request_id] for request_id in bulk_payload]},
+            status=status.HTTP_200_OK
+        )
 
-            # ✅ EXACT STRUCTURE:
-            # [[services_list], vendor_unique_id, vendor_name]
-            new_entry = [
-                service_list,
-                vendor_unique_id,
-                vendor_obj.username,
-                "assigned",
-                 vendor_obj.mobile_number
-            ]
+    @staticmethod
+    def assign_vendors(service_requests, payloads):
+        """
+        Applies ``payloads`` (request_id -> assignments) to ``service_requests``
+        (request_id -> ServiceRequestByUser) and returns one result per request.
+        Must run inside a transaction.
+        """
+        vendor_ids = {
+            assignment.get("vendor_unique_id")
+            for assignments_payload in payloads.values()
+            for assignment in assignments_payload
+            if isinstance(assignment, dict) and assignment.get("vendor_unique_id")
+        }
 
-            service_request.assignments.append(new_entry)
+        # One query per table for the whole batch
+        active_vendor_ids = set(
+            AllLog.objects.filter(unique_id__in=vendor_ids, role="vendor").values_list("unique_id", flat=True)
+        )
+        # Locking the vendors serializes concurrent bookings of the same vendor
+        vendors = {
+            vendor.unique_id: vendor
+            for vendor in Vendor.objects.select_for_update().filter(unique_id__in=active_vendor_ids)
+            .order_by("id").only("unique_id", "username", "mobile_number")
+        }
+        calendar = Calendar(
+            vendors,
+            {service_request.schedule_date for service_request in service_requests.values() if service_request.schedule_date}
+        )
+        assigned_pairs = set(
+            ServiceAssignment.objects.filter(
+                service_request__in=list(service_requests.values())
+            ).values_list("service_request_id", "vendor_unique_id")
+        )
 
-        service_request.status = "assigned"
-        service_request.save()
+        now = timezone.now()
+        new_assignments = []
+        new_bookings = []
+        opened = {}
+        results = []
+
+        for request_id, assignments_payload in payloads.items():
+            service_request = service_requests[request_id]
+            assigned, skipped = [], []
+
+            for assignment in assignments_payload:
+                if not isinstance(assignment, dict):
+                    skipped.append({"vendor_unique_id": None, "reason": "invalid assignment"})
+                    continue
+
+                vendor_unique_id = assignment.get("vendor_unique_id")
+                service_list = assignment.get("request_for_services")
+
+                if not vendor_unique_id or not isinstance(service_list, list):
+                    skipped.append({"vendor_unique_id": vendor_unique_id, "reason": "invalid assignment"})
+                    continue
+
+                vendor_obj = vendors.get(vendor_unique_id)
+                if vendor_obj is None:
+                    skipped.append({"vendor_unique_id": vendor_unique_id, "reason": "vendor not found"})
+                    continue
+
+                # Prevent duplicate vendor assignment
+                if (service_request.id, vendor_unique_id) in assigned_pairs:
+                    skipped.append({"vendor_unique_id": vendor_unique_id, "reason": "already assigned"})
+                    continue
+
+                schedule_date = service_request.schedule_date
+                if schedule_date:
+                    slot = slot_for(schedule_date, service_request.schedule_time)
+                    conflict = calendar.conflict(vendor_unique_id, schedule_date, slot, service_request.pk)
+                    if conflict and not assignment.get("allow_conflict"):
+                        skipped.append({
+                            "vendor_unique_id": vendor_unique_id,
+                            "reason": "schedule conflict",
+                            "conflicting_request_id": conflict
+                        })
+                        continue
+                    calendar.book(vendor_unique_id, schedule_date, slot, service_request)
+                    new_bookings.append(VendorBooking(
+                        service_request=service_request,
+                        vendor_unique_id=vendor_unique_id,
+                        date=schedule_date,
+                        start_time=slot[0],
+                        end_time=slot[1]
+                    ))
+
+                new_assignments.append(ServiceAssignment(
+                    service_request=service_request,
+                    vendor_unique_id=vendor_unique_id,
+                    services=service_list,
+                    vendor_name=vendor_obj.username,
+                    vendor_phone=vendor_obj.mobile_number
+                ))
+                assigned_pairs.add((service_request.id, vendor_unique_id))
+                assigned.append(vendor_unique_id)
+
+            opened[service_request.pk] = len(assigned)
+            results.append({"request_id": request_id, "status": True, "assigned": assigned, "skipped": skipped})
+
+        if new_assignments:
+            ServiceAssignment.objects.bulk_create(new_assignments)
+            VendorBooking.objects.bulk_create(new_bookings, ignore_conflicts=True)
+            # Open counters, version and status of every request in one UPDATE
+            add_open_assignments(opened, now)
+        if service_requests:
+            # Bulk writes send no signals; refresh the matching index directly
+            request_pks = [service_request.pk for service_request in service_requests.values()]
+            transaction.on_commit(lambda: requests_changed(request_pks))
+
+        return results
+
+class VendorMatchAPIView(APIView):
+    """
+    Ranked vendor suggestions for one service request:
+    GET ?request_id=REQ-001&limit=10 (see utils_matching for the ranking).
+    """
+    permission_classes = [IsAdminOrStaffAdminFromAllLog]
+
+    def get(self, request):
+        request_id = request.query_params.get("request_id")
+        if not request_id:
+            return Response(
+                {"status": False, "message": "request_id is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", 10)), 50))
+        except ValueError:
+            return Response(
+                {"status": False, "message": "limit must be a number"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        service_request = ServiceRequestByUser.objects.filter(request_id=request_id).first()
+        if service_request is None:
+            return Response(
+                {"status": False, "message": "Request not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
 
+        matches = rank_vendors(service_request, limit)
+        names = dict(
+            Vendor.objects.filter(unique_id__in=[match.vendor_unique_id for match in matches])
+            .values_list("unique_id", "username")
+        )
         return Response(
-            {"status": True, "message": "Vendors assigned successfully"},
+            {
+                "status": True,
+                "request_id": request_id,
+                "data": [
+                    {"rank": rank, "username": names.get(match.vendor_unique_id), **match._asdict()}
+                    for rank, match in enumerate(matches, start=1)
+                ]
+            },
             status=status.HTTP_200_OK
         )
 
-@api_view(['GET'])
-def get_services_categories(request):
-
-    # Fetch only accepted records
-    services = ServiceCategory.objects.filter(status='published')
-
-    category_dict = {}
+class VendorCalendarAPIView(APIView):
+    """
+    A vendor's bookings for one day or the week (Monday to Sunday) around it:
+    GET ?vendor_id=VENDOR-001&date=YYYY-MM-DD&view=day|week
+    Vendors always get their own calendar.
+    """
+    permission_classes = [IsAuthenticated]
 
-    for service in services:
-        category = service.prod_cate
-        subcategory = service.sub_cate
+    def get(self, request):
+        if request.user.role == "vendor":
+            vendor_id = request.user.unique_id
+        elif check_admin_or_staff_role(request.user):
+            vendor_id = request.query_params.get("vendor_id")
+        else:
+            return Response(
+                {"status": False, "message": "Not allowed"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        if not vendor_id:
+            return Response(
+                {"status": False, "message": "vendor_id is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        if category not in category_dict:
-            category_dict[category] = set()
+        try:
+            day = datetime.strptime(request.query_params["date"], "%Y-%m-%d").date() \
+                if request.query_params.get("date") else datetime.now().date()
+        except ValueError:
+            return Response(
+                {"status": False, "message": "date must be YYYY-MM-DD"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        category_dict[category].add(subcategory)
+        if request.query_params.get("view") == "week":
+            first_day = day - timedelta(days=day.weekday())
+            last_day = first_day + timedelta(days=6)
+        else:
+            first_day = last_day = day
 
-    # Convert to response format
-    response_data = [
-        {
-            "category": category,
-            "subcategories": list(subcategories)
-        }
-        for category, subcategories in category_dict.items()
-    ]
+        bookings = [
+            {
+                "date": booking.date,
+                "start_time": booking.start_time.strftime("%H:%M"),
+                "end_time": booking.end_time.strftime("%H:%M"),
+                "request_id": booking.service_request.request_id,
+                "customer": booking.service_request.username,
+                "district": booking.service_request.district,
+                "block": booking.service_request.block,
+                "status": booking.service_request.status
+            }
+            for booking in vendor_calendar(vendor_id, first_day, last_day)
+        ]
+        return Response(
+            {
+                "status": True,
+                "data": {
+                    "vendor_unique_id": vendor_id,
+                    "from": first_day,
+                    "to": last_day,
+                    "bookings": bookings
+                }
+            },
+            status=status.HTTP_200_OK
+        )
 
-    return Response(
-        {
-            "status": True,
-            "data": response_data
-        },
-        status=status.HTTP_200_OK
-    )
+@api_view(['GET'])
+def get_services_categories(request):
+    # Grouped in the database and cached; see utils_categories
+    response_data, etag = get_category_tree()
+    cache_control = f"public, max-age={settings.CATEGORY_MAX_AGE}"
+
+    if _etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = Response(
+            {
+                "status": True,
+                "data": response_data
+            },
+            status=status.HTTP_200_OK
+        )
+    response["ETag"] = etag
+    response["Cache-Control"] = cache_control
+    return response
 @api_view(['GET'])
 def get_all_vendors(request):
-    vendors = Vendor.objects.filter(is_active=True).values('unique_id','username','address','category')
+    """
+    Active vendors, filtered on the server by ?category=, ?subcategory=
+    (VendorCategory index), ?district= and ?block= (district_block index),
+    with cursor pagination (utils_pagination).
+    """
+    vendors = Vendor.objects.filter(is_active=True)
+    vendors = filter_by_category(request, filter_by_geography(request, vendors))
+    vendors, pagination = paginate_queryset(
+        request, vendors.only('id', 'unique_id', 'username', 'address', 'category', 'created_at')
+    )
 
     return Response(
         {
             "status": True,
-            "data": list(vendors)
+            "data": [
+                {
+                    "unique_id": vendor.unique_id,
+                    "username": vendor.username,
+                    "address": vendor.address,
+                    "category": vendor.category
+                }
+                for vendor in vendors
+            ],
+            **(pagination or {})
         },
         status=status.HTTP_200_OK
     )
@@ -1397,11 +1608,12 @@ class StaffIssueAPIView(APIView):
         if user_id:
             issues = StaffIssue.objects.filter(unique_id=user_id)
         else:
-            issues = StaffIssue.objects.all().order_by("-created_at")
+            issues = StaffIssue.objects.all()
 
+        issues, pagination = paginate_queryset(request, issues)
         serializer = StaffIssueSerializer(issues, many=True)
         return Response(
-            {"status": True, "data": serializer.data},
+            {"status": True, "data": serializer.data, **(pagination or {})},
             status=status.HTTP_200_OK
         )
 
@@ -1488,56 +1700,33 @@ class StaffIssueAPIView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 class DistrictBlockAPIView(APIView):
+    """
+    Districts and blocks from the in-memory geography index (utils_geography),
+    served as pre-rendered JSON with an ETag. ?district= is case-insensitive.
+    """
 
     def get(self, request):
+        geography = get_geography()
         district = request.query_params.get('district', '').strip()
-        queryset = DistrictBlock.objects.all()
         if district:
-            blocks = list(
-                queryset.filter(district__iexact=district)
-                        .order_by('block')
-                        .values_list('block', flat=True)
-            )
-
-            if not blocks:
+            body = geography.district_body(district)
+            if body is None:
                 return Response(
                     {"status": False, "message": "No blocks found for this district"},
                     status=status.HTTP_404_NOT_FOUND
                 )
+        else:
+            body = geography.all_body
 
-            return Response(
-                {
-                    "status": True,
-                    "data": {
-                        "state": "Uttarakhand",
-                        "district": district.title(),
-                        "blocks": blocks
-                    }
-                },
-                status=status.HTTP_200_OK
-            )
-        districts = queryset.order_by('district', 'block') \
-                            .values('district', 'block')
-
-        result = {}
-        for item in districts:
-            result.setdefault(item['district'], []).append(item['block'])
-
-        response_data = [
-            {"district": d, "blocks": b}
-            for d, b in result.items()
-        ]
-
-        return Response(
-            {
-                "status": True,
-                "data": {
-                    "state": "Uttarakhand",
-                    "districts": response_data
-                }
-            },
-            status=status.HTTP_200_OK
-        )
+        content, etag = body
+        if _etag_matches(request, etag):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type="application/json")
+            response["Content-Length"] = str(len(content))
+        response["ETag"] = etag
+        response["Cache-Control"] = f"public, max-age={settings.GEOGRAPHY_MAX_AGE}"
+        return response
 
 class BillingAPIView(APIView):
     def get_permissions(self):
@@ -1569,18 +1758,50 @@ class BillingAPIView(APIView):
                 )
 
         # Otherwise filter queryset
-        bills = Billing.objects.all().order_by("-created_at")
+        bills = Billing.objects.all()
 
         if vendor_id:
             bills = bills.filter(vendor_id=vendor_id)
 
+        # Amount filters/sorting use the stored grand_total column
+        try:
+            min_total = request.query_params.get("min_total")
+            max_total = request.query_params.get("max_total")
+            if min_total:
+                bills = bills.filter(grand_total__gte=to_decimal(min_total))
+            if max_total:
+                bills = bills.filter(grand_total__lte=to_decimal(max_total))
+        except ValueError:
+            return Response(
+                {"status": False, "message": "min_total and max_total must be numbers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        sort = request.query_params.get("sort")
+        if sort in ("amount", "-amount"):
+            # Bills without totals (malformed bill_item) have no place in an amount order
+            bills = bills.filter(grand_total__isnull=False)
+            bills, pagination = paginate_queryset(
+                request, bills, order_field="grand_total", descending=sort == "-amount"
+            )
+        else:
+            bills, pagination = paginate_queryset(request, bills)
         serializer = BillingSerializer(bills, many=True)
 
+        if pagination is None:
+            return Response(
+                {
+                    "status": True,
+                    "data": serializer.data,
+                    "count": len(serializer.data)
+                },
+                status=status.HTTP_200_OK
+            )
         return Response(
             {
                 "status": True,
                 "data": serializer.data,
-                "count": bills.count()
+                **pagination
             },
             status=status.HTTP_200_OK
         )
@@ -1590,11 +1811,15 @@ class BillingAPIView(APIView):
         if serializer.is_valid():
             bill = serializer.save()
 
-            # Generate PDF after saving
-            generate_bill_pdf(bill)
+            # The PDF is rendered in the background; poll billing/render-status/
+            schedule_render(bill)
 
             return Response(
-                {"status": True, "message": "Bill created successfully"},
+                {
+                    "status": True,
+                    "message": "Bill created successfully",
+                    "data": {"bill_id": bill.bill_id, "render_status": bill.render_status}
+                },
                 status=status.HTTP_201_CREATED
             )
 
@@ -1625,10 +1850,14 @@ class BillingAPIView(APIView):
 
         if serializer.is_valid():
             bill = serializer.save()
-            generate_bill_pdf(bill)  # regenerate PDF
+            schedule_render(bill)  # regenerate PDF in the background
 
             return Response(
-                {"status": True, "message": "Bill updated successfully"},
+                {
+                    "status": True,
+                    "message": "Bill updated successfully",
+                    "data": {"bill_id": bill.bill_id, "render_status": bill.render_status}
+                },
                 status=status.HTTP_200_OK
             )
 
@@ -1659,6 +1888,239 @@ class BillingAPIView(APIView):
                 {"status": False, "message": "Bill not found"},
                 status=status.HTTP_404_NOT_FOUND
             )
+
+class BillRenderStatusAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        bill_id = request.query_params.get("bill_id")
+        if not bill_id:
+            return Response(
+                {"status": False, "message": "bill_id is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        bill = Billing.objects.filter(bill_id=bill_id).only(
+            "bill_id", "bill_pdf", "render_status", "render_error", "rendered_at"
+        ).first()
+        if bill is None:
+            return Response(
+                {"status": False, "message": "Bill not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        return Response(
+            {
+                "status": True,
+                "data": {
+                    "bill_id": bill.bill_id,
+                    "render_status": bill.render_status,
+                    "render_error": bill.render_error,
+                    "rendered_at": bill.rendered_at,
+                    "bill_pdf": bill.bill_pdf.url if bill.render_status == "ready" and bill.bill_pdf else None
+                }
+            },
+            status=status.HTTP_200_OK
+        )
+
+
+def _etag_matches(request, etag):
+    # True if the client's If-None-Match already names ``etag``
+    if_none_match = request.headers.get("If-None-Match")
+    if not if_none_match:
+        return False
+    client_etags = parse_etags(if_none_match)
+    return "*" in client_etags or etag in client_etags
+
+
+class BillDownloadAPIView(APIView):
+    """
+    Serves the bill PDF with Content-Length and an ETag (the bill's content
+    fingerprint). A current PDF on disk is streamed from the file; otherwise
+    the PDF is rendered in memory and, with write-through, cached on disk.
+    ?disposition=inline previews in the browser instead of downloading.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        bill_id = request.query_params.get("bill_id")
+        if not bill_id:
+            return Response(
+                {"status": False, "message": "bill_id is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            bill = Billing.objects.get(bill_id=bill_id)
+        except Billing.DoesNotExist:
+            return Response(
+                {"status": False, "message": "Bill not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        snapshot = bill_snapshot(bill)
+        fingerprint = bill_fingerprint(snapshot)
+        etag = quote_etag(fingerprint)
+
+        if _etag_matches(request, etag):
+            response = HttpResponseNotModified()
+            response["ETag"] = etag
+            return response
+
+        path = current_pdf_path(bill, fingerprint)
+        if path is not None:
+            response = FileResponse(open(path, "rb"), content_type="application/pdf")
+        else:
+            try:
+                content = render_to_memory(bill, snapshot)
+            except Exception as e:
+                return Response(
+                    {"status": False, "message": "Bill PDF could not be rendered", "error": str(e)},
+                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                )
+            response = HttpResponse(content, content_type="application/pdf")
+            response["Content-Length"] = str(len(content))
+
+        disposition = "inline" if request.query_params.get("disposition") == "inline" else "attachment"
+        response["Content-Disposition"] = f'{disposition}; filename="{bill_file_name(bill.bill_id)}"'
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+        return response
+
+class _ZipStream(io.RawIOBase):
+    # Write-only sink for zipfile; the bytes written so far are handed out by drain()
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class BillExportAPIView(APIView):
+    """
+    All bills created between ``from`` and ``to`` (YYYY-MM-DD, inclusive).
+    output=zip (default) streams one PDF per bill; output=pdf returns a
+    single document, capped at BILL_EXPORT_PDF_MAX_BILLS bills. Missing or
+    outdated PDFs are rendered in the worker pool.
+    """
+    permission_classes = [IsAdminOrStaffAdminFromAllLog]
+
+    def get(self, request):
+        try:
+            date_from = datetime.strptime(request.query_params.get("from", ""), "%Y-%m-%d")
+            date_to = datetime.strptime(request.query_params.get("to", ""), "%Y-%m-%d")
+        except ValueError:
+            return Response(
+                {"status": False, "message": "from and to are required as YYYY-MM-DD"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Not "format": DRF reserves that parameter for content negotiation
+        export_format = request.query_params.get("output", "zip")
+        if export_format not in ("zip", "pdf"):
+            return Response(
+                {"status": False, "message": "output must be zip or pdf"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        bills = Billing.objects.filter(created_at__gte=date_from, created_at__lt=date_to + timedelta(days=1))
+        name = f"bills_{date_from:%Y-%m-%d}_{date_to:%Y-%m-%d}"
+
+        if export_format == "pdf":
+            limit = settings.BILL_EXPORT_PDF_MAX_BILLS
+            snapshots = [bill_snapshot(bill) for bill in bills.order_by("created_at", "id")[:limit + 1]]
+            if not snapshots:
+                return Response(
+                    {"status": False, "message": "No bills in this period"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            if len(snapshots) > limit:
+                return Response(
+                    {"status": False, "message": f"More than {limit} bills in this period, use output=zip"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            content = render_combined(snapshots)
+            response = HttpResponse(content, content_type="application/pdf")
+            response["Content-Length"] = str(len(content))
+            response["Content-Disposition"] = f'attachment; filename="{name}.pdf"'
+            return response
+
+        response = StreamingHttpResponse(self.stream_zip(bills), content_type="application/zip")
+        response["Content-Disposition"] = f'attachment; filename="{name}.zip"'
+        return response
+
+    @staticmethod
+    def stream_zip(bills):
+        sink = _ZipStream()
+        failures = []
+        # PDFs are already compressed; storing them saves CPU
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as archive:
+            for bill, content, error in iter_bill_pdfs(iterate_in_batches(bills)):
+                if content is None:
+                    failures.append(f"{bill.bill_id}: {error}")
+                    continue
+                archive.writestr(bill_file_name(bill.bill_id), content)
+                yield sink.drain()
+            if failures:
+                archive.writestr("ERRORS.txt", "\n".join(failures))
+        yield sink.drain()
+
+class GstReportAPIView(APIView):
+    """
+    Monthly GST summary by HSN/SAC and rate, read from GstMonthlySummary.
+    Optional ?from=YYYY-MM&to=YYYY-MM (inclusive).
+    """
+    permission_classes = [IsAdminOrStaffAdminFromAllLog]
+
+    def get(self, request):
+        rows = GstMonthlySummary.objects.all()
+        try:
+            if request.query_params.get("from"):
+                rows = rows.filter(month__gte=datetime.strptime(request.query_params["from"], "%Y-%m").date())
+            if request.query_params.get("to"):
+                rows = rows.filter(month__lte=datetime.strptime(request.query_params["to"], "%Y-%m").date())
+        except ValueError:
+            return Response(
+                {"status": False, "message": "from and to must be YYYY-MM"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        data = []
+        totals = {"taxable": Decimal("0.00"), "cgst": Decimal("0.00"), "sgst": Decimal("0.00")}
+        for row in rows.order_by("month", "hsn", "cgst_rate", "sgst_rate"):
+            data.append({
+                "month": f"{row.month:%Y-%m}",
+                "hsn": row.hsn,
+                "cgst_rate": str(row.cgst_rate),
+                "sgst_rate": str(row.sgst_rate),
+                "taxable": str(row.taxable),
+                "cgst": str(row.cgst),
+                "sgst": str(row.sgst),
+                "bill_count": row.bill_count
+            })
+            totals["taxable"] += row.taxable
+            totals["cgst"] += row.cgst
+            totals["sgst"] += row.sgst
+
+        return Response(
+            {
+                "status": True,
+                "data": data,
+                "totals": {key: str(value) for key, value in totals.items()}
+            },
+            status=status.HTTP_200_OK
+        )
+
 class ContactUsAPIView(APIView):
     
     permission_classes = [IsAuthenticated]
@@ -1677,9 +2139,11 @@ class ContactUsAPIView(APIView):
             )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     def get(self, request):
-        contacts = ContactUs.objects.all().order_by('-id')
+        contacts, pagination = paginate_queryset(request, ContactUs.objects.all())
         serializer = ContactUsSerializer(contacts, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        if pagination is None:
+            return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response({"status": True, "data": serializer.data, **pagination}, status=status.HTTP_200_OK)
 class SolarInstallationQueryAPIView(APIView):
 
     permission_classes = [IsAuthenticated]
@@ -1702,9 +2166,11 @@ class SolarInstallationQueryAPIView(APIView):
 
     # List All Queries (Admin Only)
     def get(self, request):
-        queries = SolarInstallationQuery.objects.all().order_by('-id')
+        queries, pagination = paginate_queryset(request, SolarInstallationQuery.objects.all())
         serializer = SolarInstallationQuerySerializer(queries, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        if pagination is None:
+            return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response({"status": True, "data": serializer.data, **pagination}, status=status.HTTP_200_OK)
 
     # Delete Query (Admin Only)
     def delete(self, request):
@@ -1821,54 +2287,20 @@ class SendOTP(APIView):
 
         # Generate OTP
         
-        otp = str(random.randint(100000, 999999))
+        otp = new_code()
         message = f"Your onetime OTP is {otp} Regards-ICDS Technical"
-        encoded_message = quote(message)  # URL encode the message
-
-        # Build the URL (like PHP curl)
-        url = (
-            f"http://bulksms.saakshisoftware.com/api/mt/SendSMS"
-            f"?user=Brainrock"
-            f"&password=123456"
-            f"&senderid=BCSINF"
-            f"&channel=trans"
-            f"&DCS=0"
-            f"&flashsms=0"
-            f"&number={phone}"
-            f"&text={encoded_message}"
-            f"&route=04"
-            f"&DLTTemplateId=1207163827265054435"
-            f"&PEID=1201163222226675668"
-        )
 
-        try:
-            response = requests.get(url, timeout=100000)
-
-            if response.status_code == 200:
-                # Save OTP to DB
-                try:
-                    otp_entry = PhoneOTP.objects.get(phone_number=phone)
-                    otp_entry.otp_code = otp
-                    otp_entry.created_at = timezone.now()
-                    otp_entry.is_verified = False
-                    otp_entry.save()
-                except PhoneOTP.DoesNotExist:
-                    PhoneOTP.objects.create(
-                        phone_number=phone,
-                        otp_code=otp,
-                        is_verified=False,
-                        created_at=timezone.now()
-                    )
-
-                return Response({"success": True, "message": "OTP sent successfully"},  status=status.HTTP_200_OK)
+        # Expires after OTP_TTL_SECONDS; see utils_otp for where it is kept
+        if not get_otp_store().issue(phone, otp):
+            return Response(
+                {"success": False, "message": "OTP already sent, please wait before requesting another"},
+                status=status.HTTP_429_TOO_MANY_REQUESTS
+            )
+        # Sent in the background, queued for the send_sms_queue worker if that fails
+        send_otp_sms(phone, message)
 
-            else:
-                return Response({"success": False, "message": "SMS gateway error"}, status=500)
+        return Response({"success": True, "message": "OTP sent successfully"}, status=status.HTTP_200_OK)
 
-        except Exception as e:
-            print("OTP sending failed:", str(e))
-            return Response({"success": False, "message": "OTP sending failed (network error)"},status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        
 
 class VerifyOTP(APIView):
     authentication_classes = []
@@ -1881,20 +2313,20 @@ class VerifyOTP(APIView):
         if not phone or not otp:
             return Response({"success": False, "message": "Phone and OTP are required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            otp_entry = PhoneOTP.objects.get(phone_number=phone)
-
-            if otp_entry.otp_code == otp:
-                otp_entry.is_verified = True
-                otp_entry.save()
-                # Also update AllLog.verified for this phone number (ensure update is committed)
-               
-                return Response({"success": True, "message": "OTP verified successfully"}, status=status.HTTP_200_OK)
-            else:
-                return Response({"success": False, "message": "Invalid OTP"}, status=status.HTTP_400_BAD_REQUEST)
+        result = get_otp_store().verify(phone, otp)
 
-        except PhoneOTP.DoesNotExist:
-            return Response({"success": False, "message": "Phone number not found"}, status=status.HTTP_404_NOT_FOUND)
+        if result == OTP_VERIFIED:
+            return Response({"success": True, "message": "OTP verified successfully"}, status=status.HTTP_200_OK)
+        if result == OTP_INVALID:
+            return Response({"success": False, "message": "Invalid OTP"}, status=status.HTTP_400_BAD_REQUEST)
+        if result == OTP_EXPIRED:
+            return Response({"success": False, "message": "OTP expired, please request a new one"}, status=status.HTTP_400_BAD_REQUEST)
+        if result == OTP_LOCKED:
+            return Response(
+                {"success": False, "message": "Too many attempts, please try again later"},
+                status=status.HTTP_429_TOO_MANY_REQUESTS
+            )
+        return Response({"success": False, "message": "No OTP pending for this phone number"}, status=status.HTTP_404_NOT_FOUND)
         
 class ResetPassword(APIView):
     authentication_classes = []
@@ -1912,35 +2344,24 @@ class ResetPassword(APIView):
             )
 
         try:
-            otp_entry = PhoneOTP.objects.get(phone_number=phone)
+            user = AllLog.objects.get(phone=phone, role=role)
 
-            if not otp_entry.is_verified:
+            # A verified OTP resets one password, within OTP_VERIFIED_TTL_SECONDS
+            if not get_otp_store().consume_verification(phone):
                 return Response(
                     {"success": False, "message": "OTP not verified"},
                     status=400
                 )
 
-            user = AllLog.objects.get(phone=phone, role=role)
-
       
             user.password = make_password(new_password)
             user.save()
 
-          
-            otp_entry.is_verified = False
-            otp_entry.save()
-
             return Response(
                 {"success": True, "message": "Password reset successfully"},
                 status=status.HTTP_200_OK
             )
 
-        except PhoneOTP.DoesNotExist:
-            return Response(
-                {"success": False, "message": "OTP not found"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
         except AllLog.DoesNotExist:
             return Response(
                 {"success": False, "message": "User not found"},
@@ -1967,14 +2388,14 @@ class ServiceBillAPIView(APIView):
             except ServiceBill.DoesNotExist:
                 return Response({"success": False, "message": "Service bill not found"}, status=404)
 
-        items = ServiceBill.objects.all().order_by("-created_at")
+        items, pagination = paginate_queryset(request, ServiceBill.objects.all())
         serializer = ServiceBillSerializer(items, many=True)
-        return Response({"success": True, "data": serializer.data})
+        return Response({"success": True, "data": serializer.data, **(pagination or {})})
 
     def post(self, request):
         serializer = ServiceBillSerializer(data=request.data)
         if serializer.is_valid():
-            user_log = AllLog.objects.filter(unique_id=request.user.unique_id).first()
+            user_log = get_alllog(request, unique_id=request.user.unique_id)
             if not user_log:
                 return Response({"success": False, "message": "Authenticated user not found in AllLog"}, status=400)
             serializer.save(created_by=user_log)
@@ -1993,7 +2414,7 @@ class ServiceBillAPIView(APIView):
 
         serializer = ServiceBillSerializer(item, data=request.data, partial=True)
         if serializer.is_valid():
-            user_log = AllLog.objects.filter(unique_id=request.user.unique_id).first()
+            user_log = get_alllog(request, unique_id=request.user.unique_id)
             if not user_log:
                 return Response({"success": False, "message": "Authenticated user not found in AllLog"}, status=400)
             serializer.save(updated_by=user_log)
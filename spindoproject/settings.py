@@ -49,6 +49,109 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
 }
 
+# Build request.user from the token claims instead of loading AllLog per request.
+# Revoked/deactivated accounts are refused via a denylist each worker refreshes.
+JWT_CLAIMS_PRINCIPAL = os.getenv("JWT_CLAIMS_PRINCIPAL") == "True"
+JWT_DENYLIST_REFRESH_SECONDS = int(os.getenv("JWT_DENYLIST_REFRESH_SECONDS", "30"))
+
+# Local memory by default; point CACHE_BACKEND/CACHE_LOCATION at a shared cache
+# (e.g. django.core.cache.backends.redis.RedisCache) to share it across workers
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+
+ALLLOG_CACHE_ALIAS = "default"
+ALLLOG_CACHE_TIMEOUT = int(os.getenv("ALLLOG_CACHE_TIMEOUT", "300"))
+
+# Published category tree (spindoapp/utils_categories.py); the version token
+# expires after CATEGORY_VERSION_TIMEOUT and the tree after CATEGORY_CACHE_TIMEOUT
+CATEGORY_CACHE_ALIAS = "default"
+CATEGORY_CACHE_TIMEOUT = int(os.getenv("CATEGORY_CACHE_TIMEOUT", "3600"))
+# Workers without a shared cache see category changes made by another worker
+# after at most this many seconds, when their version token expires
+CATEGORY_VERSION_TIMEOUT = int(os.getenv("CATEGORY_VERSION_TIMEOUT", "60"))
+# How long clients may reuse the category list before revalidating with its ETag
+CATEGORY_MAX_AGE = int(os.getenv("CATEGORY_MAX_AGE", "60"))
+
+# District/block index (spindoapp/utils_geography.py), rebuilt when DistrictBlock changes
+GEOGRAPHY_CACHE_ALIAS = "default"
+# Rebuilt at least this often, so workers without a shared cache (and seeding
+# from another process) see table changes within this many seconds
+GEOGRAPHY_VERSION_TIMEOUT = int(os.getenv("GEOGRAPHY_VERSION_TIMEOUT", "60"))
+# The list changes about once a year; clients revalidate with the ETag after this
+GEOGRAPHY_MAX_AGE = int(os.getenv("GEOGRAPHY_MAX_AGE", "86400"))
+
+# Vendor matching index (spindoapp/utils_matching.py): changes by other workers
+# are read every REFRESH seconds, and the index is rebuilt every REBUILD seconds
+MATCH_INDEX_REFRESH_SECONDS = int(os.getenv("MATCH_INDEX_REFRESH_SECONDS", "30"))
+MATCH_INDEX_REBUILD_SECONDS = int(os.getenv("MATCH_INDEX_REBUILD_SECONDS", "900"))
+# Length of the calendar slot a scheduled request books for each assigned vendor
+# (spindoapp/utils_calendar.py); overlapping slots are schedule conflicts
+VENDOR_SLOT_MINUTES = int(os.getenv("VENDOR_SLOT_MINUTES", "120"))
+# Service request status transitions (spindoapp/utils_state.py) that lose a
+# race to a concurrent change are retried this many times before a 409
+REQUEST_TRANSITION_ATTEMPTS = int(os.getenv("REQUEST_TRANSITION_ATTEMPTS", "10"))
+
+# OTP store (spindoapp/utils_otp.py): "cache", "db", or "auto" = the cache when
+# it is shared across workers (not locmem), otherwise the phone_otp table.
+# "cache" needs a shared CACHE_BACKEND (checked by manage.py check)
+OTP_STORE = os.getenv("OTP_STORE", "auto")
+OTP_CACHE_ALIAS = "default"
+OTP_TTL_SECONDS = int(os.getenv("OTP_TTL_SECONDS", "300"))
+# Wrong guesses allowed per phone number; resending a code that is still
+# valid does not reset the count
+OTP_MAX_ATTEMPTS = int(os.getenv("OTP_MAX_ATTEMPTS", "5"))
+# The phone is locked for this long once they are used up; never extended
+OTP_LOCK_SECONDS = int(os.getenv("OTP_LOCK_SECONDS", "900"))
+# How long a verified OTP can be used to reset the password
+OTP_VERIFIED_TTL_SECONDS = int(os.getenv("OTP_VERIFIED_TTL_SECONDS", "600"))
+# At most one OTP per phone number in this many seconds (429 otherwise)
+OTP_RESEND_SECONDS = int(os.getenv("OTP_RESEND_SECONDS", "60"))
+# OTP SMS go to the gateway straight from the web process and only reach the
+# outbound queue when that fails; False queues every OTP SMS
+OTP_SMS_DIRECT = os.getenv("OTP_SMS_DIRECT", "True") == "True"
+
+# Cursor pagination of the list endpoints (spindoapp/utils_pagination.py)
+LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE", "50"))
+LIST_MAX_PAGE_SIZE = int(os.getenv("LIST_MAX_PAGE_SIZE", "200"))
+
+# Numbers each worker reserves at once for USER-/REQ-/QUERY- style IDs
+ID_SEQUENCE_BLOCK_SIZE = int(os.getenv("ID_SEQUENCE_BLOCK_SIZE", "20"))
+
+# Outbound SMS are queued and delivered by `manage.py send_sms_queue`.
+# SMS_GATEWAY=fake sends nothing (offline tests and benchmarks).
+SMS_GATEWAY = os.getenv("SMS_GATEWAY", "bulksms")
+# Gateway credentials come from the environment only (required for bulksms)
+SMS_USER = os.getenv("SMS_USER")
+SMS_PASSWORD = os.getenv("SMS_PASSWORD")
+SMS_CONNECT_TIMEOUT = float(os.getenv("SMS_CONNECT_TIMEOUT", "3.05"))
+SMS_READ_TIMEOUT = float(os.getenv("SMS_READ_TIMEOUT", "10"))
+# Retries within one gateway call for network errors/5xx, with exponential backoff
+SMS_CALL_RETRIES = int(os.getenv("SMS_CALL_RETRIES", "2"))
+SMS_BACKOFF_SECONDS = float(os.getenv("SMS_BACKOFF_SECONDS", "0.5"))
+# Consecutive failed calls that open the circuit, and how long it stays open
+SMS_BREAKER_THRESHOLD = int(os.getenv("SMS_BREAKER_THRESHOLD", "5"))
+SMS_BREAKER_COOLDOWN_SECONDS = int(os.getenv("SMS_BREAKER_COOLDOWN_SECONDS", "30"))
+# Numbers per gateway call when one text goes to many recipients (1 disables batching)
+SMS_BATCH_SIZE = int(os.getenv("SMS_BATCH_SIZE", "100"))
+# Sent and failed messages are deleted by the send_sms_queue worker after this many days
+SMS_RETENTION_DAYS = int(os.getenv("SMS_RETENTION_DAYS", "30"))
+
+# Bill PDFs are rendered in a process pool (spindoapp/utils_render.py); 0 renders inline
+BILL_RENDER_WORKERS = int(os.getenv("BILL_RENDER_WORKERS", "2"))
+# Keep rendered PDFs on disk as a cache; False renders every download in memory
+BILL_PDF_WRITE_THROUGH = os.getenv("BILL_PDF_WRITE_THROUGH", "True") == "True"
+# A combined PDF export is one document in memory; larger periods must use output=zip
+BILL_EXPORT_PDF_MAX_BILLS = int(os.getenv("BILL_EXPORT_PDF_MAX_BILLS", "200"))
+SMS_WORKERS = int(os.getenv("SMS_WORKERS", "8"))
+SMS_MAX_ATTEMPTS = int(os.getenv("SMS_MAX_ATTEMPTS", "5"))
+SMS_RETRY_BASE_SECONDS = int(os.getenv("SMS_RETRY_BASE_SECONDS", "30"))
+SMS_FAKE_LATENCY = float(os.getenv("SMS_FAKE_LATENCY", "0"))
+SMS_FAKE_FAILURE_RATE = float(os.getenv("SMS_FAKE_FAILURE_RATE", "0"))
+
 INSTALLED_APPS = [
     "corsheaders",
     "django.contrib.admin",